@@ -0,0 +1,256 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Request classes, in admission order: taps for games in progress go ahead of new games
+PRIORITY_PLAY = 0
+PRIORITY_START = 1
+
+class RateLimiter:
+    """
+    Token buckets per key (client IP, session id), refilled lazily when the key is next seen
+    Each bucket is a [tokens, last_seen] pair, so a check is one dict lookup and a few float operations
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: Dict[str, List[float]] = {}
+
+    def acquire(self, key: str, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """0 if `cost` tokens were taken, otherwise the seconds until they will be there"""
+        if now is None:
+            now = time.monotonic()
+        # A burst bigger than the bucket is allowed when the bucket is full, rather than never
+        cost = min(cost, self.burst)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._sweep(now)
+            bucket = self._buckets[key] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / self.rate
+
+    def _sweep(self, now: float):
+        """Forget buckets that have refilled; a full bucket and a missing one behave the same"""
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * self.rate < self.burst
+        }
+        if len(self._buckets) >= self.max_keys:
+            # Every key is mid-burst; failing open beats growing without bound
+            self._buckets.clear()
+
+class ConcurrencyLimiter:
+    """
+    Caps requests in flight; the rest wait in a FIFO queue per priority and are shed once they have
+    waited longer than their class allows. A new arrival is shed at once when the queues ahead of it
+    are already older than that, so an overloaded worker answers in microseconds, not after the wait.
+    """
+
+    def __init__(self, limit: int, max_wait: Tuple[float, ...]):
+        self.limit = limit
+        self.max_wait = max_wait
+        self.active = 0
+        self._queues: Tuple[Deque[Tuple[float, asyncio.Future]], ...] = tuple(deque() for _ in max_wait)
+
+    @property
+    def queued(self) -> List[int]:
+        return [len(queue) for queue in self._queues]
+
+    def _oldest_wait(self, priority: int, now: float) -> float:
+        """How long the oldest request at this priority or ahead of it has been waiting"""
+        oldest = now
+        for queue in self._queues[:priority + 1]:
+            while queue and queue[0][1].done():
+                queue.popleft()
+            if queue and queue[0][0] < oldest:
+                oldest = queue[0][0]
+        return now - oldest
+
+    def try_acquire(self, priority: int) -> bool:
+        """Take a free slot if nobody at this priority or ahead of it is waiting"""
+        if self.active < self.limit and not any(self._queues[:priority + 1]):
+            self.active += 1
+            return True
+        return False
+
+    async def wait(self, priority: int, now: float) -> bool:
+        """Queue for a slot after try_acquire failed; False means the request should be shed"""
+        max_wait = self.max_wait[priority]
+        # A standing queue: whoever is at its head has already waited out the budget
+        if self._oldest_wait(priority, now) >= max_wait:
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].append((now, future))
+        try:
+            await asyncio.wait_for(future, max_wait)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as the client went away
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        """Free a slot, handing it straight to the next waiter in priority order"""
+        for queue in self._queues:
+            while queue:
+                _, future = queue.popleft()
+                if not future.done():
+                    future.set_result(None)
+                    return
+        self.active -= 1
+
+class LoopLagMonitor:
+    """
+    How long ready callbacks wait for the event loop, sampled every `interval` seconds
+    Handlers rarely suspend, so under overload requests queue in the loop rather than in the
+    concurrency limiter; a request arriving now waits about this long before any code of ours runs
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - expected)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.lag = 0.0
+
+class AdmissionController:
+    """Rate limits and the concurrency limiter for game routes; any part may be disabled (None)"""
+
+    def __init__(self, max_concurrency: int = 0, play_wait: float = 0.2, start_wait: float = 0.05,
+                 ip_rate: float = 0.0, ip_burst: float = 0.0, session_rate: float = 0.0,
+                 session_burst: float = 0.0, trust_forwarded: bool = False):
+        self.limiter = ConcurrencyLimiter(max_concurrency, (play_wait, start_wait)) if max_concurrency > 0 else None
+        # Started with the app; its lag sheds requests that would queue past their wait budget
+        self.lag_monitor = LoopLagMonitor() if self.limiter is not None else None
+        self.ip_limiter = RateLimiter(ip_rate, max(ip_burst, 1.0)) if ip_rate > 0 else None
+        self.session_limiter = RateLimiter(session_rate, max(session_burst, 1.0)) if session_rate > 0 else None
+        self.trust_forwarded = trust_forwarded
+        self.stats = {
+            "admitted": 0,
+            "shed_play": 0,
+            "shed_start": 0,
+            "rate_limited_ip": 0,
+            "rate_limited_session": 0,
+        }
+
+    def session_retry_after(self, session_id: str, cost: float = 1.0) -> float:
+        """0 if the session may make `cost` more calls now, otherwise seconds to wait"""
+        if self.session_limiter is None:
+            return 0.0
+        retry_after = self.session_limiter.acquire(session_id, cost)
+        if retry_after:
+            self.stats["rate_limited_session"] += 1
+        return retry_after
+
+    def client_ip(self, scope: Dict[str, Any]) -> str:
+        if self.trust_forwarded:
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    return value.split(b",", 1)[0].strip().decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def snapshot(self) -> Dict[str, Any]:
+        gauges: Dict[str, Any] = {}
+        if self.limiter is not None:
+            play, start = self.limiter.queued
+            gauges = {"limit": self.limiter.limit, "in_flight": self.limiter.active,
+                      "queued_play": play, "queued_start": start, "loop_lag_ms": self.lag_monitor.lag * 1000}
+        return {**gauges, **self.stats}
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After takes whole seconds"""
+    return str(max(1, math.ceil(seconds)))
+
+def _rejection(detail: str) -> bytes:
+    return json.dumps({"detail": detail}).encode()
+
+_RATE_LIMITED = _rejection("Too many requests")
+_SHED = _rejection("Server is busy; try again shortly")
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying per-IP rate limits and the concurrency limiter to game HTTP routes
+    Rejections are written straight to the raw ASGI interface, before routing or body parsing
+    """
+
+    def __init__(self, app, controller: AdmissionController, prefix: str = "/game/",
+                 start_path: str = "/game/start"):
+        self.app = app
+        self.controller = controller
+        self.prefix = prefix
+        self.start_path = start_path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        if controller.ip_limiter is not None:
+            retry_after = controller.ip_limiter.acquire(controller.client_ip(scope))
+            if retry_after:
+                controller.stats["rate_limited_ip"] += 1
+                await _reject(send, 429, _RATE_LIMITED, retry_after)
+                return
+
+        limiter = controller.limiter
+        if limiter is None:
+            controller.stats["admitted"] += 1
+            await self.app(scope, receive, send)
+            return
+
+        priority = PRIORITY_START if scope["path"] == self.start_path else PRIORITY_PLAY
+        max_wait = limiter.max_wait[priority]
+        if controller.lag_monitor.lag >= max_wait or not (
+                limiter.try_acquire(priority) or await limiter.wait(priority, time.monotonic())):
+            controller.stats["shed_start" if priority == PRIORITY_START else "shed_play"] += 1
+            await _reject(send, 503, _SHED, max_wait)
+            return
+        controller.stats["admitted"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+async def _reject(send, status: int, body: bytes, retry_after: float):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", retry_after_header(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
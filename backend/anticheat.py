@@ -0,0 +1,261 @@
+import math
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Below this many taps a session says too little about its player to judge
+MIN_TAPS = 8
+# Human taps land tens of ms either side of the beat and wobble by as much again; a session
+# that is both this close and this steady is replaying the beat grid
+MAX_STEADY_OFFSET_MS = 5.0
+MIN_OFFSET_STD_MS = 3.0
+# Players pause to read each lyric, so their tap intervals vary; scripts keep a fixed cadence
+MIN_INTERVAL_CV = 0.02
+# Reading a lyric and picking a word takes longer than this; a share of faster taps is a script
+REACTION_FLOOR_MS = 150.0
+MAX_FAST_REACTION_SHARE = 0.25
+
+# Checks in verdict order, and how much each adds to the anomaly score
+CHECKS = ("steady_offset", "metronomic_taps", "superhuman_reactions")
+CHECK_WEIGHTS = (1.0, 0.5, 1.0)
+# Scores at or above this are kept off the leaderboard; anything above zero is flagged
+QUARANTINE_SCORE = 1.0
+
+# Shorter runs are cheaper to add() one tap at a time than to hand to NumPy
+BULK_MIN_TAPS = 32
+
+def _merge_moments(count: int, mean: float, m2: float, values: np.ndarray) -> Tuple[int, float, float]:
+    """Fold `values` into a running (count, mean, m2), by Chan et al.'s parallel variance update"""
+    added = len(values)
+    if not added:
+        return count, mean, m2
+    added_mean = float(values.mean())
+    added_m2 = float(((values - added_mean) ** 2).sum())
+    total = count + added
+    delta = added_mean - mean
+    return total, mean + delta * added / total, m2 + added_m2 + delta * delta * count * added / total
+
+class TimingStats:
+    """
+    Running timing statistics for one session, updated in O(1) per tap
+    Offsets and inter-tap intervals use Welford's algorithm, so no tap is ever revisited
+    """
+
+    __slots__ = (
+        "taps", "offset_mean", "offset_m2",
+        "intervals", "interval_mean", "interval_m2", "last_tap",
+        "reactions", "fast_reactions", "min_reaction",
+    )
+
+    def __init__(self):
+        self.taps = 0
+        self.offset_mean = 0.0
+        self.offset_m2 = 0.0
+        self.intervals = 0
+        self.interval_mean = 0.0
+        self.interval_m2 = 0.0
+        self.last_tap: Optional[float] = None
+        self.reactions = 0
+        self.fast_reactions = 0
+        self.min_reaction = math.inf
+
+    def add(self, tap_timestamp: float, timing_offset: float, reaction_time: float = math.nan):
+        self.taps += 1
+        delta = timing_offset - self.offset_mean
+        self.offset_mean += delta / self.taps
+        self.offset_m2 += delta * (timing_offset - self.offset_mean)
+
+        if self.last_tap is not None:
+            interval = tap_timestamp - self.last_tap
+            self.intervals += 1
+            delta = interval - self.interval_mean
+            self.interval_mean += delta / self.intervals
+            self.interval_m2 += delta * (interval - self.interval_mean)
+        self.last_tap = tap_timestamp
+
+        # Unknown (NaN) or negative reaction times come from taps on an earlier lyric
+        if reaction_time >= 0:
+            self.reactions += 1
+            if reaction_time < REACTION_FLOOR_MS:
+                self.fast_reactions += 1
+            self.min_reaction = min(self.min_reaction, reaction_time)
+
+    def extend(self, tap_timestamps: Sequence[float], timing_offsets: Sequence[float],
+               reaction_times: Sequence[float]):
+        """add() for a run of taps; long runs, like a session rebuilt from Redis, are folded in with NumPy"""
+        if len(tap_timestamps) < BULK_MIN_TAPS:
+            for tap_timestamp, timing_offset, reaction_time in zip(tap_timestamps, timing_offsets, reaction_times):
+                self.add(tap_timestamp, timing_offset, reaction_time)
+            return
+
+        taps = np.asarray(tap_timestamps, dtype=np.float64)
+        offsets = np.asarray(timing_offsets, dtype=np.float64)
+        reactions = np.asarray(reaction_times, dtype=np.float64)
+        self.taps, self.offset_mean, self.offset_m2 = _merge_moments(
+            self.taps, self.offset_mean, self.offset_m2, offsets
+        )
+        intervals = np.diff(taps, prepend=self.last_tap) if self.last_tap is not None else np.diff(taps)
+        self.intervals, self.interval_mean, self.interval_m2 = _merge_moments(
+            self.intervals, self.interval_mean, self.interval_m2, intervals
+        )
+        self.last_tap = float(taps[-1])
+        known = reactions[reactions >= 0]
+        if len(known):
+            self.reactions += len(known)
+            self.fast_reactions += int(np.count_nonzero(known < REACTION_FLOOR_MS))
+            self.min_reaction = min(self.min_reaction, float(known.min()))
+
+    @property
+    def offset_std(self) -> float:
+        return math.sqrt(self.offset_m2 / self.taps) if self.taps else 0.0
+
+    @property
+    def interval_cv(self) -> float:
+        """Coefficient of variation of the inter-tap intervals"""
+        if not self.intervals or self.interval_mean <= 0:
+            return math.inf
+        return math.sqrt(self.interval_m2 / self.intervals) / self.interval_mean
+
+class Verdict(NamedTuple):
+    action: str  # "ok", "flag" or "quarantine"
+    score: float
+    reasons: Tuple[str, ...]
+
+def _check_flags(taps, offset_mean, offset_std, intervals, interval_cv, reactions, fast_reactions):
+    """
+    The checks in CHECKS order; takes scalars for one session or NumPy arrays for many,
+    so streaming and batch verdicts can't drift apart
+    """
+    steady = (taps >= MIN_TAPS) & (offset_mean < MAX_STEADY_OFFSET_MS) & (offset_std < MIN_OFFSET_STD_MS)
+    metronomic = (intervals >= MIN_TAPS - 1) & (interval_cv < MIN_INTERVAL_CV)
+    superhuman = (reactions >= MIN_TAPS) & (fast_reactions > MAX_FAST_REACTION_SHARE * reactions)
+    return steady, metronomic, superhuman
+
+def _action(score: float) -> str:
+    if score >= QUARANTINE_SCORE:
+        return "quarantine"
+    return "flag" if score > 0 else "ok"
+
+def assess(stats: TimingStats) -> Verdict:
+    """Verdict for one session from its running stats, O(1)"""
+    flags = _check_flags(stats.taps, stats.offset_mean, stats.offset_std, stats.intervals,
+                         stats.interval_cv, stats.reactions, stats.fast_reactions)
+    reasons = tuple(name for name, flagged in zip(CHECKS, flags) if flagged)
+    score = sum(weight for weight, flagged in zip(CHECK_WEIGHTS, flags) if flagged)
+    return Verdict(_action(score), score, reasons)
+
+def assess_batch(session_index: np.ndarray, tap_timestamp: np.ndarray, timing_offset: np.ndarray,
+                 reaction_time: Optional[np.ndarray] = None, sessions: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Vectorized assess() over many sessions at once, for re-scoring history
+    Taps are flat arrays grouped by `session_index` (0..sessions-1) and in tap order within a group.
+    Returns per-session arrays: "score", "taps", and one boolean array per name in CHECKS.
+    """
+    session_index = np.asarray(session_index, dtype=np.int64)
+    tap_timestamp = np.asarray(tap_timestamp, dtype=np.float64)
+    timing_offset = np.asarray(timing_offset, dtype=np.float64)
+    if sessions is None:
+        sessions = int(session_index.max()) + 1 if len(session_index) else 0
+
+    def mean_and_std(index: np.ndarray, values: np.ndarray):
+        counts = np.bincount(index, minlength=sessions)
+        safe = np.maximum(counts, 1)
+        mean = np.bincount(index, values, minlength=sessions) / safe
+        # Population variance, as Welford's m2 / n
+        variance = np.bincount(index, (values - mean[index]) ** 2, minlength=sessions) / safe
+        return counts, mean, np.sqrt(variance)
+
+    taps, offset_mean, offset_std = mean_and_std(session_index, timing_offset)
+
+    same_session = session_index[1:] == session_index[:-1]
+    interval_index = session_index[1:][same_session]
+    intervals, interval_mean, interval_std = mean_and_std(interval_index, np.diff(tap_timestamp)[same_session])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interval_cv = np.where((intervals > 0) & (interval_mean > 0), interval_std / interval_mean, np.inf)
+
+    if reaction_time is None:
+        reactions = fast_reactions = np.zeros(sessions, dtype=np.int64)
+    else:
+        reaction_time = np.asarray(reaction_time, dtype=np.float64)
+        known = reaction_time >= 0
+        reactions = np.bincount(session_index[known], minlength=sessions)
+        fast_reactions = np.bincount(session_index[known & (reaction_time < REACTION_FLOOR_MS)], minlength=sessions)
+
+    flags = _check_flags(taps, offset_mean, offset_std, intervals, interval_cv, reactions, fast_reactions)
+    result = {"taps": taps, "score": sum(weight * flagged for weight, flagged in zip(CHECK_WEIGHTS, flags))}
+    result.update(zip(CHECKS, flags))
+    return result
+
+def batch_verdicts(result: Dict[str, np.ndarray]) -> List[Verdict]:
+    """assess_batch output as one Verdict per session"""
+    reasons = np.stack([result[name] for name in CHECKS], axis=1)
+    return [
+        Verdict(_action(float(score)), float(score), tuple(name for name, flagged in zip(CHECKS, row) if flagged))
+        for score, row in zip(result["score"], reasons)
+    ]
+
+if __name__ == "__main__":
+    import argparse
+    from array import array
+    from datetime import datetime
+
+    from sqlalchemy import delete, select
+
+    from database import engine, read_engine
+    from export import DEFAULT_CHUNK_SIZE, iter_row_batches
+    from models import FlaggedScore, GameChoice, PlayerScore
+
+    parser = argparse.ArgumentParser(description="Re-score recorded sessions for timing anomalies")
+    parser.add_argument("--apply", action="store_true",
+                        help="Record flagged sessions and move quarantined scores out of player_scores")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    # Three columns per tap, read in keyset-paged chunks; reaction times aren't stored, so that check is skipped
+    session_ids: Dict[str, int] = {}
+    codes = array("q")
+    taps = array("d")
+    offsets = array("d")
+    for rows in iter_row_batches(read_engine, GameChoice.__table__, chunk_size=args.chunk_size):
+        for row in rows:
+            codes.append(session_ids.setdefault(row.session_id, len(session_ids)))
+            taps.append(row.tap_timestamp)
+            offsets.append(row.timing_offset)
+
+    codes = np.frombuffer(codes, dtype=np.int64)
+    # Rows are in id (arrival) order; a stable sort groups them by session and keeps that order
+    order = np.argsort(codes, kind="stable")
+    result = assess_batch(codes[order], np.frombuffer(taps)[order], np.frombuffer(offsets)[order],
+                          sessions=len(session_ids))
+    suspects = {
+        session_id: verdict
+        for session_id, verdict in zip(session_ids, batch_verdicts(result)) if verdict.action != "ok"
+    }
+    for session_id, verdict in suspects.items():
+        print(f"{verdict.action:10} {verdict.score:4.1f}  {session_id}  {', '.join(verdict.reasons)}")
+    print(f"{len(suspects)} of {len(session_ids)} sessions flagged")
+
+    if args.apply and suspects:
+        scores = PlayerScore.__table__
+        flagged = FlaggedScore.__table__
+        moved = 0
+        with engine.begin() as connection:
+            already = set(connection.execute(select(flagged.c.session_id)).scalars())
+            rows = connection.execute(
+                select(scores).where(scores.c.session_id.in_(list(suspects.keys() - already)))
+            ).mappings().all()
+            for row in rows:
+                verdict = suspects[row["session_id"]]
+                action = "quarantined" if verdict.action == "quarantine" else "flagged"
+                connection.execute(flagged.insert(), {
+                    **{name: row[name] for name in row.keys() if name != "id"},
+                    "anomaly_score": verdict.score,
+                    "reasons": ",".join(verdict.reasons),
+                    "action": action,
+                    "flagged_at": datetime.utcnow(),
+                })
+                if action == "quarantined":
+                    connection.execute(delete(scores).where(scores.c.id == row["id"]))
+                    moved += 1
+        print(f"Recorded {len(rows)} sessions; moved {moved} scores to quarantine "
+              f"(running servers rebuild their leaderboards on restart)")
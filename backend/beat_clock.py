@@ -0,0 +1,94 @@
+import math
+import time
+from typing import Any, Dict, Optional
+
+# RFC 6298 smoothing gains for the round-trip estimate
+SRTT_GAIN = 1 / 8
+RTTVAR_GAIN = 1 / 4
+# How far each accepted sample moves the offset estimate
+OFFSET_GAIN = 1 / 4
+# Exchanges slower than this say nothing useful about the offset
+MAX_SAMPLE_RTT_MS = 2000.0
+
+def server_time_ms() -> float:
+    """The server's clock, in the same epoch-milliseconds unit browsers use for Date.now()"""
+    return time.time() * 1000
+
+class ClockOffsetEstimator:
+    """
+    NTP-style estimate of one client's clock offset (client clock - server clock)
+    Each sample is a server timestamp echoed back with the client's clock reading:
+    the server sends `server_sent`, the client replies at once with `client_time`, and the
+    reply arrives at `server_received`. Updates are O(1) so they can run inline on any message.
+    """
+
+    __slots__ = ("offset", "srtt", "rttvar", "samples")
+
+    def __init__(self, offset: float = 0.0, srtt: Optional[float] = None,
+                 rttvar: float = 0.0, samples: int = 0):
+        self.offset = offset
+        self.srtt = srtt
+        self.rttvar = rttvar
+        self.samples = samples
+
+    @property
+    def synced(self) -> bool:
+        return self.samples > 0
+
+    @property
+    def one_way_delay(self) -> float:
+        """Expected server -> client delay, assuming a symmetric path"""
+        return self.srtt / 2 if self.srtt is not None else 0.0
+
+    @property
+    def max_one_way_delay(self) -> float:
+        """A generous bound on the delay of any one message"""
+        if self.srtt is None:
+            return MAX_SAMPLE_RTT_MS / 2
+        return min(self.srtt / 2 + 2 * self.rttvar, MAX_SAMPLE_RTT_MS / 2)
+
+    def add_sample(self, server_sent: float, client_time: float, server_received: float) -> bool:
+        """Fold one exchange into the estimate; returns False if the sample was unusable"""
+        rtt = server_received - server_sent
+        if not (math.isfinite(rtt) and math.isfinite(client_time)) or not 0 <= rtt <= MAX_SAMPLE_RTT_MS:
+            return False
+        # The client read its clock somewhere in the round trip; the midpoint is the best guess
+        sample_offset = client_time - (server_sent + server_received) / 2
+
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+            self.offset = sample_offset
+        else:
+            # A sample's error bound is rtt / 2, so round trips inflated by queueing would
+            # drag the offset around; they still feed the RTT estimate
+            queued = rtt > self.srtt + 4 * self.rttvar
+            self.rttvar += RTTVAR_GAIN * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += SRTT_GAIN * (rtt - self.srtt)
+            if not queued:
+                # Faster exchanges are tighter measurements, so they count for more
+                weight = OFFSET_GAIN * min(1.0, self.srtt / max(rtt, 1.0))
+                self.offset += weight * (sample_offset - self.offset)
+        self.samples += 1
+        return True
+
+    def to_server_time(self, client_time: float) -> float:
+        return client_time - self.offset
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"offset": self.offset, "srtt": self.srtt, "rttvar": self.rttvar, "samples": self.samples}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ClockOffsetEstimator":
+        return cls(**data) if data else cls()
+
+def place_tap(claimed_time: Optional[float], received_at: float,
+              clock: ClockOffsetEstimator, earliest: float) -> float:
+    """
+    Server-clock time of a tap
+    A synced client's own timestamp is trusted only within [earliest, received_at]; otherwise
+    the tap is assumed to have been sent one typical delay before it arrived
+    """
+    if claimed_time is None or not clock.synced or not math.isfinite(claimed_time):
+        return max(earliest, received_at - clock.one_way_delay)
+    return min(received_at, max(earliest, clock.to_server_time(claimed_time)))
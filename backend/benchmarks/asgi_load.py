@@ -0,0 +1,77 @@
+"""
+In-process ASGI load generator for the benchmark suite
+
+Drives full start -> N choices -> end games against the FastAPI app through httpx's ASGI
+transport, with the app's startup and shutdown handlers running around the load.
+No sockets are involved, so results reflect the application rather than the network stack.
+"""
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+
+def percentile(samples: List[float], q: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+async def play(client: httpx.AsyncClient, choices: int, rng: random.Random,
+               latencies: Dict[str, List[float]]):
+    async def call(name: str, path: str, body: Dict) -> Dict:
+        start = time.perf_counter()
+        response = await client.post(path, json=body)
+        latencies[name].append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        return response.json()
+
+    lyric = await call("start", "/game/start", {"player_name": "bench", "difficulty": "medium"})
+    session_id = lyric["session_id"]
+    for _ in range(choices):
+        await call("choice", "/game/choice", {
+            "session_id": session_id,
+            "lyric_id": lyric["lyric_id"],
+            "chosen_word": rng.choice(lyric["options"]),
+            "tap_timestamp": time.time() * 1000 + rng.uniform(-200, 200)
+        })
+        lyric = await call("next", "/game/next", {"session_id": session_id})
+    await call("end", "/game/end", {"session_id": session_id, "total_score": 0, "final_metrics": {}})
+
+
+def empty_latencies() -> Dict[str, List[float]]:
+    return {"start": [], "choice": [], "next": [], "end": []}
+
+
+async def run_load(app, games: int, choices: int, concurrency: int, seed: int = 1,
+                   warmup_games: int = 10) -> Dict[str, float]:
+    latencies = empty_latencies()
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with semaphore:
+            await play(client, choices, rng, latencies)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Untimed games first, so route resolution, pydantic models and metric series are built
+            for _ in range(warmup_games):
+                await play(client, choices, rng, empty_latencies())
+            start = time.perf_counter()
+            await asyncio.gather(*(bounded() for _ in range(games)))
+            elapsed = time.perf_counter() - start
+
+    requests = sum(len(samples) for samples in latencies.values())
+    return {
+        "games_per_s": games / elapsed,
+        "requests_per_s": requests / elapsed,
+        "choice_p50_ms": percentile(latencies["choice"], 50),
+        "choice_p99_ms": percentile(latencies["choice"], 99),
+        "start_p50_ms": percentile(latencies["start"], 50),
+        "end_p50_ms": percentile(latencies["end"], 50),
+    }
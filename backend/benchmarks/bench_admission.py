@@ -0,0 +1,159 @@
+"""
+Benchmark: admission control under synthetic overload
+
+Times the admission check on its own, then drives the app in-process (httpx ASGI transport, scratch
+SQLite) with open-loop arrivals: taps for games in progress plus new /game/start calls, at --overload
+times the capacity measured in a closed-loop warm-up. Runs once with admission control off and once
+on. Latency counts from each request's scheduled arrival, so a backed-up loop can't hide its queue.
+The load generator shares the app's event loop, so goodput with shedding on understates a real worker's.
+    python -m benchmarks.bench_admission [--seconds 5] [--overload 3] [--start-share 0.2]
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+from admission import AdmissionController, AdmissionMiddleware
+from benchmarks.asgi_load import percentile
+from benchmarks.suite import isolate_app
+
+
+def check_overhead(requests: int = 200_000) -> Tuple[float, float]:
+    """ns per request through a bare ASGI app, and through AdmissionMiddleware with everything enabled"""
+    async def app(scope, receive, send):
+        pass
+
+    controller = AdmissionController(max_concurrency=64, ip_rate=1e9, ip_burst=1e9)
+    middleware = AdmissionMiddleware(app, controller)
+    scope = {"type": "http", "method": "POST", "path": "/game/choice", "headers": [], "client": ("10.0.0.1", 1)}
+
+    async def run(target) -> float:
+        start = time.perf_counter_ns()
+        for _ in range(requests):
+            await target(scope, None, None)
+        return (time.perf_counter_ns() - start) / requests
+
+    async def both():
+        await run(middleware)
+        return await run(app), await run(middleware)
+
+    return asyncio.run(both())
+
+
+async def start_game(client: httpx.AsyncClient) -> Dict:
+    response = await client.post("/game/start", json={"player_name": "bench", "difficulty": "medium"})
+    response.raise_for_status()
+    return response.json()
+
+
+def choice_body(lyric: Dict, rng: random.Random) -> Dict:
+    return {
+        "session_id": lyric["session_id"],
+        "lyric_id": lyric["lyric_id"],
+        "chosen_word": rng.choice(lyric["options"]),
+        "tap_timestamp": time.time() * 1000,
+    }
+
+
+async def measure_capacity(client: httpx.AsyncClient, games: List[Dict], seconds: float = 2.0) -> float:
+    """Closed-loop choices per second with 32 callers"""
+    rng = random.Random(2)
+    done = 0
+    deadline = time.perf_counter() + seconds
+
+    async def caller():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            await client.post("/game/choice", json=choice_body(rng.choice(games), rng))
+            done += 1
+
+    await asyncio.gather(*(caller() for _ in range(32)))
+    return done / seconds
+
+
+async def overload(client: httpx.AsyncClient, games: List[Dict], rate: float, seconds: float,
+                   start_share: float) -> Dict[str, Dict[int, List[float]]]:
+    """Open-loop arrivals at `rate`/s; returns latencies (ms) by kind and status"""
+    rng = random.Random(3)
+    results: Dict[str, Dict[int, List[float]]] = {"play": {}, "start": {}}
+    tasks = []
+
+    async def request(kind: str, scheduled: float):
+        if kind == "start":
+            response = await client.post("/game/start", json={"player_name": "bench", "difficulty": "medium"})
+        else:
+            response = await client.post("/game/choice", json=choice_body(rng.choice(games), rng))
+        results[kind].setdefault(response.status_code, []).append((time.perf_counter() - scheduled) * 1000)
+
+    begin = time.perf_counter()
+    scheduled = begin
+    while scheduled - begin < seconds:
+        scheduled += rng.expovariate(rate)
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind = "start" if rng.random() < start_share else "play"
+        tasks.append(asyncio.create_task(request(kind, scheduled)))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def report(label: str, results: Dict[str, Dict[int, List[float]]], seconds: float):
+    for kind, by_status in results.items():
+        ok = by_status.get(200, [])
+        shed = by_status.get(503, [])
+        other = sum(len(samples) for status, samples in by_status.items() if status not in (200, 503))
+        line = f"  {label:4} {kind:5} ok {len(ok) / seconds:7.1f}/s"
+        if ok:
+            line += f"  p50 {percentile(ok, 50):8.1f} ms  p99 {percentile(ok, 99):8.1f} ms"
+        line += f"  | shed {len(shed):6d}"
+        if shed:
+            line += f"  p99 {percentile(shed, 99):7.2f} ms"
+        if other:
+            line += f"  | other {other}"
+        print(line)
+
+
+async def run_overload(args):
+    import database
+    import main
+
+    database.init_db()
+    limiter = main.admission.limiter
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            games = [await start_game(client) for _ in range(args.games)]
+            capacity = await measure_capacity(client, games)
+            rate = capacity * args.overload
+            print(f"capacity ~{capacity:.0f} requests/s; offering {rate:.0f}/s for {args.seconds:.0f} s, "
+                  f"{args.start_share:.0%} of them new games")
+            for label, mode_limiter in (("off", None), ("on", limiter)):
+                main.admission.limiter = mode_limiter
+                results = await overload(client, games, rate, args.seconds, args.start_share)
+                report(label, results, args.seconds)
+    main.admission.limiter = limiter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--overload", type=float, default=3.0, help="offered load as a multiple of capacity")
+    parser.add_argument("--start-share", type=float, default=0.2, help="fraction of arrivals that are new games")
+    parser.add_argument("--games", type=int, default=200, help="games in progress sending taps")
+    args = parser.parse_args()
+
+    bare, admitted = check_overhead()
+    print(f"admission check: {admitted - bare:.0f} ns per request ({bare:.0f} ns bare, {admitted:.0f} ns admitted)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        isolate_app(directory)
+        asyncio.run(run_overload(args))
+
+
+if __name__ == "__main__":
+    main()
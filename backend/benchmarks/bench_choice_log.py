@@ -0,0 +1,89 @@
+"""
+Benchmark: heap cost and end-of-game metrics for a ChoiceLog vs. a list of choice dicts
+
+Run from the backend directory:
+    python -m benchmarks.bench_choice_log [--sessions 2000] [--choices 120]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Dict, List
+
+from choice_log import ChoiceLog
+
+OPTIONS = ["trash", "cash", "dash", "gold", "soul", "flow", "steel", "feel", "real"]
+
+
+def make_records(count: int, rng: random.Random) -> List[Dict]:
+    records = []
+    for i in range(count):
+        tap = 1000.0 * i + rng.uniform(-300, 300)
+        beat = 1000.0 * i
+        records.append({
+            "lyric_id": f"lyric_{i % 3}",
+            "chosen_word": rng.choice(OPTIONS),
+            "tap_timestamp": tap,
+            "beat_timestamp": beat,
+            "timing_offset": abs(tap - beat),
+            "rhyme_accuracy": rng.random(),
+            "tone_score": rng.random(),
+            "beat_accuracy": rng.random()
+        })
+    return records
+
+
+def list_metrics(choices: List[Dict]) -> Dict[str, float]:
+    """The pre-ChoiceLog calculate_final_metrics"""
+    rhyme_scores = [choice["rhyme_accuracy"] for choice in choices]
+    beat_scores = [choice["beat_accuracy"] for choice in choices]
+    tone_scores = [choice["tone_score"] for choice in choices]
+    reaction_times = [choice["timing_offset"] for choice in choices]
+    return {
+        "rhyme_accuracy_score": sum(rhyme_scores) / len(rhyme_scores),
+        "beat_sync_accuracy": sum(beat_scores) / len(beat_scores),
+        "tone_match_score": sum(tone_scores) / len(tone_scores),
+        "reaction_speed_avg": sum(reaction_times) / len(reaction_times)
+    }
+
+
+def measure(build) -> (float, object):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--choices", type=int, default=120)
+    args = parser.parse_args()
+    
+    rng = random.Random(5)
+    # Stand-in for what the handlers produce: fresh dicts per tap, kept or packed
+    raw = [make_records(args.choices, rng) for _ in range(args.sessions)]
+    
+    list_bytes, as_lists = measure(lambda: [[dict(record) for record in records] for records in raw])
+    log_bytes, as_logs = measure(lambda: [ChoiceLog.from_records(records) for records in raw])
+    
+    start = time.perf_counter()
+    for choices in as_lists:
+        list_metrics(choices)
+    list_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for log in as_logs:
+        log.final_metrics()
+    log_time = time.perf_counter() - start
+    
+    taps = args.sessions * args.choices
+    print(f"{args.sessions} sessions x {args.choices} choices")
+    print(f"list of dicts: {list_bytes / taps:7.1f} B/choice  final metrics {list_time / args.sessions * 1e6:7.2f} us/session")
+    print(f"ChoiceLog:     {log_bytes / taps:7.1f} B/choice  final metrics {log_time / args.sessions * 1e6:7.2f} us/session")
+
+
+if __name__ == "__main__":
+    main()
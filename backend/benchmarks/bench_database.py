@@ -0,0 +1,134 @@
+"""
+Benchmark: leaderboard reads while scores are bulk-written, per database engine profile
+
+Runs a write-behind-style writer (batched inserts into player_scores) alongside reader threads
+running the top-10 leaderboard query, against a scratch SQLite file for each profile.
+    python -m benchmarks.bench_database [--seconds 10] [--readers 4] [--batch 500]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from database import create_engines
+from models import Base, PlayerScore
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+
+def score_rows(start: int, count: int, rng: random.Random) -> List[Dict]:
+    now = datetime.utcnow()
+    return [{
+        "session_id": f"bench-{start + i}",
+        "player_name": f"player{(start + i) % 997}",
+        "difficulty": rng.choice(DIFFICULTIES),
+        "total_score": rng.randint(0, 100_000),
+        "rhyme_accuracy": rng.random(),
+        "beat_sync_accuracy": rng.random(),
+        "tone_match_score": rng.random(),
+        "reaction_speed_avg": rng.random() * 1000,
+        "created_at": now,
+    } for i in range(count)]
+
+
+def percentile(samples: List[float], q: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+def run_profile(profile: str, directory: str, args) -> Dict[str, float]:
+    url = f"sqlite:///{os.path.join(directory, profile + '.db')}"
+    writer, reader = create_engines(url, profile)
+    Base.metadata.create_all(bind=writer)
+    rng = random.Random(1)
+    table = PlayerScore.__table__
+    with writer.begin() as connection:
+        connection.execute(table.insert(), score_rows(0, args.seed_rows, rng))
+
+    top_ten = select(table.c.player_name, table.c.total_score) \
+        .where(table.c.difficulty == "medium") \
+        .order_by(table.c.total_score.desc(), table.c.created_at).limit(10)
+    stop = threading.Event()
+    read_latencies: List[float] = []
+    read_errors = [0]
+    commit_latencies: List[float] = []
+    written = [0]
+
+    def write_loop():
+        next_id = args.seed_rows
+        while not stop.is_set():
+            rows = score_rows(next_id, args.batch, rng)
+            start = time.perf_counter()
+            with writer.begin() as connection:
+                connection.execute(table.insert(), rows)
+            commit_latencies.append((time.perf_counter() - start) * 1000)
+            next_id += args.batch
+            written[0] += args.batch
+            time.sleep(args.write_interval)
+
+    def read_loop():
+        samples = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with reader.connect() as connection:
+                    connection.execute(top_ten).all()
+            except OperationalError:
+                read_errors[0] += 1
+                continue
+            samples.append((time.perf_counter() - start) * 1000)
+        read_latencies.extend(samples)
+
+    threads = [threading.Thread(target=write_loop)] + \
+        [threading.Thread(target=read_loop) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    writer.dispose()
+    reader.dispose()
+
+    return {
+        "reads_per_s": len(read_latencies) / args.seconds,
+        "read_p50_ms": percentile(read_latencies, 50),
+        "read_p99_ms": percentile(read_latencies, 99),
+        "read_max_ms": max(read_latencies, default=0.0),
+        "read_errors": read_errors[0],
+        "rows_per_s": written[0] / args.seconds,
+        "commit_p50_ms": percentile(commit_latencies, 50),
+        "commit_p99_ms": percentile(commit_latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--write-interval", type=float, default=0.05,
+                        help="pause between batches, like the write-behind flush interval under load")
+    parser.add_argument("--seed-rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in ("default", "sqlite"):
+            result = run_profile(profile, directory, args)
+            print(f"{profile:8} reads {result['reads_per_s']:7.0f}/s  p50 {result['read_p50_ms']:6.2f} ms  "
+                  f"p99 {result['read_p99_ms']:7.2f} ms  max {result['read_max_ms']:7.2f} ms  "
+                  f"errors {result['read_errors']:3d} | writes {result['rows_per_s']:7.0f} rows/s  "
+                  f"commit p50 {result['commit_p50_ms']:6.2f} ms  p99 {result['commit_p99_ms']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark: session journal append cost, group commit, and replay at 100k events
+
+Writes --events synthetic session events (starts, lyric updates, single-choice appends, ends) to a
+journal in a temporary directory, as a busy worker would: appends on the event loop while the
+background writer commits with fsync. Then replays the journal into a fresh InMemorySessionStore,
+as a restarted worker does, and reports events/s for each step.
+    python -m benchmarks.bench_journal [--events 100000] [--sessions 5000] [--finished 0.5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from journal import SessionJournal
+from session_store import InMemorySessionStore
+
+
+def session_fields(rng: random.Random) -> dict:
+    start_time = time.time()
+    return {
+        "player_name": "bench",
+        "difficulty": "medium",
+        "start_time": start_time,
+        "current_lyric_index": 0,
+        "current_lyric_id": f"lyric-{rng.randrange(200)}",
+        "current_lyric": "I'm racing through the night, my rhymes are burning",
+        "lyric_sampler": {"difficulty": "medium", "start": rng.randrange(200), "step": 7, "position": 1},
+        "lyric_delivered_at": start_time * 1000,
+        "beat_period": 600.0,
+        "clock": {"offset": 12.5, "delay": 40.0, "samples": 3},
+    }
+
+
+def choice_record(rng: random.Random, index: int) -> dict:
+    tap = time.time() * 1000 + index * 1200
+    return {
+        "lyric_id": f"lyric-{rng.randrange(200)}",
+        "chosen_word": rng.choice(["burning", "turning", "learning", "yearning"]),
+        "tap_timestamp": tap,
+        "beat_timestamp": tap + rng.uniform(-60, 60),
+        "timing_offset": rng.uniform(0, 60),
+        "rhyme_accuracy": rng.random(),
+        "tone_score": rng.random(),
+        "beat_accuracy": rng.random(),
+        "reaction_time": rng.uniform(300, 2000),
+    }
+
+
+async def write_events(directory: str, args) -> dict:
+    """Append a mix of events, yielding to the writer as a server would between requests"""
+    rng = random.Random(7)
+    journal = SessionJournal(directory, segment_bytes=args.segment_mb * 1024 * 1024)
+    journal.replay()
+    journal.open()
+    live = [f"session-{i}" for i in range(args.sessions)]
+    progress = {session_id: 0 for session_id in live}
+    next_id = args.sessions
+    for session_id in live:
+        journal.record_start(session_id, session_fields(rng))
+
+    appended = len(live)
+    append_seconds = 0.0
+    start = time.perf_counter()
+    while appended < args.events:
+        session_id = rng.choice(live)
+        step = progress[session_id]
+        begin = time.perf_counter()
+        if step >= 20 and rng.random() < args.finished / 10:
+            journal.record_end(session_id)
+            live.remove(session_id)
+            del progress[session_id]
+            replacement = f"session-{next_id}"
+            next_id += 1
+            journal.record_start(replacement, session_fields(rng))
+            live.append(replacement)
+            progress[replacement] = 0
+            appended += 2
+        elif step % 2:
+            journal.record_update(session_id, {
+                "current_lyric_index": step // 2 + 1, "current_lyric_id": f"lyric-{rng.randrange(200)}",
+                "lyric_delivered_at": time.time() * 1000,
+            })
+            appended += 1
+        else:
+            journal.record_choices(session_id, [choice_record(rng, step)])
+            appended += 1
+        append_seconds += time.perf_counter() - begin
+        if session_id in progress:
+            progress[session_id] = step + 1
+        if appended % 500 < 2:
+            await asyncio.sleep(0)
+    await journal.close()
+    return {
+        "events": appended,
+        "append_us": append_seconds / appended * 1e6,
+        "write_s": time.perf_counter() - start,
+        "commits": journal.stats["commits"],
+        "bytes": journal.stats["bytes"],
+        "live_sessions": len(live),
+    }
+
+
+async def replay(directory: str) -> dict:
+    journal = SessionJournal(directory)
+    store = InMemorySessionStore(ttl=None, journal=journal)
+    start = time.perf_counter()
+    await store.start()
+    seconds = time.perf_counter() - start
+    await store.close()
+    return {"seconds": seconds, "events": journal.stats["replayed_events"], "sessions": len(store),
+            "segments_deleted": journal.stats["segments_deleted"]}
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        written = await write_events(directory, args)
+        segments = [name for name in os.listdir(directory) if name.endswith(".journal")]
+        print(f"appended {written['events']} events for {written['live_sessions']} live sessions: "
+              f"{written['append_us']:.2f} us each on the loop, {written['events'] / written['write_s']:.0f} events/s, "
+              f"{written['commits']} fsync commits, {written['bytes'] / 1e6:.1f} MB in {len(segments)} segments")
+        for attempt in range(args.repeat):
+            replayed = await replay(directory)
+            print(f"replay: {replayed['events']} events -> {replayed['sessions']} sessions in "
+                  f"{replayed['seconds'] * 1000:.0f} ms ({replayed['events'] / replayed['seconds']:.0f} events/s), "
+                  f"{replayed['segments_deleted']} segments compacted away")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--sessions", type=int, default=5000, help="games in progress at any time")
+    parser.add_argument("--finished", type=float, default=0.5, help="how readily a long game ends (0-1)")
+    parser.add_argument("--segment-mb", type=float, default=4.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: cost of the metrics layer and the sampling profiler
+
+Times histogram recording, the ASGI timing middleware around a trivial app, and a scoring
+workload with and without the profiler running.
+    python -m benchmarks.bench_metrics [--seconds 10] [--hz 97]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from metrics import LatencyHistogram, MetricsMiddleware, MetricsRegistry, SamplingProfiler
+from scoring import RhymeScorer, ToneMatcher
+
+WORDS = ["dash", "flash", "cash", "flow", "soul", "steel", "feel", "night", "light", "gold", "river", "hammer"]
+
+
+def per_call_ns(fn, calls: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter_ns() - start) / calls
+
+
+async def plain_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def drive(app, requests: int) -> float:
+    scope = {"type": "http", "method": "POST", "path": "/game/choice", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter_ns()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter_ns() - start) / requests
+
+
+def scoring_workload(seconds: float) -> int:
+    """Uncached rhyme and tone scoring for a fixed time; returns calls completed"""
+    rhyme_scorer = RhymeScorer()
+    tone_matcher = ToneMatcher()
+    calls = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for word in WORDS:
+            for other in WORDS:
+                rhyme_scorer._compute_phonetic_similarity(word, other)
+                tone_matcher._analyze_context_tone(f"like a {other} of {word}")
+                calls += 1
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--hz", type=float, default=97.0)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    histogram = LatencyHistogram()
+    record = per_call_ns(lambda: histogram.record_ns(123456), 1_000_000)
+
+    def timed_block():
+        with histogram.time():
+            pass
+    timed = per_call_ns(timed_block, 1_000_000)
+    print(f"histogram.record_ns: {record:7.0f} ns   timed block: {timed:7.0f} ns")
+
+    plain = asyncio.run(drive(plain_app, 200_000))
+    wrapped = asyncio.run(drive(MetricsMiddleware(plain_app, MetricsRegistry()), 200_000))
+    print(f"ASGI request: {plain / 1000:6.2f} us bare, {wrapped / 1000:6.2f} us with middleware "
+          f"(+{(wrapped - plain) / 1000:.2f} us per request)")
+
+    # Alternate short rounds so drift on a shared machine hits both sides equally
+    bare_rounds = []
+    profiled_rounds = []
+    profiler = SamplingProfiler(hz=args.hz)
+    profiled_ns = 0
+    for _ in range(args.rounds):
+        bare_rounds.append(scoring_workload(args.seconds / args.rounds))
+        start = time.perf_counter_ns()
+        profiler.start()
+        profiled_rounds.append(scoring_workload(args.seconds / args.rounds))
+        profiler.stop()
+        profiled_ns += time.perf_counter_ns() - start
+    bare = statistics.median(bare_rounds)
+    profiled = statistics.median(profiled_rounds)
+    print(f"scoring throughput (median of {args.rounds} rounds): {bare:9.0f} calls/round bare, "
+          f"{profiled:9.0f} profiled at {args.hz:g} Hz ({(bare - profiled) / bare * 100:+.2f}%)")
+    print(f"profiler: {sum(profiler.samples.values())} samples in {len(profiler.samples)} stacks, "
+          f"sampling took {profiler.busy_ns / profiled_ns * 100:.2f}% of the profiled wall time")
+
+
+if __name__ == "__main__":
+    main()
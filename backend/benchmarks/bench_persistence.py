@@ -0,0 +1,88 @@
+"""
+Benchmark: GameChoice insert throughput, per-row ORM commits vs. the write-behind queue
+
+Run from the backend directory:
+    python -m benchmarks.bench_persistence [--rows 20000] [--database-url sqlite:///...]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from persistence import WriteBehindQueue
+
+
+def make_row(i: int) -> dict:
+    return {
+        "session_id": f"session_{i // 40}",
+        "lyric_id": f"lyric_{i % 3}",
+        "chosen_word": "dash",
+        "correct_word": "dash",
+        "tap_timestamp": 1000.0 * i,
+        "beat_timestamp": 1000.0 * i + 40,
+        "timing_offset": 40.0,
+        "rhyme_accuracy": 0.9,
+        "beat_accuracy": 0.92,
+        "tone_score": 1.0,
+        "created_at": datetime.utcnow()
+    }
+
+
+def per_row(session_factory, rows: int) -> float:
+    """One ORM object and one commit per tap, as a handler writing inline would"""
+    start = time.perf_counter()
+    db = session_factory()
+    try:
+        for i in range(rows):
+            db.add(models.GameChoice(**make_row(i)))
+            db.commit()
+    finally:
+        db.close()
+    return time.perf_counter() - start
+
+
+def write_behind(session_factory, rows: int, batch_size: int) -> float:
+    queue = WriteBehindQueue(session_factory, batch_size=batch_size, flush_interval=0.05,
+                             max_pending=rows)
+    queue.start()
+    start = time.perf_counter()
+    for i in range(rows):
+        queue.put_nowait(models.GameChoice, make_row(i))
+    queue.close()
+    elapsed = time.perf_counter() - start
+    assert queue.stats["rows_written"] == rows, queue.stats
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--per-row-rows", type=int, default=2000,
+                        help="Rows for the (slow) per-row baseline")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        url = args.database_url or "sqlite:///" + os.path.join(workdir, "bench.db")
+        engine = create_engine(url)
+        models.Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        
+        baseline = per_row(session_factory, args.per_row_rows)
+        batched = write_behind(session_factory, args.rows, args.batch_size)
+        
+        baseline_rate = args.per_row_rows / baseline
+        batched_rate = args.rows / batched
+        print(f"per-row commits: {baseline_rate:10.0f} rows/s")
+        print(f"write-behind:    {batched_rate:10.0f} rows/s  ({batched_rate / baseline_rate:.1f}x, batch={args.batch_size})")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: worker boot cost of parsing a CMUdict text file vs. mapping the compiled dictionary
+
+Run from the backend directory:
+    python -m benchmarks.bench_phonetics [--words 130000] [--dict path/to/cmudict.dict]
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+from phonetics import PronouncingDictionary, PronunciationBackend, compile_cmudict, parse_cmudict
+
+CONSONANTS = ["B", "D", "F", "G", "K", "L", "M", "N", "P", "R", "S", "SH", "T", "V", "Z"]
+VOWELS = ["AA", "AE", "AH", "EH", "ER", "IH", "IY", "OW", "UW"]
+
+
+def write_synthetic_dict(path: str, count: int, seed: int):
+    rng = random.Random(seed)
+    seen = set()
+    with open(path, "w") as out:
+        while len(seen) < count:
+            word = "".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(3, 10)))
+            if word in seen:
+                continue
+            seen.add(word)
+            phones = []
+            for syllable in range(rng.randint(1, 3)):
+                stress = "1" if syllable == 0 else "0"
+                phones += [rng.choice(CONSONANTS), rng.choice(VOWELS) + stress]
+            phones.append(rng.choice(CONSONANTS))
+            out.write(f"{word}  {' '.join(phones)}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", type=int, default=130000)
+    parser.add_argument("--dict", help="Use a real CMUdict file instead of a synthetic one")
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        source = args.dict or os.path.join(workdir, "synthetic.dict")
+        if not args.dict:
+            write_synthetic_dict(source, args.words, seed=11)
+        compiled = os.path.join(workdir, "dict.bin")
+        
+        start = time.perf_counter()
+        table = {word: phones for word, phones in parse_cmudict(source)}
+        parse_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        compile_cmudict(source, compiled)
+        compile_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        dictionary = PronouncingDictionary(compiled)
+        open_time = time.perf_counter() - start
+        
+        words = random.Random(3).choices(list(table), k=args.lookups)
+        backend = PronunciationBackend(dictionary)
+        start = time.perf_counter()
+        for i in range(0, len(words) - 1):
+            backend.similarity(words[i], words[i + 1])
+        score_time = time.perf_counter() - start
+        
+        print(f"entries: {len(dictionary)}  compiled size: {os.path.getsize(compiled) / 1e6:.1f} MB")
+        print(f"parse text dictionary:  {parse_time * 1000:8.1f} ms per boot")
+        print(f"compile (one time):     {compile_time * 1000:8.1f} ms")
+        print(f"map compiled file:      {open_time * 1000:8.3f} ms per boot")
+        print(f"rime similarity:        {score_time / len(words) * 1e6:8.2f} us/pair")
+        
+        dictionary.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Load test: how many race rooms and players one worker sustains
+
+For each room count, starts a fresh uvicorn worker (against a throwaway SQLite file) unless --url
+is given, fills every room with --players websocket racers and runs one race. Racers answer each
+lyric after a human-like pause. A step is sustained while tick lateness p99 stays under one tick
+and feedback p99 under --budget-ms. The load generator shares the machine, so treat results as a floor.
+    python -m benchmarks.bench_race_rooms [--rooms 5,10,20,40] [--players 8] [--seconds 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+import websockets
+
+from benchmarks.bench_websocket import BACKEND_DIR, free_port, percentile, wait_until_up
+from game_protocol import (
+    OP_CHOICE, OP_CLOCK, OP_ERROR, OP_FEEDBACK, OP_GO, OP_JOIN, OP_LYRIC, OP_RACE_RESULT, OP_ROSTER,
+    OP_STANDINGS
+)
+from race_rooms import TICK_INTERVAL
+
+
+class RacerStats:
+    def __init__(self):
+        self.feedback: List[float] = []
+        self.standings_frames = 0
+        self.errors = 0
+        self.finished = 0
+
+
+async def racer(ws_url: str, room_id: str, players: int, starts: bool, think: float, stats: RacerStats):
+    async with websockets.connect(f"{ws_url}/race/ws/{room_id}", max_queue=None) as ws:
+        await ws.send(json.dumps([OP_JOIN, "bench"]))
+        sent_at: Dict[str, float] = {}
+        answering = None
+
+        async def answer(lyric_id: str, word: str):
+            await asyncio.sleep(random.uniform(think / 2, think * 1.5))
+            sent_at[lyric_id] = time.perf_counter()
+            await ws.send(json.dumps([OP_CHOICE, lyric_id, word, time.time() * 1000, 0]))
+
+        async for text in ws:
+            message = json.loads(text)
+            opcode = message[0]
+            if opcode == OP_STANDINGS:
+                stats.standings_frames += 1
+            elif opcode == OP_CLOCK:
+                await ws.send(json.dumps([OP_CLOCK, message[1], time.time() * 1000]))
+            elif opcode == OP_LYRIC:
+                if answering is not None:
+                    answering.cancel()
+                answering = asyncio.create_task(answer(message[1], message[4]))
+            elif opcode == OP_FEEDBACK:
+                if sent_at:
+                    stats.feedback.append(time.perf_counter() - sent_at.popitem()[1])
+            elif opcode == OP_ROSTER:
+                if starts and len(message[1]) == players:
+                    starts = False
+                    await ws.send(json.dumps([OP_GO]))
+            elif opcode == OP_RACE_RESULT:
+                stats.finished += 1
+                break
+            elif opcode == OP_ERROR:
+                stats.errors += 1
+        if answering is not None:
+            answering.cancel()
+
+
+async def run_step(url: str, rooms: int, args) -> Dict[str, float]:
+    async with httpx.AsyncClient(base_url=url) as client:
+        room_ids = [
+            (await client.post("/race/rooms", json={"capacity": args.players})).json()["room_id"]
+            for _ in range(rooms)
+        ]
+        stats = RacerStats()
+        ws_url = "ws" + url[len("http"):]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            racer(ws_url, room_id, args.players, i == 0, args.think, stats)
+            for room_id in room_ids for i in range(args.players)
+        ), return_exceptions=True)
+        elapsed = time.perf_counter() - start
+        server = (await client.get("/admin/rooms")).json()
+        latency = (await client.get("/admin/latency")).json()
+
+    ticks = latency.get("race_tick_lateness_seconds", [{}])[0]
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        print(f"  first failure: {failures[0]!r}")
+    players = rooms * args.players
+    return {
+        "players": players,
+        "feedback_p50_ms": percentile(stats.feedback, 50) * 1000 if stats.feedback else float("nan"),
+        "feedback_p99_ms": percentile(stats.feedback, 99) * 1000 if stats.feedback else float("nan"),
+        "standings_per_player_s": stats.standings_frames / players / elapsed,
+        "tick_p99_ms": ticks.get("p99", 0.0) * 1000,
+        "frames_encoded": server["frames_encoded"],
+        "frames_sent": server["frames_sent"],
+        "frames_dropped": server["frames_dropped"],
+        "unfinished": players - stats.finished,
+        "errors": stats.errors + len(failures),
+    }
+
+
+async def main(args):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    print(f"{args.players} players per room, {args.seconds:.0f} s races, {TICK_INTERVAL * 1000:.0f} ms ticks")
+
+    for rooms in [int(count) for count in args.rooms.split(",")]:
+        server = None
+        url = args.url
+        if url is None:
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            db_dir = tempfile.mkdtemp()
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'bench.db')}",
+                       RACE_SECONDS=str(args.seconds))
+            subprocess.run([sys.executable, "migrate.py"], cwd=BACKEND_DIR, env=env, check=True,
+                           stdout=subprocess.DEVNULL)
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+                 "--backlog", "4096"],
+                cwd=BACKEND_DIR, env=env
+            )
+        try:
+            await wait_until_up(url)
+            result = await run_step(url, rooms, args)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        sustained = result["tick_p99_ms"] < TICK_INTERVAL * 1000 and result["feedback_p99_ms"] < args.budget_ms \
+            and not result["unfinished"]
+        print(f"{rooms:4d} rooms {result['players']:5d} players  "
+              f"feedback p50 {result['feedback_p50_ms']:7.2f} ms  p99 {result['feedback_p99_ms']:7.2f} ms  "
+              f"tick lateness p99 {result['tick_p99_ms']:6.2f} ms  "
+              f"standings {result['standings_per_player_s']:5.1f}/s per player  "
+              f"frames encoded {result['frames_encoded']:6d} sent {result['frames_sent']:7d} "
+              f"dropped {result['frames_dropped']:6d}  "
+              f"{'sustained' if sustained else 'OVERLOADED'}"
+              + (f"  ({result['unfinished']} unfinished, {result['errors']} errors)"
+                 if result["unfinished"] or result["errors"] else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rooms", default="5,10,20,40", help="comma-separated room counts to step through")
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds a racer takes to answer")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="feedback p99 a sustained step must meet")
+    parser.add_argument("--url", help="Base URL of a running server (RACE_SECONDS must match --seconds)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,158 @@
+"""
+Benchmark: requests per second per core for /game/choice, lean path versus the Pydantic path
+
+Calls the app in-process through raw ASGI messages (no client, no sockets; scratch SQLite). The
+"pydantic" route is registered by this benchmark and does the same scoring as /game/choice, but
+validates a PlayerChoice model and returns a dict through FastAPI's default JSONResponse, as the
+route did before. Throughput is requests per CPU second of this process. Also times decoding and
+encoding alone.
+    python -m benchmarks.bench_response_path [--requests 20000] [--repeat 3]
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.suite import isolate_app
+
+
+def add_pydantic_route(main):
+    """/game/choice as written before the lean path: a Pydantic body and a dict response"""
+    @main.app.post("/game/choice-pydantic")
+    async def submit_choice_pydantic(choice: main.PlayerChoice):
+        received_at = main.server_time_ms()
+        main.check_session_rate(choice.session_id)
+        session = await main.session_store.get(choice.session_id)
+        if session is None:
+            raise main.HTTPException(status_code=404, detail="Session not found")
+        choice_record = await main.record_choice(
+            choice.session_id, session, choice.lyric_id, choice.chosen_word, choice.tap_timestamp,
+            main.ClockOffsetEstimator.from_dict(session.get("clock")), received_at
+        )
+        return pydantic_response(main, choice_record)
+
+
+def pydantic_response(main, choice_record: Dict) -> Dict:
+    feedback = main.feedback_for(choice_record)
+    return {
+        "feedback": {"message": feedback.message, "speed_boost": feedback.speed_boost, "color": feedback.color},
+        "metrics": {
+            "rhyme_accuracy": choice_record["rhyme_accuracy"],
+            "beat_accuracy": choice_record["beat_accuracy"],
+            "tone_score": choice_record["tone_score"],
+            "timing_offset": choice_record["timing_offset"]
+        },
+        "speed_boost": feedback.speed_boost
+    }
+
+
+async def call(app, path: str, body: bytes) -> bytes:
+    """One POST straight through the ASGI interface"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    chunks: List[bytes] = []
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        else:
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    if status[0] != 200:
+        raise RuntimeError(f"{path} answered {status[0]}: {b''.join(chunks)[:200]!r}")
+    return b"".join(chunks)
+
+
+async def throughput(app, path: str, bodies: List[bytes]) -> float:
+    """Requests per CPU second"""
+    for body in bodies[:200]:
+        await call(app, path, body)
+    start = time.process_time()
+    for body in bodies:
+        await call(app, path, body)
+    return len(bodies) / (time.process_time() - start)
+
+
+def codec_timings(main, body: bytes, choice_record: Dict, repeat: int = 20000) -> Dict[str, float]:
+    """ns per decode and per encode, each way"""
+    from fast_json import FastJSONResponse, decode_body, object_fields
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    def timed(fn) -> float:
+        start = time.perf_counter_ns()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter_ns() - start) / repeat
+
+    return {
+        "decode_pydantic": timed(lambda: main.PlayerChoice.model_validate_json(body)),
+        "decode_lean": timed(lambda: main.ChoiceInput(*object_fields(decode_body(body), main.CHOICE_FIELDS))),
+        "encode_pydantic": timed(lambda: JSONResponse(jsonable_encoder(pydantic_response(main, choice_record)))),
+        "encode_lean": timed(lambda: FastJSONResponse(main.choice_response(choice_record))),
+    }
+
+
+async def run(args):
+    import database
+    import main
+
+    database.init_db()
+    add_pydantic_route(main)
+    async with main.app.router.lifespan_context(main.app):
+        lyric = json.loads(await call(main.app, "/game/start", b'{"player_name":"bench","difficulty":"medium"}'))
+        bodies = [
+            json.dumps({
+                "session_id": lyric["session_id"], "lyric_id": lyric["lyric_id"],
+                "chosen_word": lyric["options"][i % len(lyric["options"])], "tap_timestamp": time.time() * 1000 + i
+            }).encode()
+            for i in range(args.requests)
+        ]
+        # Scores depend on arrival time, so only the shapes can be compared
+        lean = json.loads(await call(main.app, "/game/choice", bodies[0]))
+        pydantic = json.loads(await call(main.app, "/game/choice-pydantic", bodies[0]))
+        assert list(lean) == list(pydantic) and list(lean["metrics"]) == list(pydantic["metrics"])
+        assert list(lean["feedback"]) == list(pydantic["feedback"])
+
+        from fast_json import JSON_BACKEND
+        print(f"JSON backend: {JSON_BACKEND}")
+        best: Dict[str, float] = {}
+        for _ in range(args.repeat):
+            for label, path in (("pydantic", "/game/choice-pydantic"), ("lean", "/game/choice")):
+                best[label] = max(best.get(label, 0.0), await throughput(main.app, path, bodies))
+        for label, rate in best.items():
+            print(f"  {label:8} {rate:8.0f} requests/s per core")
+        print(f"  lean path is {best['lean'] / best['pydantic'] - 1:+.0%}")
+
+        choice_record = dict(zip(("rhyme_accuracy", "beat_accuracy", "tone_score", "timing_offset"),
+                                 (0.8, 0.6, 0.5, 12.5)))
+        timings = codec_timings(main, bodies[0], choice_record)
+        for step in ("decode", "encode"):
+            before, after = timings[f"{step}_pydantic"], timings[f"{step}_lean"]
+            print(f"  {step}: pydantic {before:7.0f} ns  lean {after:7.0f} ns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        isolate_app(directory)
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Microbenchmark: indexed RhymeScorer vs. the original linear pattern scan
+
+Run from the backend directory:
+    python -m benchmarks.bench_rhyme_index [--words 50000] [--pairs 2000]
+"""
+import argparse
+import difflib
+import random
+import string
+import time
+from typing import Dict, List, Tuple
+
+from scoring import RhymeScorer
+
+
+class LinearScanRhymeScorer(RhymeScorer):
+    """The pre-index scorer: walks every pattern list on each call"""
+    
+    def _calculate_phonetic_similarity(self, word1: str, word2: str) -> float:
+        word1_clean = word1.lower().strip()
+        word2_clean = word2.lower().strip()
+        
+        if word1_clean == word2_clean:
+            return 1.0
+        
+        for pattern, rhymes in self.rhyme_patterns.items():
+            if word1_clean in rhymes and word2_clean in rhymes:
+                return 0.9
+            elif word1_clean in rhymes or word2_clean in rhymes:
+                if word1_clean.endswith(pattern) and word2_clean.endswith(pattern):
+                    return 0.8
+        
+        similarity = difflib.SequenceMatcher(None, word1_clean, word2_clean).ratio()
+        if word1_clean[-2:] == word2_clean[-2:]:
+            similarity += 0.2
+        
+        return min(1.0, similarity)
+
+
+def build_vocabulary(total_words: int, class_size: int, seed: int) -> Dict[str, List[str]]:
+    """Synthesize rhyme classes of onset + rime words"""
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase
+    patterns: Dict[str, List[str]] = {}
+    seen = set()
+    
+    while len(seen) < total_words:
+        rime = "".join(rng.choice(letters) for _ in range(rng.randint(2, 4)))
+        if rime in patterns:
+            continue
+        words = []
+        while len(words) < class_size and len(seen) < total_words:
+            word = "".join(rng.choice(letters) for _ in range(rng.randint(1, 4))) + rime
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+        patterns[rime] = words
+    
+    return patterns
+
+
+def sample_pairs(patterns: Dict[str, List[str]], count: int, seed: int) -> List[Tuple[str, str]]:
+    """Mix of same-class rhymes, cross-class pairs and unknown words"""
+    rng = random.Random(seed)
+    classes = list(patterns.values())
+    pairs = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            rhymes = rng.choice(classes)
+            pairs.append((rng.choice(rhymes), rng.choice(rhymes)))
+        elif kind == 1:
+            pairs.append((rng.choice(rng.choice(classes)), rng.choice(rng.choice(classes))))
+        else:
+            pairs.append((rng.choice(rng.choice(classes)), "zzq" + str(i)))
+    return pairs
+
+
+def time_calls(fn, pairs: List[Tuple[str, str]]) -> float:
+    start = time.perf_counter()
+    for word1, word2 in pairs:
+        fn(word1, word2)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", type=int, default=50000)
+    parser.add_argument("--class-size", type=int, default=100)
+    parser.add_argument("--pairs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    
+    patterns = build_vocabulary(args.words, args.class_size, args.seed)
+    pairs = sample_pairs(patterns, args.pairs, args.seed)
+    
+    start = time.perf_counter()
+    indexed = RhymeScorer(rhyme_patterns=patterns)
+    build_time = time.perf_counter() - start
+    linear = LinearScanRhymeScorer(rhyme_patterns=patterns)
+    
+    # Both scorers must agree before their timings mean anything
+    for word1, word2 in pairs:
+        expected = linear._calculate_phonetic_similarity(word1, word2)
+        actual = indexed._calculate_phonetic_similarity(word1, word2)
+        assert expected == actual, (word1, word2, expected, actual)
+    indexed._similarity_cache.cache_clear()
+    
+    linear_time = time_calls(linear._calculate_phonetic_similarity, pairs)
+    uncached_time = time_calls(indexed._compute_phonetic_similarity, pairs)
+    cold_time = time_calls(indexed._calculate_phonetic_similarity, pairs)
+    warm_time = time_calls(indexed._calculate_phonetic_similarity, pairs)
+    
+    print(f"vocabulary: {len(indexed.rhyme_index)} words in {len(patterns)} classes")
+    print(f"index build: {build_time * 1000:.1f} ms")
+    for label, elapsed in (
+        ("linear scan", linear_time),
+        ("index, no cache", uncached_time),
+        ("index, cold cache", cold_time),
+        ("index, warm cache", warm_time),
+    ):
+        per_call = elapsed / len(pairs) * 1e6
+        print(f"{label:>18}: {per_call:10.2f} us/pair  ({linear_time / elapsed:8.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: event loop stalls from expensive scoring, inline versus the process pool
+
+Scores a burst of long-word choices (difflib is quadratic below its 200-character autojunk
+threshold) while a ticker coroutine measures how late the event loop wakes it.
+    python -m benchmarks.bench_scoring_pool [--choices 400] [--length 199] [--workers 4]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import string
+import time
+from typing import List, Tuple
+
+from scoring import GameScorer
+from scoring_pool import ScoringPool
+
+TICK_SECONDS = 0.001
+
+
+def long_choices(count: int, length: int, seed: int) -> List[Tuple[str, str]]:
+    """Unique (word, context) pairs, so every score misses the similarity cache"""
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase[:12]
+    choices = []
+    for _ in range(count):
+        word = "".join(rng.choice(letters) for _ in range(length))
+        target = "".join(rng.choice(letters) for _ in range(length))
+        choices.append((word, f"I keep it moving like {target} ___"))
+    return choices
+
+
+async def measure(score, choices: List[Tuple[str, str]]) -> Tuple[float, List[float]]:
+    """Wall time to score every choice concurrently, and the ticker's lateness samples in ms"""
+    lags: List[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append((time.perf_counter() - start - TICK_SECONDS) * 1000)
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await asyncio.gather(*(score(word, context) for word, context in choices))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticking
+    return elapsed, lags
+
+
+def report(label: str, elapsed: float, lags: List[float], count: int):
+    p99 = statistics.quantiles(lags, n=100, method="inclusive")[98] if len(lags) > 1 else lags[0]
+    print(f"{label:8} {count / elapsed:8.0f} choices/s   loop lag p50 {statistics.median(lags):7.2f} ms   "
+          f"p99 {p99:7.2f} ms   max {max(lags):7.2f} ms")
+
+
+async def run(args):
+    scorer = GameScorer()
+    inline_choices = long_choices(args.choices, args.length, seed=1)
+    pool_choices = long_choices(args.choices, args.length, seed=2)
+
+    async def score_inline(word: str, context: str):
+        scorer.rhyme_scorer.calculate_rhyme_accuracy(word, context)
+        scorer.tone_matcher.calculate_tone_match(word, context)
+
+    elapsed, lags = await measure(score_inline, inline_choices)
+    report("inline", elapsed, lags, args.choices)
+
+    pool = ScoringPool(scorer, workers=args.workers, timeout=args.timeout)
+    start = time.perf_counter()
+    await pool.start()
+    print(f"pool of {pool.workers} started in {(time.perf_counter() - start) * 1000:.0f} ms")
+    try:
+        elapsed, lags = await measure(pool.score, pool_choices)
+        report("pool", elapsed, lags, args.choices)
+    finally:
+        pool.close()
+    print(f"pool stats: {pool.stats}")
+
+    cheap = ("flash", "I keep it moving like a dash ___")
+    start = time.perf_counter_ns()
+    for _ in range(100_000):
+        pool.is_cheap(*cheap)
+    print(f"fast-path check: {(time.perf_counter_ns() - start) / 100_000:.0f} ns per choice")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--choices", type=int, default=400)
+    parser.add_argument("--length", type=int, default=199)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
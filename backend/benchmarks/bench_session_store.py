@@ -0,0 +1,76 @@
+"""
+Benchmark: session store round trips for a start -> N choices -> end game
+
+Uses the embedded fake server unless --redis-url points at a real Redis.
+    python -m benchmarks.bench_session_store [--sessions 500] [--choices 40]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from benchmarks.fake_redis import FakeRedisServer
+from session_store import InMemorySessionStore, SessionStore, create_session_store
+
+CHOICE = {
+    "lyric_id": "lyric_0",
+    "chosen_word": "dash",
+    "tap_timestamp": 1000.0,
+    "beat_timestamp": 1040.0,
+    "timing_offset": 40.0,
+    "rhyme_accuracy": 0.9,
+    "tone_score": 1.0,
+    "beat_accuracy": 0.92
+}
+
+
+async def play(store: SessionStore, choices: int):
+    session_id = str(uuid.uuid4())
+    await store.create(session_id, {"player_name": "bench", "difficulty": "medium",
+                                    "start_time": time.time(), "current_lyric_index": 0})
+    for _ in range(choices):
+        assert await store.get(session_id) is not None
+        await store.append_choices(session_id, [CHOICE])
+    session = await store.pop(session_id)
+    assert len(session["choices"]) == choices
+
+
+async def run(store: SessionStore, sessions: int, choices: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def bounded():
+        async with semaphore:
+            await play(store, choices)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded() for _ in range(sessions)))
+    return time.perf_counter() - start
+
+
+async def main(args):
+    games = [("memory", InMemorySessionStore())]
+    if args.redis_url:
+        games.append(("redis", create_session_store(args.redis_url, max_connections=args.pool)))
+        fake = None
+    else:
+        fake = await FakeRedisServer().start()
+        games.append(("fake redis", create_session_store(fake.url, max_connections=args.pool)))
+    
+    operations = args.sessions * (2 * args.choices + 2)
+    for label, store in games:
+        elapsed = await run(store, args.sessions, args.choices, args.concurrency)
+        print(f"{label:>10}: {args.sessions / elapsed:9.1f} games/s  {operations / elapsed:10.1f} store ops/s")
+        await store.close()
+    
+    if fake is not None:
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--choices", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pool", type=int, default=10)
+    parser.add_argument("--redis-url")
+    asyncio.run(main(parser.parse_args()))
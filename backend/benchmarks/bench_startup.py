@@ -0,0 +1,94 @@
+"""
+Benchmark: worker startup, from interpreter launch to the first HTTP response
+
+For each mode, times a bare `import main` and a uvicorn worker from launch to its first 200,
+against a scratch SQLite database. --dict-words adds a synthetic pronunciation dictionary so
+the scorers have real tables to load.
+    python -m benchmarks.bench_startup [--runs 5] [--dict-words 130000]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.bench_phonetics import write_synthetic_dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {
+    "lazy": {},
+    "preload": {"PRELOAD_SCORERS": "1"},
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import(env) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=BACKEND_DIR, env=env, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def time_first_response(env, timeout: float = 60.0) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError("server did not answer in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--dict-words", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "migrate.py"], cwd=BACKEND_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        print(f"schema migration: {(time.perf_counter() - start) * 1000:.0f} ms (once per deployment)")
+
+        if args.dict_words:
+            path = os.path.join(directory, "cmudict.txt")
+            write_synthetic_dict(path, args.dict_words, seed=1)
+            env["RHYME_DICT_PATH"] = path
+            # The first load compiles the text file; every run after that maps the compiled copy
+            time_import(dict(env, PRELOAD_SCORERS="1"))
+
+        for mode, overrides in MODES.items():
+            mode_env = dict(env, **overrides)
+            imports = [time_import(mode_env) for _ in range(args.runs)]
+            responses = [time_first_response(mode_env) for _ in range(args.runs)]
+            print(f"{mode:8} import main {statistics.median(imports):6.0f} ms   "
+                  f"launch to first response {statistics.median(responses):6.0f} ms   "
+                  f"(median of {args.runs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark: frontend page loads, the old per-request FileResponse server versus StaticAssets
+
+Builds a synthetic Create React App build (index.html, a hashed JS bundle and stylesheet) in a
+temporary directory and precompresses it, then requests each page-load file in-process through
+raw ASGI calls. The old server is the catch-all route the Docker image used to generate.
+Reports requests/s and bytes sent per page load, first visit and repeat visit.
+    python -m benchmarks.bench_static [--bundle-kb 700] [--loads 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import FileResponse
+
+from static_assets import StaticAssets, StaticFrontend, precompress
+
+PAGE = ["/", "/static/js/main.3f2a1b9c.js", "/static/css/main.5d6e7f80.css", "/favicon.ico"]
+
+
+def make_build(directory: str, bundle_kb: int):
+    rng = random.Random(1)
+    tokens = ["function", "const", "return", "useState", "props", "=>", "{", "}", "rhyme", "beat", "score"]
+    os.makedirs(os.path.join(directory, "static", "js"))
+    os.makedirs(os.path.join(directory, "static", "css"))
+    with open(os.path.join(directory, "index.html"), "w") as handle:
+        handle.write('<!doctype html><html><head><link href="/static/css/main.5d6e7f80.css" rel="stylesheet">'
+                     '</head><body><div id="root"></div><script src="/static/js/main.3f2a1b9c.js"></script>'
+                     + "<meta name=\"x\" content=\"rhyme racer\">" * 40 + "</body></html>")
+    bundle = []
+    size = 0
+    while size < bundle_kb * 1024:
+        token = rng.choice(tokens) + rng.choice(" ;\n")
+        bundle.append(token)
+        size += len(token)
+    with open(os.path.join(directory, "static", "js", "main.3f2a1b9c.js"), "w") as handle:
+        handle.write("".join(bundle))
+    with open(os.path.join(directory, "static", "css", "main.5d6e7f80.css"), "w") as handle:
+        handle.write("".join(f".c{i}{{color:#{i % 4096:03x};margin:{i % 9}px}}" for i in range(3000)))
+    with open(os.path.join(directory, "favicon.ico"), "wb") as handle:
+        handle.write(bytes(rng.randrange(256) for _ in range(3000)))
+
+
+def old_server(directory: str) -> FastAPI:
+    """What the Docker image used to generate as serve.py, minus the API"""
+    app = FastAPI()
+
+    @app.get("/")
+    async def serve_frontend():
+        return FileResponse(f"{directory}/index.html")
+
+    @app.get("/{full_path:path}")
+    async def serve_static(full_path: str):
+        if os.path.exists(f"{directory}/{full_path}"):
+            return FileResponse(f"{directory}/{full_path}")
+        return FileResponse(f"{directory}/index.html")
+
+    return app
+
+
+async def get(app, path: str, headers: List[Tuple[bytes, bytes]]) -> Tuple[int, Dict[bytes, bytes], int]:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": headers,
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status = 0
+    response_headers: Dict[bytes, bytes] = {}
+    sent = 0
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client stays connected; file responses wait here for a disconnect that never comes
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status, sent
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update(message["headers"])
+        elif message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, response_headers, sent
+
+
+async def page_loads(app, loads: int, etags: Optional[Dict[str, bytes]] = None) -> Tuple[float, float]:
+    """(requests/s, bytes per page load); with `etags`, every request revalidates like a repeat visit"""
+    sent = 0
+    start = time.perf_counter()
+    for _ in range(loads):
+        for path in PAGE:
+            headers = [(b"accept-encoding", b"gzip, deflate, br")]
+            if etags is not None and path in etags:
+                headers.append((b"if-none-match", etags[path]))
+            _, _, body_bytes = await get(app, path, headers)
+            sent += body_bytes
+    elapsed = time.perf_counter() - start
+    return loads * len(PAGE) / elapsed, sent / loads
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        make_build(directory, args.bundle_kb)
+        precompress(directory)
+        servers = {"old": old_server(directory), "static_assets": StaticFrontend(StaticAssets(directory))}
+        for label, app in servers.items():
+            etags = {}
+            for path in PAGE:
+                _, headers, _ = await get(app, path, [(b"accept-encoding", b"gzip, deflate, br")])
+                if b"etag" in headers:
+                    etags[path] = headers[b"etag"]
+            first_rate, first_bytes = await page_loads(app, args.loads)
+            repeat_rate, repeat_bytes = await page_loads(app, args.loads, etags)
+            print(f"{label:14} first visit {first_rate:8.0f} requests/s {first_bytes / 1024:8.1f} KB/page   "
+                  f"repeat visit {repeat_rate:8.0f} requests/s {repeat_bytes / 1024:8.1f} KB/page")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bundle-kb", type=int, default=700)
+    parser.add_argument("--loads", type=int, default=2000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
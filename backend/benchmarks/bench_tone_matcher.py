@@ -0,0 +1,130 @@
+"""
+Microbenchmark: memoized ToneMatcher vs. the original per-call scans
+
+Replays taps from many players against a shared set of lyrics, the way live traffic does.
+    python -m benchmarks.bench_tone_matcher [--lyrics 500] [--taps 200000]
+"""
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+from scoring import DEFAULT_TONE_CATEGORIES, ToneMatcher
+
+
+class ScanningToneMatcher:
+    """The pre-index matcher: scans every category on each call"""
+
+    def __init__(self):
+        self.tone_categories = DEFAULT_TONE_CATEGORIES
+
+    def calculate_tone_match(self, chosen_word: str, lyric_context: str) -> float:
+        if not chosen_word or not lyric_context:
+            return 0.0
+        context_tone = self._analyze_context_tone(lyric_context)
+        word_tone = self._analyze_word_tone(chosen_word)
+        if context_tone == word_tone:
+            return 1.0
+        elif self._are_compatible_tones(context_tone, word_tone):
+            return 0.7
+        else:
+            return 0.3
+
+    def _analyze_context_tone(self, context: str) -> str:
+        context_lower = context.lower()
+        for tone, words in self.tone_categories.items():
+            if any(word in context_lower for word in words):
+                return tone
+        if any(word in context_lower for word in ["fast", "quick", "speed"]):
+            return "energetic"
+        elif any(word in context_lower for word in ["flow", "smooth", "river"]):
+            return "smooth"
+        elif any(word in context_lower for word in ["hard", "hit", "hammer"]):
+            return "powerful"
+        else:
+            return "neutral"
+
+    def _analyze_word_tone(self, word: str) -> str:
+        word_lower = word.lower()
+        for tone, words in self.tone_categories.items():
+            if word_lower in words:
+                return tone
+        return "neutral"
+
+    def _are_compatible_tones(self, tone1: str, tone2: str) -> bool:
+        compatible_pairs = [
+            ("energetic", "powerful"),
+            ("smooth", "emotional"),
+            ("positive", "energetic"),
+            ("positive", "smooth"),
+            ("negative", "emotional")
+        ]
+        return (tone1, tone2) in compatible_pairs or (tone2, tone1) in compatible_pairs
+
+
+FILLER = ("I", "keep", "moving", "through", "the", "night", "with", "a", "river", "hit", "hard",
+          "rhythm", "on", "my", "mind", "like", "every", "beat", "we", "drop")
+
+
+def build_lyrics(count: int, seed: int) -> List[Tuple[str, str]]:
+    """(lyric id, text) pairs; some mention a tone word, some only fallback hints, some neither"""
+    rng = random.Random(seed)
+    tone_words = [word for words in DEFAULT_TONE_CATEGORIES.values() for word in words]
+    lyrics = []
+    for i in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(6, 12))]
+        if i % 3 == 0:
+            words.insert(rng.randrange(len(words)), rng.choice(tone_words))
+        lyrics.append((f"lyric_{i}", " ".join(words) + " ___"))
+    return lyrics
+
+
+def build_taps(lyrics: List[Tuple[str, str]], count: int, seed: int) -> List[Tuple[str, str, str]]:
+    rng = random.Random(seed)
+    choices = [word for words in DEFAULT_TONE_CATEGORIES.values() for word in words] + ["cash", "real"]
+    return [(rng.choice(choices), *rng.choice(lyrics)[::-1]) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lyrics", type=int, default=500)
+    parser.add_argument("--taps", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    lyrics = build_lyrics(args.lyrics, args.seed)
+    taps = build_taps(lyrics, args.taps, args.seed)
+    scanning = ScanningToneMatcher()
+
+    # Both matchers must agree before their timings mean anything
+    check = ToneMatcher()
+    for word, context, lyric_id in taps[:5000]:
+        expected = scanning.calculate_tone_match(word, context)
+        assert check.calculate_tone_match(word, context, lyric_id) == expected, (word, context)
+        assert check.calculate_tone_match(word, context) == expected, (word, context)
+
+    start = time.perf_counter()
+    for word, context, _ in taps:
+        scanning.calculate_tone_match(word, context)
+    scan_time = time.perf_counter() - start
+
+    results = [("original scans", scan_time)]
+    for label, keyed in (("memoized, by text", False), ("memoized, by lyric id", True)):
+        matcher = ToneMatcher()
+        start = time.perf_counter()
+        if keyed:
+            for word, context, lyric_id in taps:
+                matcher.calculate_tone_match(word, context, lyric_id)
+        else:
+            for word, context, _ in taps:
+                matcher.calculate_tone_match(word, context)
+        results.append((label, time.perf_counter() - start))
+
+    print(f"{args.taps} taps over {args.lyrics} lyrics")
+    for label, elapsed in results:
+        per_call = elapsed / len(taps) * 1e6
+        print(f"{label:>22}: {per_call:8.3f} us/tap  ({scan_time / elapsed:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
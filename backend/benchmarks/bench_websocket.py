@@ -0,0 +1,204 @@
+"""
+Load test: p50/p99 feedback latency for REST /game/choice versus the /game/ws channel
+
+Starts a uvicorn server in a subprocess (against a throwaway SQLite file) unless --url is given,
+then plays --sessions concurrent games over each transport. Every session taps once per
+--interval seconds; latency is measured from sending a choice to receiving its feedback.
+    python -m benchmarks.bench_websocket [--sessions 2000] [--choices 20] [--interval 2.0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+from urllib.parse import urlsplit
+
+import httpx
+import websockets
+
+from game_protocol import OP_CHOICE, OP_CLOCK, OP_END, OP_FEEDBACK, OP_LYRIC, OP_RESULT, OP_START
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url + "/")
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+def percentile(samples: List[float], q: int) -> float:
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1] if len(samples) > 1 else samples[0]
+
+
+class KeepAliveClient:
+    """One persistent HTTP/1.1 connection, like a browser tab's; avoids client-side pool overhead"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def post(self, path: str, body: dict) -> dict:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode()
+        self._writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+        )
+        head = await self._reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+        data = await self._reader.readexactly(length)
+        if status != 200:
+            raise RuntimeError(f"POST {path} returned {status}: {data[:200]!r}")
+        return json.loads(data)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+
+
+async def rest_game(host: str, port: int, choices: int, interval: float, latencies: List[float]):
+    client = KeepAliveClient(host, port)
+    try:
+        lyric = await client.post("/game/start", {"player_name": "bench", "difficulty": "medium"})
+        session_id = lyric["session_id"]
+        await asyncio.sleep(random.uniform(0, interval))
+        for _ in range(choices):
+            beat = time.time() * 1000
+            start = time.perf_counter()
+            await client.post("/game/choice", {
+                "session_id": session_id,
+                "lyric_id": lyric["lyric_id"],
+                "chosen_word": lyric["correct_rhyme"],
+                "tap_timestamp": beat + random.uniform(-100, 100),
+                "beat_timestamp": beat
+            })
+            latencies.append(time.perf_counter() - start)
+            # The REST client asks for the next lyric itself
+            lyric = await client.post("/game/next", {"session_id": session_id})
+            await asyncio.sleep(interval)
+        await client.post("/game/end", {"session_id": session_id, "total_score": 0, "final_metrics": {}})
+    finally:
+        await client.close()
+
+
+async def ws_game(url: str, choices: int, interval: float, latencies: List[float]):
+    async with websockets.connect(url + "/game/ws/new", max_queue=None) as ws:
+        await ws.send(f'["{OP_START}","bench","medium"]')
+        _, lyric_id, _, _, correct_rhyme, _, _ = await receive(ws, OP_LYRIC)
+        await asyncio.sleep(random.uniform(0, interval))
+        for _ in range(choices):
+            beat = time.time() * 1000
+            start = time.perf_counter()
+            await ws.send(f'["{OP_CHOICE}","{lyric_id}","{correct_rhyme}",'
+                          f'{beat + random.uniform(-100, 100)},{beat}]')
+            await receive(ws, OP_FEEDBACK)
+            latencies.append(time.perf_counter() - start)
+            # The server pushes the next lyric right behind the feedback
+            _, lyric_id, _, _, correct_rhyme, _, _ = await receive(ws, OP_LYRIC)
+            await asyncio.sleep(interval)
+        await ws.send(f'["{OP_END}",0]')
+        await receive(ws, OP_RESULT)
+
+
+async def receive(ws, opcode: str) -> list:
+    """Next message with `opcode`, answering any clock probes on the way"""
+    while True:
+        message = json.loads(await ws.recv())
+        if message[0] == OP_CLOCK:
+            await ws.send(json.dumps([OP_CLOCK, message[1], time.time() * 1000]))
+        elif message[0] != opcode:
+            raise RuntimeError(f"Expected {opcode!r} message, got {message!r}")
+        else:
+            return message
+
+
+async def run(label: str, games, sessions: int):
+    latencies: List[float] = []
+    start = time.perf_counter()
+    results = await asyncio.gather(*(games(latencies) for _ in range(sessions)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    errors = [result for result in results if isinstance(result, Exception)]
+    if not latencies:
+        print(f"{label:>5}: every game failed ({errors[0]!r})")
+        return
+    print(f"{label:>5}: p50 {percentile(latencies, 50) * 1000:8.2f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:8.2f} ms  "
+          f"{len(latencies) / elapsed:9.1f} choices/s  {len(errors)} failed games")
+    if errors:
+        print(f"       first failure: {errors[0]!r}")
+
+
+async def main(args):
+    # Thousands of sockets on both ends of the loopback need a raised descriptor limit
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        db_dir = tempfile.mkdtemp()
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'bench.db')}")
+        subprocess.run([sys.executable, "migrate.py"], cwd=BACKEND_DIR, env=env, check=True)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+             "--log-level", "warning", "--backlog", str(max(2048, args.sessions * 2))],
+            cwd=BACKEND_DIR, env=env
+        )
+    try:
+        await wait_until_up(url)
+        print(f"{args.sessions} sessions x {args.choices} choices, one tap per {args.interval}s")
+
+        address = urlsplit(url)
+        await run("rest", lambda latencies: rest_game(address.hostname, address.port or 80, args.choices,
+                                                      args.interval, latencies),
+                  args.sessions)
+
+        ws_url = "ws" + url[len("http"):]
+        await run("ws", lambda latencies: ws_game(ws_url, args.choices, args.interval, latencies),
+                  args.sessions)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--choices", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument("--url", help="Base URL of a running server, e.g. http://127.0.0.1:8000")
+    asyncio.run(main(parser.parse_args()))
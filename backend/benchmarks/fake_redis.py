@@ -0,0 +1,243 @@
+"""
+Embedded Redis-protocol server for exercising RedisSessionStore without a real Redis
+
+Implements the subset of commands the session store uses, with key expiry. There's no Lua: the
+session store's scripts are run by Python equivalents, looked up by their SHA-1 as EVALSHA would.
+    python -m benchmarks.fake_redis --port 6390
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from session_store import APPEND_SCRIPT, POP_SCRIPT, UPDATE_SCRIPT, RedisConnection
+
+
+class FakeRedisServer:
+    """Single-process RESP server holding strings, hashes and lists in memory"""
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.data: Dict[bytes, Any] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.commands_processed = 0
+        # SHA-1 -> Python equivalent, for scripts loaded with EVAL or SCRIPT LOAD
+        self.scripts: Dict[bytes, Any] = {}
+        self._known_scripts = {
+            UPDATE_SCRIPT.sha.encode(): self._script_update,
+            APPEND_SCRIPT.sha.encode(): self._script_append,
+            POP_SCRIPT.sha.encode(): self._script_pop,
+        }
+        self._server: Optional[asyncio.AbstractServer] = None
+    
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+    
+    async def start(self) -> "FakeRedisServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+    
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+    
+    async def __aenter__(self) -> "FakeRedisServer":
+        return await self.start()
+    
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+    
+    def _live(self, key: bytes) -> Any:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = RedisConnection(reader, writer)
+        try:
+            while True:
+                try:
+                    command = await connection.read_reply()
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                writer.write(self._execute(command))
+                await writer.drain()
+        except asyncio.CancelledError:
+            # Server shutting down with the client still connected
+            pass
+        finally:
+            writer.close()
+    
+    def _execute(self, command: List[bytes]) -> bytes:
+        self.commands_processed += 1
+        name, args = command[0].upper().decode(), command[1:]
+        handler = getattr(self, "_cmd_" + name.lower(), None)
+        if handler is None:
+            return b"-ERR unknown command '%s'\r\n" % name.encode()
+        return self._encode(handler(*args))
+    
+    def _encode(self, value: Any) -> bytes:
+        if isinstance(value, Exception):
+            message = str(value)
+            return b"-%s\r\n" % (message if message.startswith("NOSCRIPT") else "ERR " + message).encode()
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, bool) or value == "OK":
+            return b"+OK\r\n" if value == "OK" else b":%d\r\n" % int(value)
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, bytes):
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        return b"*%d\r\n" % len(value) + b"".join(self._encode(item) for item in value)
+    
+    def _cmd_ping(self, *args):
+        return "OK"
+    
+    def _cmd_select(self, db):
+        return "OK"
+    
+    def _cmd_auth(self, *args):
+        return "OK"
+    
+    def _cmd_flushall(self):
+        self.data.clear()
+        self.expires.clear()
+        return "OK"
+    
+    def _cmd_get(self, key):
+        return self._live(key)
+    
+    def _cmd_set(self, key, value, *options):
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if len(options) >= 2 and options[0].upper() == b"EX":
+            self.expires[key] = time.monotonic() + int(options[1])
+        return "OK"
+    
+    def _cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                removed += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return removed
+    
+    def _cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._live(key) is not None)
+    
+    def _cmd_expire(self, key, seconds):
+        if self._live(key) is None:
+            return 0
+        self.expires[key] = time.monotonic() + int(seconds)
+        return 1
+    
+    def _cmd_ttl(self, key):
+        if self._live(key) is None:
+            return -2
+        deadline = self.expires.get(key)
+        return -1 if deadline is None else int(deadline - time.monotonic())
+    
+    def _cmd_hset(self, key, *pairs):
+        table = self._live(key)
+        if table is None:
+            table = self.data[key] = {}
+        added = 0
+        for i in range(0, len(pairs), 2):
+            added += pairs[i] not in table
+            table[pairs[i]] = pairs[i + 1]
+        return added
+    
+    def _cmd_hgetall(self, key):
+        table = self._live(key) or {}
+        return [item for pair in table.items() for item in pair]
+    
+    def _cmd_rpush(self, key, *values):
+        items = self._live(key)
+        if items is None:
+            items = self.data[key] = []
+        items.extend(values)
+        return len(items)
+    
+    def _cmd_lrange(self, key, start, stop):
+        items = self._live(key) or []
+        start, stop = int(start), int(stop)
+        stop = len(items) if stop == -1 else stop + 1
+        return items[start:stop]
+    
+    def _cmd_dbsize(self):
+        return sum(1 for key in list(self.data) if self._live(key) is not None)
+    
+    def _load_script(self, source: bytes) -> Any:
+        sha = hashlib.sha1(source).hexdigest().encode()
+        script = self._known_scripts.get(sha)
+        if script is None:
+            return Exception("fake server only runs the session store's scripts")
+        self.scripts[sha] = script
+        return sha
+    
+    def _cmd_script(self, subcommand, *args):
+        subcommand = subcommand.upper()
+        if subcommand == b"LOAD":
+            return self._load_script(args[0])
+        if subcommand == b"FLUSH":
+            self.scripts.clear()
+            return "OK"
+        return Exception("unsupported SCRIPT subcommand")
+    
+    def _cmd_eval(self, source, numkeys, *rest):
+        sha = self._load_script(source)
+        if isinstance(sha, Exception):
+            return sha
+        return self._cmd_evalsha(sha, numkeys, *rest)
+    
+    def _cmd_evalsha(self, sha, numkeys, *rest):
+        script = self.scripts.get(sha.lower())
+        if script is None:
+            return Exception("NOSCRIPT No matching script. Please use EVAL.")
+        numkeys = int(numkeys)
+        return script(rest[:numkeys], rest[numkeys:])
+    
+    # Python equivalents of session_store's Lua scripts; each runs without interruption, as in Redis
+    
+    def _script_update(self, keys, args):
+        if self._live(keys[0]) is None:
+            return 0
+        self._cmd_hset(keys[0], *args[1:])
+        self._cmd_expire(keys[0], args[0])
+        return 1
+    
+    def _script_append(self, keys, args):
+        if self._live(keys[0]) is None:
+            return 0
+        self._cmd_rpush(keys[1], *args[1:])
+        self._cmd_expire(keys[1], args[0])
+        self._cmd_expire(keys[0], args[0])
+        return 1
+    
+    def _script_pop(self, keys, args):
+        fields = self._cmd_hgetall(keys[0])
+        choices = self._cmd_lrange(keys[1], 0, -1)
+        self._cmd_del(keys[0], keys[1])
+        return [fields, choices]
+
+
+async def _serve(host: str, port: int):
+    server = await FakeRedisServer(host, port).start()
+    print(f"fake redis listening on {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedded Redis-protocol server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port))
@@ -0,0 +1,108 @@
+"""
+Scorer microbenchmarks for the benchmark suite (run them through benchmarks.suite)
+
+Every benchmark uses fixed seeds and reports the median per-call time over several repeats.
+"""
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from benchmarks.bench_choice_log import make_records
+from benchmarks.bench_rhyme_index import build_vocabulary
+from benchmarks.bench_tone_matcher import build_lyrics, build_taps
+from choice_log import ChoiceLog
+from scoring import BeatScorer, RhymeScorer, ToneMatcher
+
+
+def per_call_us(fn: Callable, calls: Sequence[Tuple], repeat: int,
+                setup: Callable[[], Any] = lambda: None) -> Dict[str, float]:
+    """Median and best per-call time in microseconds; `setup` runs before each repeat, untimed"""
+    timings = []
+    # The first pass only warms the interpreter and allocator
+    for _ in range(repeat + 1):
+        setup()
+        start = time.perf_counter_ns()
+        for args in calls:
+            fn(*args)
+        timings.append((time.perf_counter_ns() - start) / len(calls) / 1000)
+    del timings[0]
+    return {"median": statistics.median(timings), "best": min(timings)}
+
+
+def rhyme_calls(patterns: Dict[str, List[str]], count: int, seed: int) -> List[Tuple[str, str]]:
+    """(chosen word, lyric context) pairs; a third rhyme, a third don't, a third are unknown words"""
+    rng = random.Random(seed)
+    classes = list(patterns.values())
+    calls = []
+    for i in range(count):
+        rhymes = rng.choice(classes)
+        target = rng.choice(rhymes)
+        if i % 3 == 0:
+            word = rng.choice(rhymes)
+        elif i % 3 == 1:
+            word = rng.choice(rng.choice(classes))
+        else:
+            word = f"zzq{i}"
+        calls.append((word, f"I keep it moving like a {target} ___"))
+    return calls
+
+
+def bench_rhyme(settings: Dict[str, int], repeat: int) -> Dict[str, Dict[str, float]]:
+    patterns = build_vocabulary(settings["vocabulary"], 100, seed=7)
+    scorer = RhymeScorer(rhyme_patterns=patterns)
+    calls = rhyme_calls(patterns, settings["calls"], seed=7)
+    cold = per_call_us(scorer.calculate_rhyme_accuracy, calls, repeat,
+                       setup=scorer._similarity_cache.cache_clear)
+    warm = per_call_us(scorer.calculate_rhyme_accuracy, calls, repeat)
+    return {"rhyme.cold": cold, "rhyme.warm": warm}
+
+
+def bench_tone(settings: Dict[str, int], repeat: int) -> Dict[str, Dict[str, float]]:
+    lyrics = build_lyrics(settings["lyrics"], seed=11)
+    taps = build_taps(lyrics, settings["calls"], seed=11)
+    matchers = [ToneMatcher()]
+    by_text = [(word, context) for word, context, _ in taps]
+    cold = per_call_us(lambda *args: matchers[0].calculate_tone_match(*args), taps, repeat,
+                       setup=lambda: matchers.__setitem__(0, ToneMatcher()))
+    warm = per_call_us(matchers[0].calculate_tone_match, taps, repeat)
+    by_text_warm = per_call_us(matchers[0].calculate_tone_match, by_text, repeat)
+    return {"tone.cold": cold, "tone.warm_by_lyric_id": warm, "tone.warm_by_text": by_text_warm}
+
+
+def bench_beat(settings: Dict[str, int], repeat: int) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(5)
+    scorer = BeatScorer()
+    pairs = []
+    for i in range(settings["calls"]):
+        beat = 600.0 * i
+        pairs.append((beat + rng.gauss(0, 250), beat))
+    scheduled = [(tap, 0.0, 600.0) for tap, _ in pairs]
+    return {
+        "beat.accuracy": per_call_us(scorer.calculate_beat_accuracy, pairs, repeat),
+        "beat.score_tap": per_call_us(scorer.score_tap, scheduled, repeat),
+    }
+
+
+def bench_final_metrics(settings: Dict[str, Any], repeat: int) -> Dict[str, Dict[str, float]]:
+    # Imported here: main configures its database from the environment at import time
+    from main import calculate_final_metrics
+
+    def score_session(records):
+        return calculate_final_metrics(ChoiceLog.from_records(records))
+
+    results = {}
+    rng = random.Random(3)
+    for size in settings["session_sizes"]:
+        # A whole session: logging every choice, then the end-of-game metrics
+        records = make_records(size, rng)
+        calls = [(records,)] * max(1, 20_000 // size)
+        results[f"final_metrics.session_{size}"] = per_call_us(score_session, calls, repeat)
+    return results
+
+
+def run(settings: Dict[str, Any], repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for bench in (bench_rhyme, bench_tone, bench_beat, bench_final_metrics):
+        results.update(bench(settings, repeat))
+    return results
@@ -0,0 +1,187 @@
+"""
+Benchmark suite: scorer microbenchmarks plus an in-process ASGI load test, with baseline comparison
+
+Writes results as JSON and fails (exit status 1) when a result regresses past its tolerance:
+    python -m benchmarks.suite run [--quick] --save-baseline     # record this machine's baseline first
+    python -m benchmarks.suite run [--quick] [--output results.json] [--baseline PATH]
+    python -m benchmarks.suite compare results.json benchmarks/baseline.full.json
+Timings only mean something next to ones from the same host, so baselines aren't committed: each
+machine records its own, one per mode (benchmarks/baseline.<mode>.json, ignored by git). A baseline
+from another host or mode is still shown, but never fails the run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+BASELINE_PATTERN = os.path.join(os.path.dirname(__file__), "baseline.{mode}.json")
+# Meta fields that must match for two runs' timings to be comparable
+HOST_FIELDS = ("mode", "settings", "python", "platform", "machine", "cpus")
+
+SETTINGS = {
+    "full": {
+        "repeat": 7, "vocabulary": 50_000, "lyrics": 500, "calls": 20_000,
+        "session_sizes": [10, 100, 1000, 10_000],
+        "games": 200, "choices": 20, "concurrency": 50,
+    },
+    "quick": {
+        "repeat": 3, "vocabulary": 5_000, "lyrics": 200, "calls": 5_000,
+        "session_sizes": [10, 100, 1000],
+        "games": 40, "choices": 10, "concurrency": 20,
+    },
+}
+
+# Allowed relative change before a result counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Whole-app numbers share the event loop, allocator and GC with everything else, so vary more
+LOAD_TOLERANCE = 0.35
+TAIL_TOLERANCE = 0.75
+
+
+def result(name: str, value: float, unit: str, lower_is_better: bool = True,
+           tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, Any]:
+    return {"name": name, "value": round(value, 4), "unit": unit,
+            "lower_is_better": lower_is_better, "tolerance": tolerance}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def isolate_app(directory: str):
+    """Point the app at a scratch database and in-memory sessions before it is imported"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ["SESSION_STORE_URL"] = "memory://"
+    os.environ["PROFILE_SAMPLE_HZ"] = "0"
+
+
+def run_suite(mode: str) -> Dict[str, Any]:
+    from benchmarks import asgi_load, micro
+
+    settings = SETTINGS[mode]
+    results: List[Dict[str, Any]] = []
+    for name, timing in micro.run(settings, settings["repeat"]).items():
+        results.append(result(f"micro.{name}", timing["median"], "us/call"))
+        print(f"  micro.{name:36} {timing['median']:10.3f} us/call")
+
+    import database
+    import main
+    database.init_db()
+    load = asyncio.run(asgi_load.run_load(
+        main.app, settings["games"], settings["choices"], settings["concurrency"]
+    ))
+    for name, value in load.items():
+        throughput = name.endswith("_per_s")
+        tolerance = TAIL_TOLERANCE if "p99" in name else LOAD_TOLERANCE
+        results.append(result(f"load.{name}", value, "1/s" if throughput else "ms",
+                              lower_is_better=not throughput, tolerance=tolerance))
+        print(f"  load.{name:37} {value:10.3f} {'1/s' if throughput else 'ms'}")
+
+    return {
+        "meta": {
+            "mode": mode,
+            "settings": settings,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Print a comparison table and return the names of regressed results
+    Against a baseline from another host or mode nothing counts as a regression.
+    """
+    mismatched = [field for field in HOST_FIELDS if current["meta"].get(field) != baseline["meta"].get(field)]
+    if mismatched:
+        print(f"warning: the baseline differs in {', '.join(mismatched)}; "
+              f"showing changes without failing on them")
+    before = {entry["name"]: entry for entry in baseline["results"]}
+    regressions = []
+    print(f"{'benchmark':44} {'baseline':>11} {'current':>11} {'change':>8}")
+    for entry in current["results"]:
+        reference = before.get(entry["name"])
+        if reference is None or not reference["value"]:
+            print(f"{entry['name']:44} {'-':>11} {entry['value']:11.3f}      new")
+            continue
+        change = (entry["value"] - reference["value"]) / reference["value"]
+        worse = change if entry["lower_is_better"] else -change
+        status = ""
+        if worse > entry.get("tolerance", DEFAULT_TOLERANCE):
+            status = "slower" if mismatched else "REGRESSION"
+            if not mismatched:
+                regressions.append(entry["name"])
+        elif worse < -entry.get("tolerance", DEFAULT_TOLERANCE):
+            status = "improved"
+        print(f"{entry['name']:44} {reference['value']:11.3f} {entry['value']:11.3f} "
+              f"{change * 100:+7.1f}% {status}")
+    return regressions
+
+
+def load_json(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(path: str, data: Dict[str, Any]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite and compare with the baseline if there is one")
+    run.add_argument("--quick", action="store_true", help="smaller inputs, for a fast sanity check")
+    run.add_argument("--output", help="write results JSON here")
+    run.add_argument("--baseline", help="default: benchmarks/baseline.<mode>.json")
+    run.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+
+    check = commands.add_parser("compare", help="compare two results files")
+    check.add_argument("current")
+    check.add_argument("baseline")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        regressions = compare(load_json(args.current), load_json(args.baseline))
+    else:
+        mode = "quick" if args.quick else "full"
+        args.baseline = args.baseline or BASELINE_PATTERN.format(mode=mode)
+        with tempfile.TemporaryDirectory() as scratch:
+            isolate_app(scratch)
+            current = run_suite(mode)
+        if args.output:
+            write_json(args.output, current)
+        if args.save_baseline:
+            write_json(args.baseline, current)
+            print(f"baseline written to {args.baseline}")
+            return
+        if not os.path.exists(args.baseline):
+            print(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+            return
+        regressions = compare(current, load_json(args.baseline))
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
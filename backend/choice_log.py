@@ -0,0 +1,144 @@
+import math
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List
+
+from anticheat import TimingStats
+
+# Columns stored as doubles, in record order
+FLOAT_COLUMNS = (
+    "tap_timestamp",
+    "beat_timestamp",
+    "timing_offset",
+    "rhyme_accuracy",
+    "tone_score",
+    "beat_accuracy",
+    "reaction_time",
+)
+
+class ChoiceLog:
+    """
+    Columnar, append-only log of one session's choices
+    Keeps running sums so final metrics don't rescan the log, and running timing stats for anti-cheat
+    """
+
+    __slots__ = (
+        "_words", "_word_ids", "_lyric_ids", "_lyric_id_ids",
+        "word_index", "lyric_index",
+        "tap_timestamp", "beat_timestamp", "timing_offset",
+        "rhyme_accuracy", "tone_score", "beat_accuracy", "reaction_time",
+        "rhyme_total", "beat_total", "tone_total", "timing_offset_total", "timing",
+    )
+
+    def __init__(self):
+        # Words and lyric ids are stored once per log as small integer codes
+        self._words: List[str] = []
+        self._word_ids: Dict[str, int] = {}
+        self._lyric_ids: List[str] = []
+        self._lyric_id_ids: Dict[str, int] = {}
+        self.word_index = array("I")
+        self.lyric_index = array("I")
+
+        self.tap_timestamp = array("d")
+        self.beat_timestamp = array("d")
+        self.timing_offset = array("d")
+        self.rhyme_accuracy = array("d")
+        self.tone_score = array("d")
+        self.beat_accuracy = array("d")
+        self.reaction_time = array("d")
+
+        self.rhyme_total = 0.0
+        self.beat_total = 0.0
+        self.tone_total = 0.0
+        self.timing_offset_total = 0.0
+        self.timing = TimingStats()
+
+    def __len__(self) -> int:
+        return len(self.timing_offset)
+
+    def __sizeof__(self) -> int:
+        size = object.__sizeof__(self)
+        for column in (self.word_index, self.lyric_index, self.tap_timestamp, self.beat_timestamp,
+                       self.timing_offset, self.rhyme_accuracy, self.tone_score, self.beat_accuracy,
+                       self.reaction_time):
+            size += column.buffer_info()[1] * column.itemsize
+        return size + sys.getsizeof(self._word_ids) + sys.getsizeof(self._lyric_id_ids) + sys.getsizeof(self.timing)
+
+    @staticmethod
+    def _code(value: str, values: List[str], ids: Dict[str, int]) -> int:
+        code = ids.get(value)
+        if code is None:
+            code = ids[value] = len(values)
+            # The same few option words repeat across every session; keep one shared copy
+            values.append(sys.intern(value))
+        return code
+
+    def append(self, lyric_id: str, chosen_word: str, tap_timestamp: float, beat_timestamp: float,
+               timing_offset: float, rhyme_accuracy: float, tone_score: float, beat_accuracy: float,
+               reaction_time: float = math.nan):
+        """`reaction_time` is ms from the lyric reaching the client to the tap; NaN if unknown"""
+        self._append_columns(lyric_id, chosen_word, tap_timestamp, beat_timestamp, timing_offset,
+                             rhyme_accuracy, tone_score, beat_accuracy, reaction_time)
+        self.timing.add(tap_timestamp, timing_offset, reaction_time)
+
+    def _append_columns(self, lyric_id: str, chosen_word: str, tap_timestamp: float, beat_timestamp: float,
+                        timing_offset: float, rhyme_accuracy: float, tone_score: float, beat_accuracy: float,
+                        reaction_time: float = math.nan):
+        self.word_index.append(self._code(chosen_word, self._words, self._word_ids))
+        self.lyric_index.append(self._code(lyric_id, self._lyric_ids, self._lyric_id_ids))
+        self.tap_timestamp.append(tap_timestamp)
+        self.beat_timestamp.append(beat_timestamp)
+        self.timing_offset.append(timing_offset)
+        self.rhyme_accuracy.append(rhyme_accuracy)
+        self.tone_score.append(tone_score)
+        self.beat_accuracy.append(beat_accuracy)
+        self.reaction_time.append(reaction_time)
+
+        self.rhyme_total += rhyme_accuracy
+        self.beat_total += beat_accuracy
+        self.tone_total += tone_score
+        self.timing_offset_total += timing_offset
+
+    def extend(self, records: Iterable[Dict[str, Any]]):
+        """Append choice records shaped like the dicts yielded by iteration"""
+        start = len(self)
+        for record in records:
+            self._append_columns(**record)
+        self.timing.extend(self.tap_timestamp[start:], self.timing_offset[start:], self.reaction_time[start:])
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "ChoiceLog":
+        log = cls()
+        log.extend(records)
+        return log
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        record = {
+            "lyric_id": self._lyric_ids[self.lyric_index[i]],
+            "chosen_word": self._words[self.word_index[i]],
+        }
+        for name in FLOAT_COLUMNS:
+            record[name] = getattr(self, name)[i]
+        return record
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def final_metrics(self) -> Dict[str, float]:
+        """Session averages from the running sums, O(1)"""
+        count = len(self)
+        if not count:
+            return {
+                "rhyme_accuracy_score": 0.0,
+                "beat_sync_accuracy": 0.0,
+                "tone_match_score": 0.0,
+                "reaction_speed_avg": 0.0
+            }
+
+        return {
+            "rhyme_accuracy_score": self.rhyme_total / count,
+            "beat_sync_accuracy": self.beat_total / count,
+            "tone_match_score": self.tone_total / count,
+            "reaction_speed_avg": self.timing_offset_total / count
+        }
@@ -1,21 +1,134 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import create_engine, event, inspect, literal, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import os
 
 # Database URL - in production, use environment variables
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./rhyme_racer.db")
 
-# Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+# Engine profile: "sqlite", "server" or "default" (SQLAlchemy defaults); "auto" picks by URL
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "auto")
+
+# Applied to every SQLite connection. WAL lets readers run alongside the writer; NORMAL sync
+# is durable across application crashes and only risks the last commits on power loss
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", 5000),
+    ("cache_size", -64000),  # negative means KiB: 64 MB of page cache per connection
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
 )
 
-# Create session factory
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def resolve_profile(url: str, profile: str = "auto") -> str:
+    if profile == "auto":
+        return "sqlite" if make_url(url).get_backend_name() == "sqlite" else "server"
+    if profile not in ("sqlite", "server", "default"):
+        raise ValueError(f"Unknown DATABASE_PROFILE: {profile!r}")
+    return profile
+
+def _is_memory_sqlite(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or database.startswith("file::memory:")
+
+def _apply_pragmas(read_only: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return on_connect
+
+def engine_options(url: str, profile: str, role: str = "writer") -> Dict[str, Any]:
+    """create_engine keyword arguments for a profile; `role` is "writer" or "reader" (SQLite only)"""
+    if profile == "default":
+        return {"connect_args": {"check_same_thread": False}} if url.startswith("sqlite") else {}
+
+    if profile == "sqlite":
+        if _is_memory_sqlite(url):
+            # Every connection to :memory: is a separate database, so share one
+            return {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+        # SQLite takes one writer at a time; a single pooled writer queues writes in-process
+        # instead of in busy_timeout retries, and readers get their own pool
+        return {
+            "connect_args": {"check_same_thread": False},
+            "poolclass": QueuePool,
+            "pool_size": 1 if role == "writer" else _env_int("SQLITE_READ_POOL_SIZE", 8),
+            "max_overflow": 0,
+            "pool_timeout": 30,
+        }
+
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 10),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 20),
+        "pool_timeout": 30,
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        # Replaces connections the server or a proxy dropped while they sat idle in the pool
+        "pool_pre_ping": True,
+        # Compiled-statement cache per engine; the app issues a small, fixed set of statements
+        "query_cache_size": 1200,
+    }
+
+def create_engines(url: str, profile: str = "auto") -> Tuple[Engine, Engine]:
+    """(writer, reader) engines for a URL; the same engine twice except for file-backed SQLite"""
+    profile = resolve_profile(url, profile)
+    writer = create_engine(url, **engine_options(url, profile, "writer"))
+    if profile != "sqlite" or _is_memory_sqlite(url):
+        return writer, writer
+
+    reader = create_engine(url, **engine_options(url, profile, "reader"))
+    event.listen(writer, "connect", _apply_pragmas(read_only=False))
+    event.listen(reader, "connect", _apply_pragmas(read_only=True))
+    return writer, reader
+
+# Async drivers for each sync dialect; they are optional and only needed by create_async_db_engine
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+def create_async_db_engine(url: Optional[str] = None, profile: Optional[str] = None, role: str = "writer"):
+    """
+    An AsyncEngine with the same profile as the sync engines, e.g. for async endpoints or tools
+    Needs the dialect's async driver installed (aiosqlite, asyncpg or aiomysql)
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = url or DATABASE_URL
+    profile = resolve_profile(url, profile or DATABASE_PROFILE)
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend!r}")
+    async_url = parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+    options = engine_options(url, profile, role)
+    # The async dialects pick their own adapted pool classes
+    options.pop("poolclass", None)
+    if profile == "server" and backend == "postgresql":
+        # asyncpg prepares statements server-side; keep the prepared plans per connection
+        options["connect_args"] = {"prepared_statement_cache_size": 500}
+    elif backend == "sqlite":
+        options["connect_args"] = {}
+
+    async_engine = create_async_engine(async_url.render_as_string(hide_password=False), **options)
+    if profile == "sqlite" and not _is_memory_sqlite(url):
+        event.listen(async_engine.sync_engine, "connect", _apply_pragmas(read_only=role == "reader"))
+    return async_engine
+
+# Create engines: writes go through `engine`, read-only queries may use `read_engine`
+engine, read_engine = create_engines(DATABASE_URL, DATABASE_PROFILE)
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
-# Create base class
+# Base class for every model in models.py
 Base = declarative_base()
 
 def get_db():
@@ -26,6 +139,95 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Dependency to get a read-only database session"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _pool_occupancy(pool) -> Dict[str, Any]:
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    return {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": max(0, pool.overflow())}
+
+def pool_stats() -> Dict[str, Any]:
+    """Connection pool occupancy for the writer and reader engines"""
+    stats = {"profile": resolve_profile(DATABASE_URL, DATABASE_PROFILE), "writer": _pool_occupancy(engine.pool)}
+    if read_engine is not engine:
+        stats["reader"] = _pool_occupancy(read_engine.pool)
+    return stats
+
 def init_db():
     """Initialize database tables"""
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    import models  # noqa: F401 - registers the tables on Base
+    Base.metadata.create_all(bind=engine)
+
+# Run after a column is added to tables that already had rows, to fill it in better than its default
+COLUMN_BACKFILLS = {
+    # Scores from before the leaderboard split by difficulty take it from their game session, if it was recorded
+    ("player_scores", "difficulty"): (
+        "UPDATE player_scores SET difficulty = (SELECT game_sessions.difficulty FROM game_sessions "
+        "WHERE game_sessions.session_id = player_scores.session_id) "
+        "WHERE EXISTS (SELECT 1 FROM game_sessions WHERE game_sessions.session_id = player_scores.session_id "
+        "AND game_sessions.difficulty IS NOT NULL)"
+    ),
+}
+
+Migration = Tuple[str, Callable[[Any], None]]
+
+def _add_column(connection, table, column):
+    """ALTER TABLE ... ADD COLUMN; existing rows get the column's default"""
+    preparer = connection.dialect.identifier_preparer
+    sql = (f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+           f"{column.type.compile(dialect=connection.dialect)}")
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        value = literal(default, column.type).compile(dialect=connection.dialect,
+                                                      compile_kwargs={"literal_binds": True})
+        sql += f" DEFAULT {value}"
+    elif not column.nullable:
+        raise RuntimeError(f"Can't add {table.name}.{column.name} to existing rows: NOT NULL without a default")
+    connection.execute(text(sql))
+    backfill = COLUMN_BACKFILLS.get((table.name, column.name))
+    if backfill is not None:
+        connection.execute(text(backfill))
+
+def _migrations() -> List[Migration]:
+    """(description, step) for each model table, column and index the database doesn't have yet"""
+    import models  # noqa: F401 - registers the tables on Base
+    inspector = inspect(engine)
+    steps: List[Migration] = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            # Creates the table's indexes too
+            steps.append((f"table {table.name}", lambda connection, table=table: table.create(connection)))
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                steps.append((f"column {table.name}.{column.name}",
+                              lambda connection, table=table, column=column: _add_column(connection, table, column)))
+        # After the columns, which new indexes may cover
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                steps.append((f"index {index.name}", lambda connection, index=index: index.create(connection)))
+    return steps
+
+def pending_migrations() -> List[str]:
+    """Model tables, columns and indexes that the database doesn't have yet"""
+    return [description for description, _ in _migrations()]
+
+def migrate_schema() -> List[str]:
+    """
+    Bring the database up to the models in one transaction: create missing tables, add missing
+    columns (backfilling existing rows) and create missing indexes. Returns what was changed.
+    Columns are only ever added; nothing is altered or dropped.
+    """
+    steps = _migrations()
+    with engine.begin() as connection:
+        for _, step in steps:
+            step(connection)
+    return [description for description, _ in steps]
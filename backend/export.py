@@ -0,0 +1,203 @@
+import io
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import DateTime, Float, Integer, Table, func, select
+from sqlalchemy.engine import Engine, Row
+
+from models import GameChoice, PlayerScore
+
+# Tables analytics may export; rows are paged by their integer primary key
+EXPORT_TABLES: Dict[str, Table] = {
+    "game_choices": GameChoice.__table__,
+    "player_scores": PlayerScore.__table__,
+}
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_CHUNK_SIZE = 50000
+
+def max_id(engine: Engine, table: Table) -> int:
+    with engine.connect() as connection:
+        return connection.execute(select(func.max(table.c.id))).scalar() or 0
+
+def iter_row_batches(engine: Engine, table: Table, after_id: int = 0, until_id: Optional[int] = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Sequence[Row]]:
+    """
+    Rows with after_id < id <= until_id in id order, `chunk_size` at a time
+    Keyset pagination: each chunk is one short indexed range query on its own connection, so no
+    transaction or cursor stays open between chunks to hold back writers or WAL checkpoints
+    """
+    if until_id is None:
+        until_id = max_id(engine, table)
+    query = select(table).where(table.c.id <= until_id).order_by(table.c.id).limit(chunk_size)
+    while after_id < until_id:
+        with engine.connect() as connection:
+            rows = connection.execute(query.where(table.c.id > after_id)).all()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1].id
+
+class NdjsonEncoder:
+    """One JSON object per row; timestamps as ISO 8601"""
+
+    def __init__(self, table: Table):
+        self._names = [column.name for column in table.columns]
+        self._datetimes = [i for i, column in enumerate(table.columns) if isinstance(column.type, DateTime)]
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def encode(self, rows: Sequence[Row]) -> bytes:
+        lines = []
+        for row in rows:
+            values = list(row)
+            for i in self._datetimes:
+                if values[i] is not None:
+                    values[i] = values[i].isoformat()
+            lines.append(self._encoder.encode(dict(zip(self._names, values))))
+        lines.append("")
+        return "\n".join(lines).encode()
+
+    def close(self) -> bytes:
+        return b""
+
+class _Drain(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain()"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class ArrowEncoder:
+    """Arrow IPC stream, or Parquet with one row group per chunk; needs pyarrow"""
+
+    def __init__(self, table: Table, fmt: str):
+        import pyarrow as pa
+
+        self._pa = pa
+        types = {Integer: pa.int64(), Float: pa.float64(), DateTime: pa.timestamp("us")}
+        self.schema = pa.schema([
+            (column.name, next((t for kind, t in types.items() if isinstance(column.type, kind)), pa.string()))
+            for column in table.columns
+        ])
+        self._sink = _Drain()
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self._sink, self.schema)
+        else:
+            self._writer = pa.ipc.new_stream(self._sink, self.schema)
+
+    def encode(self, rows: Sequence[Row]) -> bytes:
+        columns = list(zip(*rows))
+        batch = self._pa.record_batch(
+            [self._pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema
+        )
+        self._writer.write_batch(batch)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+FORMATS = tuple(MEDIA_TYPES)
+
+def format_unavailable(fmt: str) -> Optional[str]:
+    """Why `fmt` can't be exported here, or None if it can"""
+    if fmt not in FORMATS:
+        return f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}"
+    if fmt != "ndjson":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return f"The {fmt} format needs pyarrow installed on the server"
+    return None
+
+def new_encoder(fmt: str, table: Table):
+    return NdjsonEncoder(table) if fmt == "ndjson" else ArrowEncoder(table, fmt)
+
+def export_stream(engine: Engine, table: Table, fmt: str, after_id: int = 0, until_id: Optional[int] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Encoded export of a table, one chunk of rows at a time; memory stays bounded by `chunk_size`"""
+    encoder = new_encoder(fmt, table)
+    for rows in iter_row_batches(engine, table, after_id, until_id, chunk_size):
+        yield encoder.encode(rows)
+    tail = encoder.close()
+    if tail:
+        yield tail
+
+def _load_state(path: Optional[str]) -> Dict[str, Any]:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_state(path: str, state: Dict[str, Any]):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from database import read_engine
+
+    parser = argparse.ArgumentParser(description="Export game_choices or player_scores for analytics")
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES))
+    parser.add_argument("output", help="File to write; NDJSON exports are appended to when resuming")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--after-id", type=int, default=None, help="Export rows with a larger id (default: 0)")
+    parser.add_argument("--state", help="Watermark file: resume from it, and record progress after every chunk")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    problem = format_unavailable(args.format)
+    if problem:
+        sys.exit(problem)
+    table = EXPORT_TABLES[args.table]
+    state = _load_state(args.state)
+    after_id = args.after_id if args.after_id is not None else state.get(args.table, 0)
+    if after_id and args.format != "ndjson" and os.path.exists(args.output):
+        sys.exit(f"{args.output} exists; write a resumed {args.format} export to a new file")
+
+    until_id = max_id(read_engine, table)
+    encoder = new_encoder(args.format, table)
+    exported = 0
+    with open(args.output, "ab" if args.format == "ndjson" else "wb") as out:
+        for rows in iter_row_batches(read_engine, table, after_id, until_id, args.chunk_size):
+            out.write(encoder.encode(rows))
+            out.flush()
+            exported += len(rows)
+            after_id = rows[-1].id
+            if args.state and args.format == "ndjson":
+                state[args.table] = after_id
+                _save_state(args.state, state)
+        out.write(encoder.close())
+    # A columnar file is only readable once its footer is written, so it's only a resume point now
+    if args.state and args.format != "ndjson":
+        state[args.table] = after_id
+        _save_state(args.state, state)
+    print(f"Exported {exported} {args.table} rows up to id {after_id} at {datetime.utcnow().isoformat()}Z")
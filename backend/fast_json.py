@@ -0,0 +1,106 @@
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel
+from starlette.responses import Response
+
+# orjson when it's installed; otherwise pydantic-core's encoder, which every install already has
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+    loads = orjson.loads
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+else:
+    from pydantic_core import to_json
+
+    JSON_BACKEND = "pydantic"
+    loads = json.loads
+
+    def dumps(content: Any) -> bytes:
+        return to_json(content)
+
+class FastJSONResponse(Response):
+    """
+    JSON response for hot routes, returned directly so FastAPI skips jsonable_encoder
+    Content that is already bytes is sent as is, for bodies encoded ahead of time
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
+
+# A JSON number is an int or a float; bool is an int subclass but not a number here
+_ACCEPTS = {str: (str,), float: (int, float), list: (list,)}
+_TYPE_ERRORS = {
+    str: ("string_type", "Input should be a valid string"),
+    float: ("float_type", "Input should be a valid number"),
+    list: ("list_type", "Input should be a valid list"),
+}
+
+def _error(error_type: str, loc: Tuple[Any, ...], msg: str, value: Any,
+           ctx: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # Same shape as FastAPI's own validation errors, so clients see one format
+    error = {"type": error_type, "loc": loc, "msg": msg, "input": value}
+    if ctx is not None:
+        error["ctx"] = ctx
+    return error
+
+def object_fields(data: Any, fields: Sequence[Tuple[Any, ...]], loc: Tuple[Any, ...] = ("body",)) -> List[Any]:
+    """
+    Values of required `fields` from a decoded JSON object, in `fields` order
+    Each field is (name, str, float or list), with an optional maximum length for strings.
+    The lean stand-in for a Pydantic body model: ints count as floats, other keys are ignored,
+    and nothing is coerced, so "1.5" is not a number
+    """
+    if not isinstance(data, dict):
+        raise RequestValidationError([_error(
+            "model_attributes_type", loc, "Input should be a valid dictionary or object to extract fields from", data
+        )])
+    values = []
+    errors = []
+    for name, kind, *limit in fields:
+        value = data.get(name)
+        if value is None and name not in data:
+            errors.append(_error("missing", loc + (name,), "Field required", data))
+        elif not isinstance(value, _ACCEPTS[kind]) or isinstance(value, bool):
+            error_type, msg = _TYPE_ERRORS[kind]
+            errors.append(_error(error_type, loc + (name,), msg, value))
+        elif limit and limit[0] is not None and len(value) > limit[0]:
+            errors.append(_error("string_too_long", loc + (name,), f"String should have at most {limit[0]} characters",
+                                 value, {"max_length": limit[0]}))
+        else:
+            values.append(float(value) if kind is float else value)
+    if errors:
+        raise RequestValidationError(errors)
+    return values
+
+def decode_body(body: bytes) -> Any:
+    """Parse a request body, raising malformed JSON as a 422 like FastAPI does"""
+    try:
+        return loads(body)
+    except ValueError as error:
+        raise RequestValidationError([_error("json_invalid", ("body", 0), "JSON decode error", {})]) from error
+
+def _inline_refs(schema: Any, defs: Dict[str, Any]) -> Any:
+    if isinstance(schema, dict):
+        if "$ref" in schema:
+            return _inline_refs(defs[schema["$ref"].rsplit("/", 1)[1]], defs)
+        return {key: _inline_refs(value, defs) for key, value in schema.items() if key != "$defs"}
+    if isinstance(schema, list):
+        return [_inline_refs(value, defs) for value in schema]
+    return schema
+
+def body_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """openapi_extra documenting a body that is decoded by hand rather than by `model`"""
+    schema = model.model_json_schema()
+    # Nested models are inlined, as the document's components only hold models FastAPI saw
+    schema = _inline_refs(schema, schema.get("$defs", {}))
+    return {"requestBody": {"content": {"application/json": {"schema": schema}}, "required": True}}
@@ -0,0 +1,170 @@
+import json
+import math
+from typing import Any, Dict, List
+
+# Messages on /game/ws/{session_id} are JSON arrays led by a one-letter opcode.
+#
+# Client to server:
+#   ["s", player_name, difficulty]                               start a session
+#   ["c", lyric_id, chosen_word, tap_timestamp, beat_timestamp]  submit a choice (the beat
+#                                                                timestamp is advisory)
+#   ["n"]                                                        skip to the next lyric
+#   ["e", total_score]                                           end the game
+#   ["t", server_time, client_time]                              answer a clock probe at once
+#
+# Race rooms (/race/ws/{room_id}) also take, and use "c" and "t" as above:
+#   ["j", player_name]                                           join the room
+#   ["g"]                                                        start the race (2+ players)
+#
+# Server to client:
+#   ["l", lyric_id, lyric_text, options, correct_rhyme, beat_timing, session_id]
+#   ["f", message, color, speed_boost, rhyme_accuracy, beat_accuracy, tone_score, timing_offset]
+#   ["r", rhyme_accuracy_score, beat_sync_accuracy, tone_match_score, reaction_speed_avg]
+#   ["x", status_code, detail]
+#   ["t", server_time]                                           clock probe, after every lyric
+#
+# and in race rooms, where lyrics carry the room id in place of the session id:
+#   ["w", room_id, player_id, capacity]                          joined; player_id is the session id
+#   ["o", [[player_id, player_name, score, speed_boost], ...]]   roster, whenever someone joins or leaves
+#   ["b", race_ms]                                               the race started
+#   ["u", tick, [[player_id, score, speed_boost], ...]]          live standings, at most once per tick;
+#                                                                a slow client only gets the newest
+#   ["d", [[player_id, player_name, score], ...]]                final standings
+OP_START = "s"
+OP_CHOICE = "c"
+OP_NEXT = "n"
+OP_END = "e"
+OP_CLOCK = "t"
+OP_JOIN = "j"
+OP_GO = "g"
+
+OP_LYRIC = "l"
+OP_FEEDBACK = "f"
+OP_RESULT = "r"
+OP_ERROR = "x"
+OP_WELCOME = "w"
+OP_ROSTER = "o"
+OP_BEGIN = "b"
+OP_STANDINGS = "u"
+OP_RACE_RESULT = "d"
+
+# Path placeholder for a connection that will send its own start message
+NEW_SESSION = "new"
+# Application close code (4000-4999 range) for an unknown session id
+CLOSE_SESSION_NOT_FOUND = 4404
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_decoder = json.JSONDecoder()
+
+# Longest lyric id or chosen word accepted, in characters: the width of their game_choices columns
+MAX_CHOICE_TEXT = 100
+
+class ProtocolError(ValueError):
+    pass
+
+class _Text:
+    """A string argument of at most `max_length` characters"""
+
+    __slots__ = ("max_length",)
+
+    def __init__(self, max_length: int):
+        self.max_length = max_length
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+# Argument types for each client opcode, checked in order
+_ARGUMENTS = {
+    OP_START: (str, str),
+    OP_CHOICE: (_Text(MAX_CHOICE_TEXT), _Text(MAX_CHOICE_TEXT), float, float),
+    OP_NEXT: (),
+    OP_END: (int,),
+    OP_CLOCK: (float, float),
+    OP_JOIN: (str,),
+    OP_GO: (),
+}
+
+def decode_message(text: str) -> List[Any]:
+    """Parse and validate one client message"""
+    try:
+        message = _decoder.decode(text)
+    except (ValueError, RecursionError):
+        raise ProtocolError("Message is not valid JSON")
+    if not isinstance(message, list) or not message:
+        raise ProtocolError("Message must be a non-empty array")
+
+    if not isinstance(message[0], str):
+        raise ProtocolError("Opcode must be a string")
+    expected = _ARGUMENTS.get(message[0])
+    if expected is None:
+        raise ProtocolError(f"Unknown opcode: {message[0]!r}")
+    if len(message) != len(expected) + 1:
+        raise ProtocolError(f"Opcode {message[0]!r} takes {len(expected)} arguments")
+
+    for i, kind in enumerate(expected, start=1):
+        value = message[i]
+        if kind is str:
+            valid = isinstance(value, str)
+        elif isinstance(kind, _Text):
+            if not isinstance(value, str):
+                raise ProtocolError(f"Argument {i} of {message[0]!r} must be str")
+            if len(value) > kind.max_length:
+                raise ProtocolError(f"Argument {i} of {message[0]!r} must be at most {kind.max_length} characters")
+            continue
+        else:
+            # The decoder takes NaN and Infinity, and integers too large for a float
+            valid = _is_number(value)
+            if valid:
+                try:
+                    number = float(value)
+                except OverflowError:
+                    valid = False
+                else:
+                    valid = math.isfinite(number) and (kind is float or number.is_integer())
+                    if valid:
+                        value = number if kind is float else int(value)
+        if not valid:
+            raise ProtocolError(f"Argument {i} of {message[0]!r} must be {kind.__name__}")
+        message[i] = value
+    return message
+
+def encode_lyric(lyric: Dict[str, Any], session_id: str) -> str:
+    return _encoder.encode([
+        OP_LYRIC, lyric["lyric_id"], lyric["lyric_text"], lyric["options"],
+        lyric["correct_rhyme"], lyric["beat_timing"], session_id
+    ])
+
+def encode_feedback(choice_record: Dict[str, Any], feedback) -> str:
+    """`feedback` is one of main's FeedbackTier constants"""
+    return _encoder.encode([
+        OP_FEEDBACK, feedback.message, feedback.color, feedback.speed_boost,
+        choice_record["rhyme_accuracy"], choice_record["beat_accuracy"],
+        choice_record["tone_score"], choice_record["timing_offset"]
+    ])
+
+def encode_result(final_metrics: Dict[str, float]) -> str:
+    return _encoder.encode([
+        OP_RESULT, final_metrics["rhyme_accuracy_score"], final_metrics["beat_sync_accuracy"],
+        final_metrics["tone_match_score"], final_metrics["reaction_speed_avg"]
+    ])
+
+def encode_clock_probe(server_time: float) -> str:
+    return _encoder.encode([OP_CLOCK, server_time])
+
+def encode_error(status_code: int, detail: str) -> str:
+    return _encoder.encode([OP_ERROR, status_code, detail])
+
+def encode_welcome(room_id: str, player_id: str, capacity: int) -> str:
+    return _encoder.encode([OP_WELCOME, room_id, player_id, capacity])
+
+def encode_roster(players: List[List[Any]]) -> str:
+    return _encoder.encode([OP_ROSTER, players])
+
+def encode_begin(race_ms: float) -> str:
+    return _encoder.encode([OP_BEGIN, race_ms])
+
+def encode_standings(tick: int, standings: List[List[Any]]) -> str:
+    return _encoder.encode([OP_STANDINGS, tick, standings])
+
+def encode_race_result(standings: List[List[Any]]) -> str:
+    return _encoder.encode([OP_RACE_RESULT, standings])
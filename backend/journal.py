@@ -0,0 +1,349 @@
+import asyncio
+import fcntl
+import logging
+import math
+import os
+import struct
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fast_json import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Frames are [payload length, CRC-32 of payload][payload], little-endian; the payload is
+# [event kind][session id length][session id][body]
+FRAME = struct.Struct("<II")
+EVENT_HEADER = struct.Struct("<BB")
+EVENT_START = 1  # body: the session's fields as JSON
+EVENT_UPDATE = 2  # body: changed fields as JSON
+EVENT_CHOICES = 3  # body: CHOICE records, each followed by its lyric id and word
+EVENT_END = 4  # no body
+
+# Float columns of a choice record in choice_log.FLOAT_COLUMNS order, then the UTF-8 lengths of
+# lyric_id and chosen_word
+CHOICE = struct.Struct("<7dHH")
+MAX_KEY_BYTES = 0xFF
+MAX_TEXT_BYTES = 0xFFFF
+CHOICE_FLOATS = ("tap_timestamp", "beat_timestamp", "timing_offset", "rhyme_accuracy", "tone_score",
+                 "beat_accuracy", "reaction_time")
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".journal"
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+DEFAULT_COMMIT_INTERVAL = 0.01
+
+# session id -> (fields, choice records), as rebuilt by replay
+Restored = Dict[str, Tuple[Dict[str, Any], List[Dict[str, Any]]]]
+
+def encode_choices(records: List[Dict[str, Any]]) -> bytes:
+    """Raises ValueError for a lyric id or word too long for its length field"""
+    parts = []
+    for record in records:
+        lyric_id = record["lyric_id"].encode()
+        word = record["chosen_word"].encode()
+        if len(lyric_id) > MAX_TEXT_BYTES or len(word) > MAX_TEXT_BYTES:
+            raise ValueError(f"Choice text longer than {MAX_TEXT_BYTES} bytes can't be journaled")
+        parts.append(CHOICE.pack(
+            record["tap_timestamp"], record["beat_timestamp"], record["timing_offset"],
+            record["rhyme_accuracy"], record["tone_score"], record["beat_accuracy"],
+            record.get("reaction_time", math.nan), len(lyric_id), len(word)
+        ))
+        parts.append(lyric_id)
+        parts.append(word)
+    return b"".join(parts)
+
+def decode_choices(body: memoryview) -> List[Dict[str, Any]]:
+    records = []
+    offset = 0
+    size = CHOICE.size
+    while offset < len(body):
+        *floats, lyric_length, word_length = CHOICE.unpack_from(body, offset)
+        offset += size
+        record = {
+            "lyric_id": str(body[offset:offset + lyric_length], "utf-8"),
+            "chosen_word": str(body[offset + lyric_length:offset + lyric_length + word_length], "utf-8"),
+        }
+        record.update(zip(CHOICE_FLOATS, floats))
+        records.append(record)
+        offset += lyric_length + word_length
+    return records
+
+def _segment_name(number: int) -> str:
+    return f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}"
+
+def _fsync_directory(directory: str):
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+class SessionJournal:
+    """
+    Append-only journal of session events, so a restarted worker gets its in-progress games back
+    Appends only encode a frame into memory; a background task hands each batch to a thread that
+    writes it and fsyncs once (group commit), so handlers never wait on the disk. An event can be
+    lost if the process dies within one commit interval of it; a clean shutdown loses nothing.
+    Segments roll over at `segment_bytes`, and a closed segment is deleted once every session
+    with events in it has ended (finished, abandoned or evicted).
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 commit_interval: float = DEFAULT_COMMIT_INTERVAL, fsync: bool = True,
+                 lock_timeout: float = 30.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.commit_interval = commit_interval
+        self.fsync = fsync
+        self.lock_timeout = lock_timeout
+
+        # Bookkeeping on the event loop: which segment new frames go to, and which live
+        # sessions have frames in each segment
+        self._segment = 0
+        self._segment_size = 0
+        self._live: Dict[int, Set[str]] = {}
+        self._segments_of: Dict[str, Set[int]] = {}
+        self._pending: List[Tuple[int, bytearray]] = []
+        self._dead: List[int] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        # Set by close(): the writer finishes its current commit and returns
+        self._stopping = False
+        self._lock_file = None
+        # Only touched by the writer thread
+        self._files: Dict[int, Any] = {}
+        self.stats = {
+            "events": 0,
+            "bytes": 0,
+            "commits": 0,
+            "segments_deleted": 0,
+            "replayed_events": 0,
+            "restored_sessions": 0,
+            "torn_bytes_dropped": 0,
+        }
+
+    # Appending, on the event loop
+
+    def record_start(self, session_id: str, fields: Dict[str, Any]):
+        self._append(EVENT_START, session_id, dumps(fields))
+
+    def record_update(self, session_id: str, fields: Dict[str, Any]):
+        self._append(EVENT_UPDATE, session_id, dumps(fields))
+
+    def record_choices(self, session_id: str, records: List[Dict[str, Any]]):
+        self._append(EVENT_CHOICES, session_id, encode_choices(records))
+
+    def record_end(self, session_id: str):
+        self._append(EVENT_END, session_id, b"")
+
+    def _append(self, kind: int, session_id: str, body: bytes):
+        key = session_id.encode()
+        if len(key) > MAX_KEY_BYTES:
+            raise ValueError(f"Session id longer than {MAX_KEY_BYTES} bytes can't be journaled")
+        payload = EVENT_HEADER.pack(kind, len(key)) + key + body
+        frame = FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+        if self._segment_size >= self.segment_bytes:
+            if not self._live.get(self._segment):
+                # Every session in the segment ended while it was still being written
+                self._live.pop(self._segment, None)
+                self._dead.append(self._segment)
+            self._segment += 1
+            self._segment_size = 0
+        if not self._pending or self._pending[-1][0] != self._segment:
+            self._pending.append((self._segment, bytearray()))
+        self._pending[-1][1].extend(frame)
+        self._segment_size += len(frame)
+        self.stats["events"] += 1
+        self._track(kind, session_id, self._segment)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _track(self, kind: int, session_id: str, segment: int):
+        if kind != EVENT_END:
+            if segment not in self._live:
+                self._live[segment] = set()
+            self._live[segment].add(session_id)
+            self._segments_of.setdefault(session_id, set()).add(segment)
+            return
+        for number in self._segments_of.pop(session_id, ()):
+            live = self._live[number]
+            live.discard(session_id)
+            if not live and number != self._segment:
+                del self._live[number]
+                # Deleted only after this end event is on disk
+                self._dead.append(number)
+
+    # Writing, in a worker thread
+
+    def _write(self, pending: List[Tuple[int, bytearray]], dead: List[int]):
+        touched = {}
+        for number, data in pending:
+            handle = self._files.get(number)
+            if handle is None:
+                handle = self._files[number] = open(os.path.join(self.directory, _segment_name(number)), "ab")
+                if self.fsync:
+                    _fsync_directory(self.directory)
+            handle.write(data)
+            touched[number] = handle
+        for handle in touched.values():
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+        # Only the newest segment is still being appended to
+        newest = max(self._files, default=None)
+        for number in [number for number in self._files if number != newest]:
+            self._files.pop(number).close()
+        for number in dead:
+            handle = self._files.pop(number, None)
+            if handle is not None:
+                handle.close()
+            try:
+                os.remove(os.path.join(self.directory, _segment_name(number)))
+            except FileNotFoundError:
+                pass
+
+    async def _commit(self):
+        pending, self._pending = self._pending, []
+        dead, self._dead = self._dead, []
+        if not pending and not dead:
+            return
+        await asyncio.to_thread(self._write, pending, dead)
+        self.stats["commits"] += 1
+        self.stats["bytes"] += sum(len(data) for _, data in pending)
+        self.stats["segments_deleted"] += len(dead)
+
+    async def _run(self):
+        while not self._stopping:
+            await self._wake.wait()
+            if not self._stopping:
+                # Let the group fill up, then write it with one fsync
+                await asyncio.sleep(self.commit_interval)
+            self._wake.clear()
+            try:
+                await self._commit()
+            except Exception:
+                logger.exception("Session journal write failed; in-flight events may not survive a restart")
+
+    # Lifecycle
+
+    def _lock(self):
+        """Hold the directory's lock file, waiting for a worker that is still shutting down to let go"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, "lock"), "a")
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() > deadline:
+                    self._lock_file.close()
+                    self._lock_file = None
+                    raise RuntimeError(f"Session journal {self.directory} is locked by another process")
+                time.sleep(0.05)
+
+    def segments(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def replay(self) -> Restored:
+        """
+        Lock the directory and rebuild the sessions that hadn't ended, oldest segment first
+        A torn frame (from a crash mid-write) ends its segment; the file is cut back to the last good frame.
+        New events go to a fresh segment, and segments left with no live sessions are deleted.
+        """
+        self._lock()
+        sessions: Restored = {}
+        numbers = self.segments()
+        for number in numbers:
+            path = os.path.join(self.directory, _segment_name(number))
+            with open(path, "rb") as handle:
+                data = memoryview(handle.read())
+            good = self._replay_segment(number, data, sessions)
+            if good < len(data):
+                logger.warning("Session journal %s: dropping %d bytes after the last whole frame",
+                               path, len(data) - good)
+                self.stats["torn_bytes_dropped"] += len(data) - good
+                os.truncate(path, good)
+
+        self._segment = numbers[-1] + 1 if numbers else 0
+        for number in numbers:
+            if not self._live.get(number):
+                self._live.pop(number, None)
+                os.remove(os.path.join(self.directory, _segment_name(number)))
+                self.stats["segments_deleted"] += 1
+        self._dead.clear()
+        self.stats["restored_sessions"] = len(sessions)
+        return sessions
+
+    def _replay_segment(self, number: int, data: memoryview, sessions: Restored) -> int:
+        """Apply one segment's events; returns the length of its intact prefix"""
+        offset = 0
+        header = FRAME.size
+        while offset + header <= len(data):
+            length, checksum = FRAME.unpack_from(data, offset)
+            payload = data[offset + header:offset + header + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            offset += header + length
+
+            kind, key_length = EVENT_HEADER.unpack_from(payload)
+            body_start = EVENT_HEADER.size + key_length
+            session_id = str(payload[EVENT_HEADER.size:body_start], "utf-8")
+            body = payload[body_start:]
+            if kind == EVENT_START:
+                sessions[session_id] = (loads(body), [])
+            elif kind == EVENT_END:
+                sessions.pop(session_id, None)
+            else:
+                session = sessions.get(session_id)
+                if session is None:
+                    # Its start was in a segment deleted after it ended
+                    continue
+                if kind == EVENT_UPDATE:
+                    session[0].update(loads(body))
+                elif kind == EVENT_CHOICES:
+                    session[1].extend(decode_choices(body))
+            self.stats["replayed_events"] += 1
+            self._track(kind, session_id, number)
+        return offset
+
+    def open(self):
+        """Start the background writer; call on the event loop after replay()"""
+        if self._writer is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            if self._pending:
+                self._wake.set()
+            self._writer = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        """Write everything appended so far, then release the directory for the next worker"""
+        if self._writer is not None:
+            # Cancelling would leave a commit's write thread running alongside the final one, so the
+            # writer is asked to stop and awaited; only then is the rest written
+            self._stopping = True
+            self._wake.set()
+            await asyncio.shield(self._writer)
+            self._writer = None
+        await self._commit()
+        for handle in self._files.values():
+            handle.close()
+        self._files.clear()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "segment": self._segment,
+            "live_segments": len(self._live),
+            "pending_bytes": sum(len(data) for _, data in self._pending),
+        }
@@ -0,0 +1,211 @@
+import hashlib
+import json
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import PlayerScore
+
+WINDOWS = ("all", "daily", "weekly")
+ALL_DIFFICULTIES = "all"
+# Difficulties with boards of their own; scores at any other difficulty only reach the "all" board
+DIFFICULTIES = ("easy", "medium", "hard")
+DEFAULT_CAPACITY = 1000
+
+def window_start(window: str, now: datetime) -> Optional[datetime]:
+    """Earliest created_at included in a window (UTC), or None for all-time"""
+    if window == "daily":
+        return datetime(now.year, now.month, now.day)
+    elif window == "weekly":
+        day = datetime(now.year, now.month, now.day)
+        return day - timedelta(days=day.weekday())
+    return None
+
+class TopK:
+    """The best `capacity` entries, kept sorted best-first"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._keys: List[Tuple] = []
+        self._entries: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Tuple, entry: Dict[str, Any]) -> bool:
+        """Insert an entry; returns False if it doesn't make the cut"""
+        if len(self._keys) >= self.capacity and key >= self._keys[-1]:
+            return False
+        i = bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self._entries.insert(i, entry)
+        if len(self._keys) > self.capacity:
+            self._keys.pop()
+            self._entries.pop()
+        return True
+
+    def page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        return self._entries[offset:offset + limit]
+
+class LeaderboardIndex:
+    """
+    In-memory top-K boards per difficulty (plus an all-difficulty board) and time window
+    Daily and weekly boards start empty again when their period rolls over
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, difficulties: Iterable[str] = DIFFICULTIES):
+        self.capacity = capacity
+        self.difficulties = frozenset(difficulties) - {ALL_DIFFICULTIES}
+        self._boards: Dict[Tuple[str, str], Tuple[Optional[datetime], TopK]] = {}
+        # Bumped whenever any board changes, so cached responses know they're stale
+        self.version = 0
+
+    def _board(self, difficulty: str, window: str, now: datetime, create: bool = True) -> Optional[TopK]:
+        """The current period's board; without `create`, None if nothing has been added to it yet"""
+        period = window_start(window, now)
+        current = self._boards.get((difficulty, window))
+        if current is None or current[0] != period:
+            if not create:
+                return None
+            current = (period, TopK(self.capacity))
+            self._boards[(difficulty, window)] = current
+        return current[1]
+
+    @staticmethod
+    def _key(score: Dict[str, Any]) -> Tuple[Hashable, ...]:
+        # Highest score first; earlier games win ties
+        return (-score["total_score"], score["created_at"], score["session_id"])
+
+    def add(self, score: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+        """Record a finished game; returns True if it landed on any board"""
+        now = now or datetime.utcnow()
+        key = self._key(score)
+        entry = _entry(score)
+        changed = False
+        # Only known difficulties get boards, so clients can't grow the index with made-up ones
+        difficulties = (score["difficulty"], ALL_DIFFICULTIES) if score["difficulty"] in self.difficulties \
+            else (ALL_DIFFICULTIES,)
+        for difficulty in difficulties:
+            for window in WINDOWS:
+                start = window_start(window, now)
+                if start is not None and score["created_at"] < start:
+                    continue
+                changed |= self._board(difficulty, window, now).add(key, entry)
+        if changed:
+            self.version += 1
+        return changed
+
+    def page(self, difficulty: str = ALL_DIFFICULTIES, window: str = "all",
+             offset: int = 0, limit: int = 10, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown leaderboard window: {window}")
+        if difficulty != ALL_DIFFICULTIES and difficulty not in self.difficulties:
+            raise ValueError(f"Unknown leaderboard board: {difficulty}")
+        board = self._board(difficulty, window, now or datetime.utcnow(), create=False)
+        return board.page(offset, limit) if board is not None else []
+
+    def seed(self, db: Session, now: Optional[datetime] = None):
+        """
+        Load the current top-K of every board from player_scores
+        Each query walks an index in (total_score DESC, created_at) order and stops at the capacity
+        """
+        now = now or datetime.utcnow()
+        self._boards.clear()
+        difficulties = [row[0] for row in db.query(PlayerScore.difficulty).distinct() if row[0] in self.difficulties]
+        for difficulty in [ALL_DIFFICULTIES] + difficulties:
+            for window in WINDOWS:
+                query = db.query(PlayerScore)
+                if difficulty != ALL_DIFFICULTIES:
+                    query = query.filter(PlayerScore.difficulty == difficulty)
+                start = window_start(window, now)
+                if start is not None:
+                    query = query.filter(PlayerScore.created_at >= start)
+                top = query.order_by(PlayerScore.total_score.desc(), PlayerScore.created_at) \
+                    .limit(self.capacity)
+                board = self._board(difficulty, window, now)
+                for row in top:
+                    score = score_from_row(row)
+                    board.add(self._key(score), _entry(score))
+        self.version += 1
+
+def score_from_row(row: PlayerScore) -> Dict[str, Any]:
+    """The score dict LeaderboardIndex.add expects, from a player_scores row"""
+    return {
+        "session_id": row.session_id,
+        "player_name": row.player_name,
+        "difficulty": row.difficulty,
+        "total_score": row.total_score,
+        "rhyme_accuracy": row.rhyme_accuracy,
+        "created_at": row.created_at,
+    }
+
+def _entry(score: Dict[str, Any]) -> Dict[str, Any]:
+    # Shape served by GET /leaderboard
+    return {
+        "player": score["player_name"],
+        "score": score["total_score"],
+        "accuracy": score["rhyme_accuracy"],
+    }
+
+class CachedResponse:
+    __slots__ = ("version", "body", "etag")
+
+    def __init__(self, version: int, body: bytes):
+        self.version = version
+        self.body = body
+        # Derived from the bytes alone, so every worker gives the same page the same tag
+        self.etag = '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+
+class LeaderboardResponseCache:
+    """
+    Pre-encoded leaderboard pages keyed by request parameters
+    An entry is served only while the index version it was built from is current
+    """
+
+    def __init__(self, index: LeaderboardIndex, max_entries: int = 256):
+        self.index = index
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[Hashable, ...], CachedResponse] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, board: str, window: str, offset: int, limit: int,
+            now: Optional[datetime] = None) -> CachedResponse:
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown leaderboard window: {window}")
+        now = now or datetime.utcnow()
+        # The period start is part of the key so daily/weekly pages roll over on their own
+        key = (board, window, window_start(window, now), offset, limit)
+        cached = self._entries.get(key)
+        if cached is not None and cached.version == self.index.version:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        version = self.index.version
+        body = json.dumps({
+            "leaderboard": self.index.page(board, window, offset=offset, limit=limit, now=now),
+            "board": board,
+            "window": window,
+            "offset": offset
+        }, separators=(",", ":")).encode("utf-8")
+
+        if key not in self._entries and len(self._entries) >= self.max_entries:
+            # Entries from older versions are dead weight; drop everything and refill
+            self._entries.clear()
+        cached = self._entries[key] = CachedResponse(version, body)
+        return cached
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches an ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
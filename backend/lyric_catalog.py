@@ -0,0 +1,240 @@
+import json
+import math
+import mmap
+import os
+import random
+import re
+import struct
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from scoring import RhymeScorer, ToneMatcher
+
+# Compiled catalog layout (little endian):
+#   header         MAGIC, version, lyric count, difficulty table size in bytes
+#   difficulties   JSON list of difficulty names, padded to 4 bytes
+#   offsets        (lyric count + 1) x uint32 into the record blob
+#   difficulty     lyric count x uint8 index into the difficulty list, padded to 4 bytes
+#   records        one compact JSON object per lyric
+MAGIC = b"RRLC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIII")
+LYRIC_ID_PREFIX = "lyric_"
+# Lyric ids come from clients, so only short ASCII digit runs are parsed
+LYRIC_ID = re.compile(re.escape(LYRIC_ID_PREFIX) + r"([0-9]{1,9})")
+
+DEFAULT_LYRICS = [
+    {
+        "lyric_text": "I'm moving fast like a flash of ___",
+        "options": ["trash", "cash", "dash"],
+        "correct_rhyme": "dash",
+        "beat_timing": 1.0
+    },
+    {
+        "lyric_text": "The rhythm flows like a river of ___",
+        "options": ["gold", "soul", "flow"],
+        "correct_rhyme": "flow",
+        "beat_timing": 1.2
+    },
+    {
+        "lyric_text": "My words hit hard like a hammer of ___",
+        "options": ["steel", "feel", "real"],
+        "correct_rhyme": "steel",
+        "beat_timing": 0.8
+    }
+]
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 4)
+
+def lyric_id(index: int) -> str:
+    return f"{LYRIC_ID_PREFIX}{index}"
+
+def lyric_index(lyric_id: str, count: Optional[int] = None) -> Optional[int]:
+    """Catalog position encoded in a lyric id, or None if it isn't a catalog id (or is past `count`)"""
+    match = LYRIC_ID.fullmatch(lyric_id)
+    if match is None:
+        return None
+    index = int(match.group(1))
+    return index if count is None or index < count else None
+
+def compile_records(lyrics: Iterable[Dict[str, Any]], rhyme_scorer: RhymeScorer,
+                    tone_matcher: ToneMatcher) -> bytes:
+    """
+    Precompute each lyric's rhyme target, tone and per-option scores and encode the catalog
+    Lyrics without a difficulty are playable at every difficulty
+    """
+    difficulties: List[str] = []
+    difficulty_codes = bytearray()
+    records = bytearray()
+    offsets = [0]
+
+    for lyric in lyrics:
+        text = lyric["lyric_text"]
+        words = text.split()
+        rhyme_target = (words[-2] if words[-1] == "___" else words[-1]) if len(words) >= 2 else ""
+        difficulty = lyric.get("difficulty", "")
+        if difficulty not in difficulties:
+            if len(difficulties) == 255:
+                raise ValueError("Lyric catalog has more than 255 difficulties")
+            difficulties.append(difficulty)
+        difficulty_codes.append(difficulties.index(difficulty))
+
+        records += json.dumps({
+            "lyric_text": text,
+            "options": lyric["options"],
+            "correct_rhyme": lyric["correct_rhyme"],
+            "beat_timing": lyric["beat_timing"],
+            "difficulty": difficulty,
+            "rhyme_target": rhyme_target,
+            "tone": tone_matcher.context_tone(text),
+            "scores": {
+                option: [
+                    rhyme_scorer.calculate_rhyme_accuracy(option, text),
+                    tone_matcher.calculate_tone_match(option, text)
+                ]
+                for option in lyric["options"]
+            }
+        }, separators=(",", ":")).encode("utf-8")
+        offsets.append(len(records))
+
+    difficulty_table = json.dumps(difficulties).encode("utf-8")
+    return b"".join([
+        HEADER.pack(MAGIC, FORMAT_VERSION, len(offsets) - 1, len(difficulty_table)),
+        _pad(difficulty_table),
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        _pad(bytes(difficulty_codes)),
+        bytes(records),
+    ])
+
+def compile_catalog(source_path: str, target_path: str, rhyme_scorer: RhymeScorer,
+                    tone_matcher: ToneMatcher) -> int:
+    """Compile a JSON-lines lyric file; returns the number of lyrics written"""
+    with open(source_path, encoding="utf-8") as handle:
+        lyrics = [json.loads(line) for line in handle if line.strip()]
+    data = compile_records(lyrics, rhyme_scorer, tone_matcher)
+
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(data)
+    os.replace(tmp_path, target_path)
+    return len(lyrics)
+
+class LyricCatalog:
+    """Random access to compiled lyrics by id, plus per-difficulty pools for sampling"""
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        self._buffer = buffer
+        magic, version, count, table_size = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a compiled lyric catalog")
+        if count == 0:
+            raise ValueError("Lyric catalog is empty")
+
+        view = memoryview(buffer)
+        offset = HEADER.size
+        self.difficulties: List[str] = json.loads(bytes(view[offset:offset + table_size]))
+        offset += table_size + (-table_size % 4)
+        self._offsets = view[offset:offset + (count + 1) * 4].cast("I")
+        offset += (count + 1) * 4
+        codes = bytes(view[offset:offset + count])
+        offset += count + (-count % 4)
+        self._records = view[offset:]
+        self._count = count
+
+        # Lyrics with no difficulty join every pool
+        shared = [i for i in range(count) if self.difficulties[codes[i]] == ""]
+        self._pools: Dict[str, Tuple[int, ...]] = {}
+        for code, difficulty in enumerate(self.difficulties):
+            if difficulty:
+                own = [i for i in range(count) if codes[i] == code]
+                self._pools[difficulty] = tuple(sorted(own + shared))
+        self._all = tuple(range(count))
+
+        self.get = lru_cache(maxsize=4096)(self._get)
+
+    @classmethod
+    def from_records(cls, lyrics: Iterable[Dict[str, Any]], rhyme_scorer: RhymeScorer,
+                     tone_matcher: ToneMatcher) -> "LyricCatalog":
+        return cls(compile_records(lyrics, rhyme_scorer, tone_matcher))
+
+    @classmethod
+    def load(cls, path: str) -> "LyricCatalog":
+        """Memory-map a compiled catalog so workers share its pages"""
+        with open(path, "rb") as handle:
+            return cls(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _get(self, index: int) -> Dict[str, Any]:
+        if not 0 <= index < self._count:
+            raise KeyError(index)
+        record = json.loads(bytes(self._records[self._offsets[index]:self._offsets[index + 1]]))
+        record["lyric_id"] = lyric_id(index)
+        return record
+
+    def by_id(self, lyric_id: str) -> Optional[Dict[str, Any]]:
+        index = lyric_index(lyric_id, self._count)
+        if index is None:
+            return None
+        return self.get(index)
+
+    def cached_scores(self, lyric_id: str, word: str) -> Optional[Tuple[float, float]]:
+        """Precomputed (rhyme, tone) scores when `word` is one of the lyric's options"""
+        lyric = self.by_id(lyric_id)
+        if lyric is None:
+            return None
+        scores = lyric["scores"].get(word)
+        return (scores[0], scores[1]) if scores is not None else None
+
+    def _pool(self, difficulty: str) -> Tuple[int, ...]:
+        return self._pools.get(difficulty) or self._all
+
+    def new_sampler(self, difficulty: str, rng: Optional[random.Random] = None) -> Dict[str, Any]:
+        """
+        Per-session sampling state: walks the difficulty's pool in a random order without
+        repeats (a random affine permutation), and only starts over once it's exhausted
+        """
+        rng = rng or random
+        size = len(self._pool(difficulty))
+        step = 1
+        if size > 2:
+            step = rng.randrange(1, size)
+            while math.gcd(step, size) != 1:
+                step = rng.randrange(1, size)
+        return {
+            "difficulty": difficulty,
+            "step": step,
+            "start": rng.randrange(size) if size else 0,
+            "position": 0
+        }
+
+    def next_lyric(self, sampler: Dict[str, Any]) -> Dict[str, Any]:
+        """Advance a sampler and return its lyric"""
+        pool = self._pool(sampler["difficulty"])
+        slot = (sampler["start"] + sampler["step"] * sampler["position"]) % len(pool)
+        sampler["position"] += 1
+        return self.get(pool[slot])
+
+def load_catalog(path: Optional[str], rhyme_scorer: RhymeScorer,
+                 tone_matcher: ToneMatcher) -> LyricCatalog:
+    """The compiled catalog at `path`, or the built-in lyrics when no path is configured"""
+    if not path:
+        return LyricCatalog.from_records(DEFAULT_LYRICS, rhyme_scorer, tone_matcher)
+    return LyricCatalog.load(path)
+
+if __name__ == "__main__":
+    import argparse
+
+    from phonetics import phonetic_backend_from_env
+
+    parser = argparse.ArgumentParser(description="Compile a JSON-lines lyric file into a catalog")
+    parser.add_argument("source", help="One JSON object per line: lyric_text, options, "
+                                       "correct_rhyme, beat_timing and optional difficulty")
+    parser.add_argument("target", help="Compiled catalog path")
+    args = parser.parse_args()
+
+    count = compile_catalog(args.source, args.target,
+                            RhymeScorer(phonetic_backend=phonetic_backend_from_env()), ToneMatcher())
+    print(f"Compiled {count} lyrics to {args.target}")
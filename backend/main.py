@@ -1,27 +1,81 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.websockets import WebSocketState
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Deque, NamedTuple, Tuple
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from functools import cached_property
+import asyncio
+import gc
+import hmac
 import time
 import json
+import math
+import os
 from datetime import datetime
 import uuid
 
 # Game scoring and rhyme detection imports
-from scoring import RhymeScorer, BeatScorer, ToneMatcher
-from models import GameSession, PlayerScore
-from database import get_db, engine
-import models
+from scoring import RhymeScorer, BeatScorer, ToneMatcher, GameScorer
+from scoring_pool import ScoringPool
+from phonetics import phonetic_backend_from_env
+from models import GameSession, PlayerScore, GameChoice, FlaggedScore
+from database import get_db, SessionLocal, ReadSessionLocal, read_engine, pool_stats, pending_migrations
+from export import (
+    EXPORT_TABLES, MAX_CHUNK_SIZE, DEFAULT_CHUNK_SIZE, MEDIA_TYPES, export_stream, format_unavailable, max_id
+)
+from session_store import create_session_store, DEFAULT_SESSION_TTL
+from journal import SessionJournal
+from choice_log import ChoiceLog
+from persistence import WriteBehindQueue
+from lyric_catalog import LyricCatalog, load_catalog
+from beat_clock import ClockOffsetEstimator, place_tap, server_time_ms
+from anticheat import assess
+from metrics import MetricsRegistry, MetricsMiddleware, SamplingProfiler
+from admission import AdmissionController, AdmissionMiddleware, retry_after_header
+from fast_json import FastJSONResponse, body_schema, decode_body, object_fields
+from leaderboard import LeaderboardIndex, LeaderboardResponseCache, ALL_DIFFICULTIES, etag_matches
+from race_rooms import RoomManager, RaceRoom, RacePlayer, RoomError
+from game_protocol import (
+    OP_START, OP_CHOICE, OP_NEXT, OP_END, OP_CLOCK, OP_JOIN, OP_GO, NEW_SESSION, CLOSE_SESSION_NOT_FOUND,
+    MAX_CHOICE_TEXT, ProtocolError, decode_message, encode_lyric, encode_feedback, encode_result, encode_error, encode_clock_probe,
+    encode_begin, encode_race_result
+)
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+# Nothing heavy happens at import; startup() and shutdown() below run around serving
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
 
 app = FastAPI(
     title="Rhyme Racer API",
     description="Backend API for the Rhyme Racer rhythm game",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Admission control for /game/ routes: optional per-IP and per-session token buckets, and a cap on
+# requests in flight. Requests are shed with a 503 once they'd queue too long, in the limiter or behind
+# a busy event loop; taps for games in progress go ahead of new games and may queue longer
+admission = AdmissionController(
+    max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", 64)),
+    play_wait=float(os.getenv("ADMISSION_PLAY_WAIT_MS", 200)) / 1000,
+    start_wait=float(os.getenv("ADMISSION_START_WAIT_MS", 50)) / 1000,
+    ip_rate=float(os.getenv("RATE_LIMIT_IP_RPS", 0)),
+    ip_burst=float(os.getenv("RATE_LIMIT_IP_BURST", 0)),
+    session_rate=float(os.getenv("RATE_LIMIT_SESSION_RPS", 0)),
+    session_burst=float(os.getenv("RATE_LIMIT_SESSION_BURST", 0)),
+    trust_forwarded=os.getenv("RATE_LIMIT_TRUST_FORWARDED") == "1"
+)
+# Inside CORS, so browsers can read rejections and their Retry-After
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
 # CORS middleware for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -29,12 +83,114 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
-# Initialize scoring components
-rhyme_scorer = RhymeScorer()
-beat_scorer = BeatScorer()
-tone_matcher = ToneMatcher()
+# Latency histograms, counters and gauges, scraped from /metrics
+metrics = MetricsRegistry()
+app.add_middleware(MetricsMiddleware, registry=metrics)
+
+def _stage_histogram(stage: str):
+    return metrics.histogram("scoring_stage_duration_seconds", "Time spent in each scoring stage", stage=stage)
+
+STAGE_BEAT = _stage_histogram("beat")
+STAGE_CATALOG = _stage_histogram("catalog_lookup")
+STAGE_RHYME = _stage_histogram("rhyme")
+STAGE_TONE = _stage_histogram("tone")
+STAGE_BATCH = _stage_histogram("batch")
+STAGE_POOL = _stage_histogram("pool")
+STAGE_FINAL_METRICS = _stage_histogram("final_metrics")
+SESSIONS_STARTED = metrics.counter("sessions_started_total", "Game sessions started")
+SESSIONS_ENDED = metrics.counter("sessions_ended_total", "Game sessions completed")
+CHOICES_SCORED = metrics.counter("choices_scored_total", "Word choices scored")
+SCORES_FLAGGED = metrics.counter("anticheat_scores_total", "Ended games the timing checks flagged", action="flagged")
+SCORES_QUARANTINED = metrics.counter("anticheat_scores_total", action="quarantined")
+
+# Opt-in sampling profiler; PROFILE_SAMPLE_HZ=97 or so costs well under 2% of a core
+PROFILE_SAMPLE_HZ = float(os.getenv("PROFILE_SAMPLE_HZ", 0))
+profiler = SamplingProfiler(hz=PROFILE_SAMPLE_HZ) if PROFILE_SAMPLE_HZ > 0 else None
+
+# Bearer token for admin routes that hand out player data (/admin/export); they're disabled without one
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin_token(request: Request):
+    """404 while ADMIN_TOKEN is unset, so the route doesn't exist; 401 without the matching bearer token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Disabled; set ADMIN_TOKEN to enable it")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+def check_session_rate(session_id: str, cost: int = 1):
+    """429 with Retry-After once a session goes over its token bucket"""
+    retry_after = admission.session_retry_after(session_id, cost)
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Too many requests for this session",
+                            headers={"Retry-After": retry_after_header(retry_after)})
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+class ScoringComponents:
+    """
+    Scorers and the lyric catalog, each built on first use rather than at import
+    The lifespan handler loads them before the first request; see PRELOAD_SCORERS below
+    """
+
+    @cached_property
+    def rhyme_scorer(self) -> RhymeScorer:
+        return RhymeScorer(phonetic_backend=phonetic_backend_from_env())
+
+    @cached_property
+    def beat_scorer(self) -> BeatScorer:
+        return BeatScorer()
+
+    @cached_property
+    def tone_matcher(self) -> ToneMatcher:
+        return ToneMatcher()
+
+    @cached_property
+    def game_scorer(self) -> GameScorer:
+        return GameScorer(self.rhyme_scorer, self.beat_scorer, self.tone_matcher)
+
+    @cached_property
+    def lyric_catalog(self) -> LyricCatalog:
+        # Lyrics with their option scores precomputed; LYRIC_CATALOG_PATH points at a compiled catalog
+        return load_catalog(os.getenv("LYRIC_CATALOG_PATH"), self.rhyme_scorer, self.tone_matcher)
+
+    def load(self):
+        self.game_scorer
+        self.lyric_catalog
+
+scorers = ScoringComponents()
+
+# For pre-forking servers (gunicorn --preload): build everything in the parent at import so the
+# workers share it, and freeze it out of the collector so GC passes don't copy its pages
+if os.getenv("PRELOAD_SCORERS") == "1":
+    scorers.load()
+    gc.freeze()
+
+# SCORING_EXECUTOR=process moves expensive rhyme/tone scoring off the event loop into worker processes
+SCORING_EXECUTOR = os.getenv("SCORING_EXECUTOR", "inline")
+if SCORING_EXECUTOR not in ("inline", "process"):
+    raise ValueError(f"SCORING_EXECUTOR must be 'inline' or 'process', not {SCORING_EXECUTOR!r}")
+# Created by the lifespan handler; processes can't be shared across a fork
+scoring_pool: Optional[ScoringPool] = None
+
+# Timing anomaly checks at game end: "quarantine" keeps the worst scores off player_scores and the
+# leaderboard, "flag" only records them in flagged_scores, "off" skips the checks
+ANTICHEAT_MODE = os.getenv("ANTICHEAT_MODE", "quarantine")
+if ANTICHEAT_MODE not in ("quarantine", "flag", "off"):
+    raise ValueError(f"ANTICHEAT_MODE must be 'quarantine', 'flag' or 'off', not {ANTICHEAT_MODE!r}")
+
+# One beat lasts BASE_BEAT_MS * the lyric's beat_timing; the web client pulses on the same grid
+BASE_BEAT_MS = 600
+# Input-to-send slack allowed between a tap and the message that reports it
+TAP_GRACE_MS = 150
+# A lyric's window is this many beats: taps are matched only to those beats, and a race moves on
+# once every racer has answered, or when the window ends
+LYRIC_BEATS = 8
 
 # Pydantic models for API requests/responses
 class GameStartRequest(BaseModel):
@@ -49,242 +205,889 @@ class LyricResponse(BaseModel):
     beat_timing: float
     session_id: str
 
+class NextLyricRequest(BaseModel):
+    session_id: str
+
 class PlayerChoice(BaseModel):
+    session_id: str
+    lyric_id: str = Field(max_length=MAX_CHOICE_TEXT)
+    chosen_word: str = Field(max_length=MAX_CHOICE_TEXT)
+    tap_timestamp: float
+    # Advisory only: taps are scored against the server's beat schedule
+    beat_timestamp: Optional[float] = None
+
+class PlayerChoiceBatch(BaseModel):
+    choices: List[PlayerChoice]
+
+# Choice bodies are decoded by hand (fast_json.object_fields); the models above document them
+class ChoiceInput(NamedTuple):
     session_id: str
     lyric_id: str
     chosen_word: str
     tap_timestamp: float
-    beat_timestamp: float
+
+# Longer lyric ids and words are a 422, as they wouldn't fit the journal or game_choices
+CHOICE_LIMITS = {"lyric_id": MAX_CHOICE_TEXT, "chosen_word": MAX_CHOICE_TEXT}
+CHOICE_FIELDS = tuple((name, kind, CHOICE_LIMITS.get(name)) for name, kind in ChoiceInput.__annotations__.items())
+
+class ClockSyncRequest(BaseModel):
+    session_id: str
+    client_time: float
+    # The server_time from the previous /game/clock response, echoed back straight away
+    server_time: Optional[float] = None
 
 class GameEndRequest(BaseModel):
     session_id: str
     total_score: int
     final_metrics: Dict[str, Any]
 
+class RaceRoomRequest(BaseModel):
+    difficulty: str = "medium"
+    capacity: int = 8
+
 class GameMetrics(BaseModel):
     rhyme_accuracy_score: float
     beat_sync_accuracy: float
     tone_match_score: float
     reaction_speed_avg: float
 
-# Game state storage (in production, use Redis or database)
-active_sessions: Dict[str, Dict] = {}
+# Buffered, batched database writes so handlers never wait on a commit
+write_behind = WriteBehindQueue(
+    SessionLocal,
+    batch_size=int(os.getenv("PERSIST_BATCH_SIZE", 500)),
+    flush_interval=float(os.getenv("PERSIST_FLUSH_INTERVAL", 0.5)),
+    max_pending=int(os.getenv("PERSIST_MAX_PENDING", 10000))
+)
+
+async def flush_evicted_session(session_id: str, session: Dict):
+    """Record an abandoned game as an incomplete GameSession row"""
+    await write_behind.put(GameSession, {
+        "session_id": session_id,
+        "player_name": session["player_name"],
+        "difficulty": session["difficulty"],
+        "start_time": datetime.utcfromtimestamp(session["start_time"]),
+        "end_time": datetime.utcnow(),
+        "total_score": 0,
+        "is_completed": 0
+    })
+
+# Game state storage; point SESSION_STORE_URL at Redis to run several workers.
+# In-memory sessions are reaped when idle and evicted LRU-first past the count/byte caps.
+# Optional journal of in-memory sessions, replayed at startup so restarts don't end games in progress
+SESSION_JOURNAL_DIR = os.getenv("SESSION_JOURNAL_DIR")
+session_journal = SessionJournal(
+    SESSION_JOURNAL_DIR,
+    segment_bytes=int(float(os.getenv("SESSION_JOURNAL_SEGMENT_MB", 16)) * 1024 * 1024),
+    commit_interval=float(os.getenv("SESSION_JOURNAL_COMMIT_MS", 10)) / 1000
+) if SESSION_JOURNAL_DIR else None
+
+session_store = create_session_store(
+    os.getenv("SESSION_STORE_URL", "memory://"),
+    ttl=int(os.getenv("SESSION_TTL_SECONDS", DEFAULT_SESSION_TTL)),
+    max_sessions=_optional_int("SESSION_MAX_COUNT"),
+    max_bytes=_optional_int("SESSION_MAX_BYTES"),
+    reap_interval=float(os.getenv("SESSION_REAP_INTERVAL", 30)),
+    on_evict=flush_evicted_session if os.getenv("SESSION_FLUSH_EVICTED") == "1" else None,
+    journal=session_journal
+)
+
+# Top scores per board, seeded from player_scores and updated as games end
+leaderboard = LeaderboardIndex(capacity=int(os.getenv("LEADERBOARD_CAPACITY", 1000)))
+leaderboard_cache = LeaderboardResponseCache(leaderboard)
+LEADERBOARD_CACHE_CONTROL = f"public, max-age={int(os.getenv('LEADERBOARD_MAX_AGE', 5))}"
+
+# Head-to-head race rooms; each room coalesces score updates into one standings frame per tick
+race_rooms = RoomManager(
+    race_seconds=float(os.getenv("RACE_SECONDS", 90)),
+    tick_histogram=metrics.histogram("race_tick_lateness_seconds", "How late race room ticks fire")
+)
+
+metrics.gauge("active_sessions", "Sessions resident in this worker's store",
+              lambda: session_store.stats().get("resident_sessions"))
+metrics.gauge("active_session_bytes", "Estimated size of resident sessions",
+              lambda: session_store.stats().get("resident_bytes"))
+metrics.gauge("write_behind_pending_rows", "Rows waiting in the write-behind queue",
+              lambda: write_behind.pending)
+metrics.gauge("admission_in_flight", "Game requests being handled",
+              lambda: admission.limiter.active if admission.limiter else None)
+metrics.counter_reader("admission_shed_requests_total", "Game requests shed with a 503",
+                       lambda: admission.stats["shed_play"], priority="play")
+metrics.counter_reader("admission_shed_requests_total", "", lambda: admission.stats["shed_start"], priority="start")
+metrics.gauge("race_rooms", "Race rooms open in this worker", lambda: len(race_rooms.rooms))
+metrics.gauge("race_players", "Players connected to race rooms", lambda: race_rooms.gauges()["connected_players"])
+metrics.counter_reader("scoring_pool_fallbacks_total", "Pool scores replaced by estimates",
+                       lambda: scoring_pool.stats["timeouts"] if scoring_pool else None, reason="timeout")
+metrics.counter_reader("scoring_pool_fallbacks_total", "",
+                       lambda: scoring_pool.stats["failures"] if scoring_pool else None, reason="failure")
+
+def seed_leaderboard():
+    db = ReadSessionLocal()
+    try:
+        leaderboard.seed(db)
+    finally:
+        db.close()
+
+async def startup():
+    global scoring_pool
+    pending = await asyncio.to_thread(pending_migrations)
+    if pending:
+        raise RuntimeError(f"Database schema is missing {', '.join(pending)}; "
+                           f"run `python migrate.py` to bring it up to date")
+    await asyncio.to_thread(scorers.load)
+    await asyncio.to_thread(seed_leaderboard)
+    write_behind.start()
+    await session_store.start()
+    if admission.lag_monitor is not None:
+        admission.lag_monitor.start()
+    if SCORING_EXECUTOR == "process":
+        scoring_pool = ScoringPool(
+            scorers.game_scorer,
+            workers=_optional_int("SCORING_WORKERS"),
+            timeout=float(os.getenv("SCORING_TIMEOUT_MS", 250)) / 1000
+        )
+        await scoring_pool.start()
+    if profiler is not None:
+        # Started from the event loop thread, which is the thread it samples
+        profiler.start()
+
+async def shutdown():
+    if admission.lag_monitor is not None:
+        admission.lag_monitor.stop()
+    await race_rooms.close()
+    # Close the store first so its evicted sessions still reach the write-behind queue
+    await session_store.close()
+    await asyncio.to_thread(write_behind.close)
+    if scoring_pool is not None:
+        scoring_pool.close()
+    if profiler is not None:
+        profiler.stop()
+        profiler.dump(os.getenv("PROFILE_OUTPUT", "profile.collapsed"))
 
 @app.get("/")
 async def root():
     return {"message": "Rhyme Racer API is running! 🎮"}
 
-@app.post("/game/start", response_model=LyricResponse)
+@app.post("/game/start", response_model=LyricResponse, response_class=FastJSONResponse)
 async def start_game(request: GameStartRequest):
     """Start a new game session and return the first lyric"""
-    session_id = str(uuid.uuid4())
-    
-    # Create session record
-    session = GameSession(
-        session_id=session_id,
-        player_name=request.player_name,
-        difficulty=request.difficulty,
-        start_time=datetime.utcnow()
-    )
-    
-    # Store session data
-    active_sessions[session_id] = {
-        "player_name": request.player_name,
-        "difficulty": request.difficulty,
-        "start_time": time.time(),
-        "choices": [],
-        "current_lyric_index": 0
-    }
-    
-    # Generate first lyric
-    lyric_data = generate_lyric(session_id, 0)
+    session_id, lyric_data = await begin_session(request.player_name, request.difficulty)
+    return lyric_response(lyric_data, session_id)
+
+@app.post("/game/next", response_model=LyricResponse, response_class=FastJSONResponse)
+async def next_lyric(request: NextLyricRequest):
+    """Advance the session to its next lyric"""
+    check_session_rate(request.session_id)
+    session = await session_store.get(request.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
     
-    return LyricResponse(
-        lyric_id=lyric_data["lyric_id"],
-        lyric_text=lyric_data["lyric_text"],
-        options=lyric_data["options"],
-        correct_rhyme=lyric_data["correct_rhyme"],
-        beat_timing=lyric_data["beat_timing"],
-        session_id=session_id
-    )
+    lyric_data = await advance_session(request.session_id, session)
+    return lyric_response(lyric_data, request.session_id)
 
-@app.post("/game/choice")
-async def submit_choice(choice: PlayerChoice):
+@app.post("/game/choice", response_class=FastJSONResponse, openapi_extra=body_schema(PlayerChoice))
+async def submit_choice(request: Request):
     """Process player's word choice and return scoring feedback"""
-    if choice.session_id not in active_sessions:
+    received_at = server_time_ms()
+    choice = ChoiceInput(*object_fields(decode_body(await request.body()), CHOICE_FIELDS))
+    check_session_rate(choice.session_id)
+    session = await session_store.get(choice.session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = active_sessions[choice.session_id]
-    
-    # Calculate timing accuracy
-    timing_offset = abs(choice.tap_timestamp - choice.beat_timestamp)
-    beat_accuracy = max(0, 1 - (timing_offset / 500))  # 500ms tolerance
-    
-    # Calculate rhyme accuracy
-    rhyme_accuracy = rhyme_scorer.calculate_rhyme_accuracy(
-        choice.chosen_word, 
-        session.get("current_lyric", "")
+    choice_record = await record_choice(
+        choice.session_id, session, choice.lyric_id, choice.chosen_word, choice.tap_timestamp,
+        ClockOffsetEstimator.from_dict(session.get("clock")), received_at
     )
+    return FastJSONResponse(choice_response(choice_record))
+
+@app.post("/game/choices", response_class=FastJSONResponse, openapi_extra=body_schema(PlayerChoiceBatch))
+async def submit_choices(request: Request):
+    """Process a burst of word choices in one round trip, returning feedback in order"""
+    received_at = server_time_ms()
+    items, = object_fields(decode_body(await request.body()), (("choices", list),))
+    choices = [
+        ChoiceInput(*object_fields(item, CHOICE_FIELDS, ("body", "choices", i))) for i, item in enumerate(items)
+    ]
+    for session_id, count in Counter(choice.session_id for choice in choices).items():
+        check_session_rate(session_id, count)
+    sessions = {}
+    clocks = {}
+    for choice in choices:
+        if choice.session_id not in sessions:
+            sessions[choice.session_id] = await session_store.get(choice.session_id)
+            if sessions[choice.session_id] is None:
+                raise HTTPException(status_code=404, detail="Session not found")
+            clocks[choice.session_id] = ClockOffsetEstimator.from_dict(sessions[choice.session_id].get("clock"))
     
-    # Calculate tone match
-    tone_score = tone_matcher.calculate_tone_match(
-        choice.chosen_word,
-        session.get("current_lyric", "")
-    )
+    # A burst may hold taps from earlier lyrics, so anything since the session began is accepted. Only
+    # the current lyric's grid is known, so taps for earlier lyrics are matched on it unbounded.
+    tap_times = []
+    schedules = []
+    window_beats = []
+    for choice in choices:
+        session = sessions[choice.session_id]
+        clock = clocks[choice.session_id]
+        tap_times.append(place_tap(choice.tap_timestamp, received_at, clock, session["start_time"] * 1000))
+        schedules.append(beat_schedule(session, clock))
+        window_beats.append(LYRIC_BEATS if choice.lyric_id == session.get("current_lyric_id") else math.inf)
+    periods = [period for _, period in schedules]
+    words = [choice.chosen_word for choice in choices]
+    contexts = [lyric_context(choice.lyric_id, sessions[choice.session_id]) for choice in choices]
+    lyric_ids = [catalog_lyric_id(choice.lyric_id) for choice in choices]
+    offload = scoring_pool is not None and not all(map(scoring_pool.is_cheap, words, contexts))
+    with (STAGE_POOL if offload else STAGE_BATCH).time():
+        beat_times = scorers.beat_scorer.nearest_beat_batch(
+            tap_times, [anchor for anchor, _ in schedules], periods, window_beats
+        )
+        if offload:
+            rhyme_scores, tone_scores = await scoring_pool.score_pairs(words, contexts, lyric_ids)
+            scores = scorers.game_scorer.combine_batch(rhyme_scores, tone_scores, tap_times, beat_times, periods)
+        else:
+            scores = scorers.game_scorer.score_batch(words, contexts, tap_times, beat_times, lyric_ids, periods)
+    timing_offsets = scores["timing_offset"]
+    beat_scores = scores["beat_accuracy"]
+    session_lyric_ids = {session_id: session.get("current_lyric_id") for session_id, session in sessions.items()}
     
-    # Store choice data
-    session["choices"].append({
-        "lyric_id": choice.lyric_id,
-        "chosen_word": choice.chosen_word,
-        "tap_timestamp": choice.tap_timestamp,
-        "beat_timestamp": choice.beat_timestamp,
-        "timing_offset": timing_offset,
-        "rhyme_accuracy": rhyme_accuracy,
-        "tone_score": tone_score,
-        "beat_accuracy": beat_accuracy
-    })
+    results = []
+    stored_choices: Dict[str, List[Dict]] = {session_id: [] for session_id in sessions}
+    for i, choice in enumerate(choices):
+        choice_record = {
+            "lyric_id": choice.lyric_id,
+            "chosen_word": choice.chosen_word,
+            "tap_timestamp": tap_times[i],
+            "beat_timestamp": float(beat_times[i]),
+            "timing_offset": float(timing_offsets[i]),
+            "rhyme_accuracy": float(scores["rhyme_accuracy"][i]),
+            "tone_score": float(scores["tone_match"][i]),
+            "beat_accuracy": float(beat_scores[i])
+        }
+        if choice.lyric_id == session_lyric_ids[choice.session_id]:
+            choice_record["reaction_time"] = tap_times[i] - schedules[i][0]
+        stored_choices[choice.session_id].append(choice_record)
+        await write_behind.put(GameChoice, game_choice_row(choice.session_id, choice_record))
+        results.append(choice_response(choice_record))
     
-    # Calculate feedback
-    feedback = calculate_feedback(rhyme_accuracy, beat_accuracy, tone_score)
+    for session_id, session_choices in stored_choices.items():
+        await session_store.append_choices(session_id, session_choices)
+    CHOICES_SCORED.inc(len(choices))
     
-    return {
-        "feedback": feedback,
-        "metrics": {
-            "rhyme_accuracy": rhyme_accuracy,
-            "beat_accuracy": beat_accuracy,
-            "tone_score": tone_score,
-            "timing_offset": timing_offset
-        },
-        "speed_boost": feedback.get("speed_boost", 0)
-    }
+    return FastJSONResponse(b'{"results":[' + b",".join(results) + b"]}")
 
-@app.post("/game/end")
+@app.post("/game/end", response_class=FastJSONResponse)
 async def end_game(request: GameEndRequest):
     """End game session and calculate final metrics"""
-    if request.session_id not in active_sessions:
+    final_metrics = await finish_session(request.session_id, request.total_score)
+    if final_metrics is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = active_sessions[request.session_id]
-    choices = session["choices"]
+    return FastJSONResponse({
+        "final_metrics": final_metrics,
+        "message": "Game completed successfully!"
+    })
+
+@app.post("/game/clock", response_class=FastJSONResponse)
+async def sync_clock(request: ClockSyncRequest):
+    """
+    Clock sync exchange: echo each response's server_time in an immediate follow-up call
+    Every echo gives the server one NTP-style sample of the client's clock offset
+    """
+    received_at = server_time_ms()
+    check_session_rate(request.session_id)
+    session = await session_store.get(request.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    updates = {}
+    # Only the probe this session was last handed counts, so clients can't invent samples
+    if request.server_time is not None and request.server_time == session.get("clock_probe"):
+        clock = ClockOffsetEstimator.from_dict(session.get("clock"))
+        if clock.add_sample(request.server_time, request.client_time, received_at):
+            updates["clock"] = clock.to_dict()
+    
+    server_time = server_time_ms()
+    updates["clock_probe"] = server_time
+    await session_store.update(request.session_id, updates)
+    return FastJSONResponse({"server_time": server_time})
+
+WS_MESSAGE_LATENCY = {
+    opcode: metrics.histogram("ws_message_duration_seconds", "Time to handle one game channel message", op=name)
+    for opcode, name in ((OP_START, "start"), (OP_CHOICE, "choice"), (OP_NEXT, "next"),
+                         (OP_END, "end"), (OP_CLOCK, "clock"))
+}
+WS_INVALID_MESSAGE_LATENCY = metrics.histogram("ws_message_duration_seconds", op="invalid")
+
+@app.websocket("/game/ws/{session_id}")
+async def game_channel(websocket: WebSocket, session_id: str):
+    """
+    One persistent connection per game, speaking the compact array protocol in game_protocol
+    Connect to /game/ws/new and send a start message, or pass an existing session id to resume.
+    Each choice is answered with its feedback followed by the pushed next lyric.
+    """
+    await websocket.accept()
+    session = None
+    clock = ClockOffsetEstimator()
+    # Probe timestamps sent on this connection and not yet echoed
+    probes: Deque[float] = deque(maxlen=8)
+    
+    async def send_lyric(lyric_data: Dict):
+        await websocket.send_text(encode_lyric(lyric_data, session_id))
+        # Each lyric is followed by a clock probe, keeping the offset estimate fresh all game
+        probe = server_time_ms()
+        probes.append(probe)
+        await websocket.send_text(encode_clock_probe(probe))
+    
+    if session_id != NEW_SESSION:
+        session = await session_store.get(session_id)
+        if session is None:
+            await websocket.close(code=CLOSE_SESSION_NOT_FOUND)
+            return
+        clock = ClockOffsetEstimator.from_dict(session.get("clock"))
+    
+    try:
+        while True:
+            text = await websocket.receive_text()
+            received_at = server_time_ms()
+            started = time.perf_counter_ns()
+            opcode = None
+            try:
+                try:
+                    message = decode_message(text)
+                except ProtocolError as exc:
+                    await websocket.send_text(encode_error(400, str(exc)))
+                    continue
+                opcode = message[0]
+                
+                if opcode == OP_CLOCK:
+                    if message[1] in probes:
+                        probes.remove(message[1])
+                        clock.add_sample(message[1], message[2], received_at)
+                    continue
+                
+                if opcode == OP_START:
+                    session_id, lyric_data = await begin_session(message[1], message[2])
+                    session = await session_store.get(session_id)
+                    await send_lyric(lyric_data)
+                    continue
+                
+                if session is None:
+                    await websocket.send_text(encode_error(409, "Send a start message first"))
+                    continue
+                retry_after = admission.session_retry_after(session_id)
+                if retry_after:
+                    await websocket.send_text(encode_error(429, f"Too many requests; retry in {retry_after:.1f}s"))
+                    continue
+                
+                if opcode == OP_CHOICE:
+                    # Re-read so scoring sees the lyric other requests may have advanced to
+                    session = await session_store.get(session_id)
+                    if session is None:
+                        await websocket.send_text(encode_error(404, "Session not found"))
+                        continue
+                    lyric_id, chosen_word, tap_timestamp, _ = message[1:]
+                    choice_record = await record_choice(
+                        session_id, session, lyric_id, chosen_word, tap_timestamp, clock, received_at
+                    )
+                    await websocket.send_text(encode_feedback(choice_record, feedback_for(choice_record)))
+                    lyric_data = await advance_session(session_id, session)
+                    await send_lyric(lyric_data)
+                
+                elif opcode == OP_NEXT:
+                    session = await session_store.get(session_id)
+                    if session is None:
+                        await websocket.send_text(encode_error(404, "Session not found"))
+                        continue
+                    lyric_data = await advance_session(session_id, session)
+                    await send_lyric(lyric_data)
+                
+                elif opcode == OP_END:
+                    final_metrics = await finish_session(session_id, message[1])
+                    if final_metrics is None:
+                        await websocket.send_text(encode_error(404, "Session not found"))
+                    else:
+                        await websocket.send_text(encode_result(final_metrics))
+                    await websocket.close()
+                    return
+            finally:
+                WS_MESSAGE_LATENCY.get(opcode, WS_INVALID_MESSAGE_LATENCY).record_ns(time.perf_counter_ns() - started)
+    except WebSocketDisconnect:
+        # The session stays in the store, so the client can reconnect or fall back to REST
+        pass
+
+@app.post("/race/rooms")
+async def create_race_room(request: RaceRoomRequest):
+    """Open a race room for 2-50 players; they join over /race/ws/{room_id}"""
+    try:
+        room = race_rooms.create(request.difficulty, request.capacity, advance_race, finish_race, abandon_race)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    room.game["sampler"] = scorers.lyric_catalog.new_sampler(request.difficulty)
+    return {"room_id": room.room_id, "difficulty": room.difficulty, "capacity": room.capacity}
+
+@app.get("/race/rooms/{room_id}")
+async def get_race_room(room_id: str):
+    room = race_rooms.get(room_id)
+    if room is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return {"room_id": room_id, "state": room.state, "capacity": room.capacity,
+            "difficulty": room.difficulty, "players": room.roster()}
+
+@app.websocket("/race/ws/{room_id}")
+async def race_channel(websocket: WebSocket, room_id: str):
+    """
+    A race room connection: join, start the race, then answer the lyrics every player is sent
+    After joining, everything the server sends goes through the player's room subscriber.
+    """
+    await websocket.accept()
+    room = race_rooms.get(room_id)
+    if room is None:
+        await websocket.close(code=CLOSE_SESSION_NOT_FOUND)
+        return
+    player: Optional[RacePlayer] = None
+    clock = ClockOffsetEstimator()
+    last_probe = 0.0
     
-    # Calculate final metrics
-    final_metrics = calculate_final_metrics(choices)
+    async def reply(frame: str):
+        if player is None:
+            await websocket.send_text(frame)
+        elif player.subscriber is not None:
+            player.subscriber.push(frame)
+    
+    try:
+        # The room closes the connection itself when the race ends or the player falls too far behind
+        while websocket.application_state == WebSocketState.CONNECTED:
+            text = await websocket.receive_text()
+            received_at = server_time_ms()
+            try:
+                message = decode_message(text)
+            except ProtocolError as exc:
+                await reply(encode_error(400, str(exc)))
+                continue
+            opcode = message[0]
+            
+            if opcode == OP_CLOCK:
+                # Probes are shared by the room, so each one counts once per connection
+                if message[1] > last_probe and message[1] in room.probes:
+                    last_probe = message[1]
+                    clock.add_sample(message[1], message[2], received_at)
+            elif opcode == OP_JOIN:
+                if player is not None:
+                    await reply(encode_error(409, "Already joined"))
+                    continue
+                try:
+                    player = await join_race(room, message[1], websocket)
+                except RoomError as exc:
+                    await reply(encode_error(409, str(exc)))
+            elif player is None:
+                await reply(encode_error(409, "Send a join message first"))
+            elif opcode == OP_GO:
+                try:
+                    await start_race(room)
+                except RoomError as exc:
+                    await reply(encode_error(409, str(exc)))
+            elif opcode == OP_CHOICE:
+                await race_choice(room, player, message[1], message[2], message[3], clock, received_at, reply)
+            else:
+                await reply(encode_error(400, f"Opcode {opcode!r} is not used in races"))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if player is not None and room.leave(player.player_id):
+            # Left before the race began, so there's no score to keep
+            await session_store.pop(player.player_id)
+
+@app.get("/admin/sessions")
+async def get_session_stats():
+    """Resident session gauges and eviction counters"""
+    return session_store.stats()
+
+@app.get("/admin/persistence")
+async def get_persistence_stats():
+    """Write-behind queue depth and throughput counters, and database pool occupancy"""
+    return {"pending_rows": write_behind.pending, **write_behind.stats, "pools": pool_stats()}
+
+@app.get("/admin/scoring")
+async def get_scoring_stats():
+    """Scoring executor mode and process pool counters"""
+    if scoring_pool is None:
+        return {"executor": SCORING_EXECUTOR}
+    return {"executor": SCORING_EXECUTOR, "workers": scoring_pool.workers, **scoring_pool.stats}
+
+@app.get("/admin/export/{table}", dependencies=[Depends(require_admin_token)])
+async def export_table(table: str, format: str = "ndjson", after_id: int = 0, until_id: Optional[int] = None,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Stream game_choices or player_scores as NDJSON, Arrow IPC or Parquet, in id order
+    Rows are read in keyset-paged chunks off the event loop. X-Export-Until-Id is the snapshot's last id;
+    an interrupted export resumes with after_id set to the last id received.
+    """
+    source = EXPORT_TABLES.get(table)
+    if source is None:
+        raise HTTPException(status_code=404, detail=f"Unknown table; exportable: {', '.join(EXPORT_TABLES)}")
+    problem = format_unavailable(format)
+    if problem:
+        raise HTTPException(status_code=501 if format in ("arrow", "parquet") else 400, detail=problem)
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE or after_id < 0:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be 1-{MAX_CHUNK_SIZE}; after_id non-negative")
     
-    # Save to database
-    player_score = PlayerScore(
-        session_id=request.session_id,
-        player_name=session["player_name"],
-        total_score=request.total_score,
-        rhyme_accuracy=final_metrics["rhyme_accuracy_score"],
-        beat_sync_accuracy=final_metrics["beat_sync_accuracy"],
-        tone_match_score=final_metrics["tone_match_score"],
-        reaction_speed_avg=final_metrics["reaction_speed_avg"],
-        created_at=datetime.utcnow()
+    if until_id is None:
+        until_id = await asyncio.to_thread(max_id, read_engine, source)
+    stream = export_stream(read_engine, source, format, after_id, until_id, chunk_size)
+    # Starlette drains a plain iterator in its thread pool, so the database reads never block the loop
+    return StreamingResponse(
+        stream,
+        media_type=MEDIA_TYPES[format],
+        headers={"X-Export-After-Id": str(after_id), "X-Export-Until-Id": str(until_id)}
     )
+
+@app.get("/admin/rooms")
+async def get_room_stats():
+    """Open race rooms, connected players and broadcast frame counters"""
+    return {**race_rooms.gauges(), **race_rooms.stats}
+
+@app.get("/admin/admission")
+async def get_admission_stats():
+    """Requests in flight and queued, event loop lag, and admission counters"""
+    return admission.snapshot()
+
+@app.get("/admin/latency")
+async def get_latency_summaries():
+    """p50/p90/p99/p99.9 of every latency histogram, at full histogram resolution"""
+    return metrics.histogram_summaries()
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def get_profile():
+    """Collapsed stacks sampled so far, for flamegraph.pl or speedscope"""
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler is off; set PROFILE_SAMPLE_HZ to enable it")
+    return profiler.collapsed()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/leaderboard")
+async def get_leaderboard(request: Request, limit: int = 10, offset: int = 0,
+                          board: str = ALL_DIFFICULTIES, window: str = "all"):
+    """Get top player scores for a difficulty board and time window (all, daily, weekly)"""
+    if limit < 0 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit and offset must be non-negative")
+    try:
+        cached = leaderboard_cache.get(board, window, offset, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     
-    # Clean up session
-    del active_sessions[request.session_id]
+    headers = {"ETag": cached.etag, "Cache-Control": LEADERBOARD_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+async def begin_session(player_name: str, difficulty: str):
+    """Create a session; returns its id and first lyric"""
+    session_id = str(uuid.uuid4())
     
-    return {
-        "final_metrics": final_metrics,
-        "message": "Game completed successfully!"
+    # Pick the first lyric from this session's non-repeating walk of the catalog
+    sampler = scorers.lyric_catalog.new_sampler(difficulty)
+    lyric_data = scorers.lyric_catalog.next_lyric(sampler)
+    
+    # Store session data
+    start_time = time.time()
+    await session_store.create(session_id, {
+        "player_name": player_name,
+        "difficulty": difficulty,
+        "start_time": start_time,
+        "current_lyric_index": 0,
+        "current_lyric_id": lyric_data["lyric_id"],
+        "current_lyric": lyric_data["lyric_text"],
+        "lyric_sampler": sampler,
+        # The first lyric's beat grid starts with the session
+        "lyric_delivered_at": start_time * 1000,
+        "beat_period": BASE_BEAT_MS * lyric_data["beat_timing"]
+    })
+    SESSIONS_STARTED.inc()
+    return session_id, lyric_data
+
+async def advance_session(session_id: str, session: Dict) -> Dict:
+    """Move a session on to its next lyric and return it"""
+    sampler = dict(session["lyric_sampler"])
+    lyric_data = scorers.lyric_catalog.next_lyric(sampler)
+    updates = {
+        "current_lyric_index": session["current_lyric_index"] + 1,
+        "current_lyric_id": lyric_data["lyric_id"],
+        "current_lyric": lyric_data["lyric_text"],
+        "lyric_sampler": sampler,
+        "lyric_delivered_at": server_time_ms(),
+        "beat_period": BASE_BEAT_MS * lyric_data["beat_timing"]
     }
+    await session_store.update(session_id, updates)
+    session.update(updates)
+    return lyric_data
 
-@app.get("/leaderboard")
-async def get_leaderboard(limit: int = 10):
-    """Get top player scores"""
-    # In production, query database
-    return {
-        "leaderboard": [
-            {"player": "Player1", "score": 9500, "accuracy": 0.92},
-            {"player": "Player2", "score": 8900, "accuracy": 0.88},
-            {"player": "Player3", "score": 8200, "accuracy": 0.85},
-        ]
+def beat_schedule(session: Dict, clock: ClockOffsetEstimator) -> Tuple[float, float]:
+    """
+    (anchor, period) in server ms of the beat grid for the session's current lyric
+    The client starts its grid when the lyric arrives, one estimated one-way delay after it was sent
+    """
+    delivered_at = session.get("lyric_delivered_at", session["start_time"] * 1000)
+    return delivered_at + clock.one_way_delay, session.get("beat_period", BASE_BEAT_MS)
+
+async def record_choice(session_id: str, session: Dict, lyric_id: str, chosen_word: str,
+                        tap_timestamp: Optional[float], clock: ClockOffsetEstimator,
+                        received_at: float) -> Dict:
+    """Score one choice, store it on the session and queue its GameChoice row"""
+    # Place the tap on the server clock and score it against the server's beat schedule;
+    # the client's claim only counts within one message delay of its arrival
+    earliest = received_at - clock.max_one_way_delay - TAP_GRACE_MS
+    tap_time = place_tap(tap_timestamp, received_at, clock, earliest)
+    anchor, period = beat_schedule(session, clock)
+    with STAGE_BEAT.time():
+        beat_accuracy, timing_offset, beat_time = scorers.beat_scorer.score_tap(tap_time, anchor, period, LYRIC_BEATS)
+    
+    # Offered options were scored when the catalog was built
+    with STAGE_CATALOG.time():
+        cached_scores = scorers.lyric_catalog.cached_scores(lyric_id, chosen_word)
+    if cached_scores is not None:
+        rhyme_accuracy, tone_score = cached_scores
+    else:
+        context = lyric_context(lyric_id, session)
+        if scoring_pool is not None and not scoring_pool.is_cheap(chosen_word, context):
+            with STAGE_POOL.time():
+                rhyme_accuracy, tone_score = await scoring_pool.score(
+                    chosen_word, context, catalog_lyric_id(lyric_id)
+                )
+        else:
+            with STAGE_RHYME.time():
+                rhyme_accuracy = scorers.rhyme_scorer.calculate_rhyme_accuracy(chosen_word, context)
+            with STAGE_TONE.time():
+                tone_score = scorers.tone_matcher.calculate_tone_match(chosen_word, context, catalog_lyric_id(lyric_id))
+    
+    choice_record = {
+        "lyric_id": lyric_id,
+        "chosen_word": chosen_word,
+        "tap_timestamp": tap_time,
+        "beat_timestamp": beat_time,
+        "timing_offset": timing_offset,
+        "rhyme_accuracy": rhyme_accuracy,
+        "tone_score": tone_score,
+        "beat_accuracy": beat_accuracy
     }
+    # Reaction time only means something for the lyric the client was shown last
+    if lyric_id == session.get("current_lyric_id"):
+        choice_record["reaction_time"] = tap_time - anchor
+    await session_store.append_choices(session_id, [choice_record])
+    await write_behind.put(GameChoice, game_choice_row(session_id, choice_record))
+    CHOICES_SCORED.inc()
+    return choice_record
 
-def generate_lyric(session_id: str, lyric_index: int) -> Dict:
-    """Generate a lyric with rhyming options"""
-    lyrics = [
-        {
-            "lyric_text": "I'm moving fast like a flash of ___",
-            "options": ["trash", "cash", "dash"],
-            "correct_rhyme": "dash",
-            "beat_timing": 1.0
-        },
-        {
-            "lyric_text": "The rhythm flows like a river of ___",
-            "options": ["gold", "soul", "flow"],
-            "correct_rhyme": "flow",
-            "beat_timing": 1.2
-        },
-        {
-            "lyric_text": "My words hit hard like a hammer of ___",
-            "options": ["steel", "feel", "real"],
-            "correct_rhyme": "steel",
-            "beat_timing": 0.8
-        }
-    ]
+async def finish_session(session_id: str, total_score: int) -> Optional[Dict[str, float]]:
+    """Close out a session and record its score; None if the session doesn't exist"""
+    # Removing the session up front also stops a duplicate end from scoring twice
+    session = await session_store.pop(session_id)
+    if session is None:
+        return None
     
-    lyric_data = lyrics[lyric_index % len(lyrics)]
+    with STAGE_FINAL_METRICS.time():
+        final_metrics = calculate_final_metrics(session["choices"])
     
-    return {
-        "lyric_id": f"lyric_{lyric_index}",
+    player_score = {
+        "session_id": session_id,
+        "player_name": session["player_name"],
+        "difficulty": session["difficulty"],
+        "total_score": total_score,
+        "rhyme_accuracy": final_metrics["rhyme_accuracy_score"],
+        "beat_sync_accuracy": final_metrics["beat_sync_accuracy"],
+        "tone_match_score": final_metrics["tone_match_score"],
+        "reaction_speed_avg": final_metrics["reaction_speed_avg"],
+        "created_at": datetime.utcnow()
+    }
+    # The response is the same either way, so a flagged client can't tell it was caught
+    verdict = assess(session["choices"].timing) if ANTICHEAT_MODE != "off" else None
+    quarantined = verdict is not None and verdict.action == "quarantine" and ANTICHEAT_MODE == "quarantine"
+    if verdict is not None and verdict.action != "ok":
+        await write_behind.put(FlaggedScore, {
+            **player_score,
+            "anomaly_score": verdict.score,
+            "reasons": ",".join(verdict.reasons),
+            "action": "quarantined" if quarantined else "flagged",
+            "flagged_at": player_score["created_at"]
+        })
+        (SCORES_QUARANTINED if quarantined else SCORES_FLAGGED).inc()
+    if not quarantined:
+        await write_behind.put(PlayerScore, player_score)
+        leaderboard.add(player_score)
+    SESSIONS_ENDED.inc()
+    return final_metrics
+
+async def join_race(room: RaceRoom, player_name: str, websocket: WebSocket) -> RacePlayer:
+    """Add a player to a room's lobby, with a session that follows the room's lyrics"""
+    player = room.join(player_name, websocket.send_text, websocket.close)
+    start_time = time.time()
+    await session_store.create(player.player_id, {
+        "player_name": player_name,
+        "difficulty": room.difficulty,
+        "start_time": start_time,
+        "current_lyric_index": 0,
+        "current_lyric_id": "",
+        "current_lyric": "",
+        "room_id": room.room_id,
+        "lyric_delivered_at": start_time * 1000,
+        "beat_period": BASE_BEAT_MS
+    })
+    return player
+
+async def start_race(room: RaceRoom):
+    room.start()
+    room.broadcast(encode_begin(room.race_seconds * 1000))
+    await advance_race(room)
+
+async def advance_race(room: RaceRoom):
+    """Deal every player the room's next lyric; encoded once, whatever the room size"""
+    lyric_data = scorers.lyric_catalog.next_lyric(room.game["sampler"])
+    beat_period = BASE_BEAT_MS * lyric_data["beat_timing"]
+    room.set_lyric(lyric_data, LYRIC_BEATS * beat_period / 1000)
+    updates = {
+        "current_lyric_index": room.lyric_index,
+        "current_lyric_id": lyric_data["lyric_id"],
+        "current_lyric": lyric_data["lyric_text"],
+        "lyric_delivered_at": server_time_ms(),
+        "beat_period": beat_period
+    }
+    # Sessions first, so no answer to the new lyric can be scored against the old one
+    await asyncio.gather(*(session_store.update(player_id, updates) for player_id in room.players))
+    room.broadcast(encode_lyric(lyric_data, room.room_id))
+    probe = server_time_ms()
+    room.probes.append(probe)
+    room.broadcast(encode_clock_probe(probe))
+
+async def race_choice(room: RaceRoom, player: RacePlayer, lyric_id: str, chosen_word: str,
+                      tap_timestamp: float, clock: ClockOffsetEstimator, received_at: float, reply):
+    """Score a racer's answer to the current lyric; the rest of the room sees it on the next tick"""
+    if room.state != "racing" or room.lyric is None:
+        await reply(encode_error(409, "The race hasn't started"))
+        return
+    if lyric_id != room.lyric["lyric_id"] or player.answered == room.lyric_index:
+        await reply(encode_error(409, "Answer the current lyric, once"))
+        return
+    player.answered = room.lyric_index
+    session = await session_store.get(player.player_id)
+    if session is None:
+        await reply(encode_error(404, "Session not found"))
+        return
+    choice_record = await record_choice(
+        player.player_id, session, lyric_id, chosen_word, tap_timestamp, clock, received_at
+    )
+    feedback = feedback_for(choice_record)
+    await reply(encode_feedback(choice_record, feedback))
+    room.record_score(player, choice_points(choice_record), feedback.speed_boost)
+
+async def finish_race(room: RaceRoom):
+    """Record every racer's score, including those who left, and send the final standings"""
+    room.state = "finished"
+    for player in room.players.values():
+        await finish_session(player.player_id, player.score)
+    room.broadcast(encode_race_result(room.final_standings()))
+
+async def abandon_race(room: RaceRoom):
+    """A room closed without a finished race: end its players' sessions without scoring them"""
+    await asyncio.gather(*(session_store.pop(player_id) for player_id in room.players))
+
+def choice_points(choice_record: Dict) -> int:
+    """Points for one choice, as the web client counts them in solo games"""
+    return round(choice_record["rhyme_accuracy"] * 100 + choice_record["beat_accuracy"] * 50)
+
+def feedback_for(choice_record: Dict) -> "FeedbackTier":
+    return calculate_feedback(
+        choice_record["rhyme_accuracy"], choice_record["beat_accuracy"], choice_record["tone_score"]
+    )
+
+# Scores are finite floats, and repr() is how json writes them
+CHOICE_BODY = (
+    '{"feedback":%s,"metrics":{"rhyme_accuracy":%r,"beat_accuracy":%r,"tone_score":%r,"timing_offset":%r},'
+    '"speed_boost":%r}'
+)
+
+def choice_response(choice_record: Dict) -> bytes:
+    """REST body for a scored choice: the tier's pre-encoded feedback plus four numbers"""
+    feedback = feedback_for(choice_record)
+    return (CHOICE_BODY % (
+        feedback.json, float(choice_record["rhyme_accuracy"]), float(choice_record["beat_accuracy"]),
+        float(choice_record["tone_score"]), float(choice_record["timing_offset"]), feedback.speed_boost
+    )).encode()
+
+def lyric_response(lyric_data: Dict, session_id: str) -> FastJSONResponse:
+    return FastJSONResponse({
+        "lyric_id": lyric_data["lyric_id"],
         "lyric_text": lyric_data["lyric_text"],
         "options": lyric_data["options"],
         "correct_rhyme": lyric_data["correct_rhyme"],
-        "beat_timing": lyric_data["beat_timing"]
+        "beat_timing": lyric_data["beat_timing"],
+        "session_id": session_id
+    })
+
+def lyric_context(lyric_id: str, session: Dict) -> str:
+    """Text of the lyric a choice answers: the catalog entry, else the session's current lyric"""
+    lyric = scorers.lyric_catalog.by_id(lyric_id)
+    return lyric["lyric_text"] if lyric is not None else session.get("current_lyric", "")
+
+def catalog_lyric_id(lyric_id: str) -> Optional[str]:
+    """The id if it names a catalog lyric; other ids fall back to per-session text, so aren't cache keys"""
+    return lyric_id if scorers.lyric_catalog.by_id(lyric_id) is not None else None
+
+def correct_rhyme_for(lyric_id: str) -> str:
+    """Correct answer for a catalog lyric id, or "" if unknown"""
+    lyric = scorers.lyric_catalog.by_id(lyric_id)
+    return lyric["correct_rhyme"] if lyric is not None else ""
+
+def game_choice_row(session_id: str, choice_record: Dict) -> Dict:
+    """GameChoice column values for a stored choice"""
+    return {
+        "session_id": session_id,
+        "lyric_id": choice_record["lyric_id"],
+        "chosen_word": choice_record["chosen_word"],
+        "correct_word": correct_rhyme_for(choice_record["lyric_id"]),
+        "tap_timestamp": choice_record["tap_timestamp"],
+        "beat_timestamp": choice_record["beat_timestamp"],
+        "timing_offset": choice_record["timing_offset"],
+        "rhyme_accuracy": choice_record["rhyme_accuracy"],
+        "beat_accuracy": choice_record["beat_accuracy"],
+        "tone_score": choice_record["tone_score"],
+        "created_at": datetime.utcnow()
     }
 
-def calculate_feedback(rhyme_accuracy: float, beat_accuracy: float, tone_score: float) -> Dict:
+class FeedbackTier(NamedTuple):
+    message: str
+    speed_boost: float
+    color: str
+    # The {"message", "speed_boost", "color"} object as REST responses carry it, encoded once
+    json: str
+
+def _feedback_tier(message: str, speed_boost: float, color: str) -> FeedbackTier:
+    body = {"message": message, "speed_boost": speed_boost, "color": color}
+    return FeedbackTier(message, speed_boost, color, json.dumps(body, ensure_ascii=False, separators=(",", ":")))
+
+# Every choice lands in one of these; they're shared, so never modify one
+FEEDBACK_PERFECT = _feedback_tier("🔥 Perfect! Great flow!", 1.5, "green")
+FEEDBACK_NICE = _feedback_tier("👍 Nice! Keep the rhythm!", 1.2, "blue")
+FEEDBACK_ALMOST = _feedback_tier("⚠️ Almost there!", 1.0, "yellow")
+FEEDBACK_MISSED = _feedback_tier("💥 Missed the beat!", 0.5, "red")
+
+def calculate_feedback(rhyme_accuracy: float, beat_accuracy: float, tone_score: float) -> FeedbackTier:
     """Calculate game feedback based on player performance"""
     total_score = (rhyme_accuracy + beat_accuracy + tone_score) / 3
     
     if total_score > 0.9:
-        return {
-            "message": "🔥 Perfect! Great flow!",
-            "speed_boost": 1.5,
-            "color": "green"
-        }
+        return FEEDBACK_PERFECT
     elif total_score > 0.7:
-        return {
-            "message": "👍 Nice! Keep the rhythm!",
-            "speed_boost": 1.2,
-            "color": "blue"
-        }
+        return FEEDBACK_NICE
     elif total_score > 0.5:
-        return {
-            "message": "⚠️ Almost there!",
-            "speed_boost": 1.0,
-            "color": "yellow"
-        }
+        return FEEDBACK_ALMOST
     else:
-        return {
-            "message": "💥 Missed the beat!",
-            "speed_boost": 0.5,
-            "color": "red"
-        }
+        return FEEDBACK_MISSED
 
-def calculate_final_metrics(choices: List[Dict]) -> Dict[str, float]:
+def calculate_final_metrics(choices: ChoiceLog) -> Dict[str, float]:
     """Calculate final game metrics"""
-    if not choices:
-        return {
-            "rhyme_accuracy_score": 0.0,
-            "beat_sync_accuracy": 0.0,
-            "tone_match_score": 0.0,
-            "reaction_speed_avg": 0.0
-        }
-    
-    rhyme_scores = [choice["rhyme_accuracy"] for choice in choices]
-    beat_scores = [choice["beat_accuracy"] for choice in choices]
-    tone_scores = [choice["tone_score"] for choice in choices]
-    reaction_times = [choice["timing_offset"] for choice in choices]
-    
-    return {
-        "rhyme_accuracy_score": sum(rhyme_scores) / len(rhyme_scores),
-        "beat_sync_accuracy": sum(beat_scores) / len(beat_scores),
-        "tone_match_score": sum(tone_scores) / len(tone_scores),
-        "reaction_speed_avg": sum(reaction_times) / len(reaction_times)
-    }
+    # The log keeps running sums, so this doesn't rescan the session's choices
+    return choices.final_metrics()
 
 if __name__ == "__main__":
     import uvicorn
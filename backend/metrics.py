@@ -0,0 +1,352 @@
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Sub-buckets per power of two: recorded durations are kept to within 1/32 (about 3%)
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Durations are clamped at 2**40 ns (about 18 minutes)
+MAX_VALUE_BITS = 40
+BUCKET_COUNT = (MAX_VALUE_BITS - SUB_BUCKET_BITS) * SUB_BUCKETS
+
+# Exported Prometheus buckets (seconds); finer structure stays available through quantile()
+PROMETHEUS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                      0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _bucket_index(value: int) -> int:
+    if value < 2 * SUB_BUCKETS:
+        return value if value > 0 else 0
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return min(shift * SUB_BUCKETS + (value >> shift), BUCKET_COUNT - 1)
+
+def _bucket_upper(index: int) -> int:
+    """Smallest value above bucket `index`"""
+    if index < 2 * SUB_BUCKETS:
+        return index + 1
+    shift = index // SUB_BUCKETS - 1
+    return (index - shift * SUB_BUCKETS + 1) << shift
+
+# For each exported bucket, how many of our buckets lie entirely below its bound
+_PROMETHEUS_CUTS = [
+    sum(1 for i in range(BUCKET_COUNT) if _bucket_upper(i) <= bound * 1e9)
+    for bound in PROMETHEUS_BUCKETS
+]
+
+class LatencyHistogram:
+    """
+    Log-linear (HDR-style) histogram of durations in nanoseconds
+    Recording is a bit_length and a list increment, cheap enough for every request
+    """
+
+    __slots__ = ("counts", "count", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record_ns(self, value: int):
+        self.counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total_ns += value
+        if value > self.max_ns:
+            self.max_ns = value
+
+    def time(self) -> "_Timer":
+        """Context manager recording the duration of its block"""
+        return _Timer(self)
+
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile in seconds (the upper edge of the bucket it falls in)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(_bucket_upper(i), self.max_ns) / 1e9
+        return self.max_ns / 1e9
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.total_ns / self.count / 1e9 if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "p999": self.quantile(0.999),
+            "max": self.max_ns / 1e9,
+        }
+
+    def cumulative_buckets(self) -> List[int]:
+        """Counts at or below each PROMETHEUS_BUCKETS bound"""
+        result = []
+        total = 0
+        start = 0
+        for cut in _PROMETHEUS_CUTS:
+            total += sum(self.counts[start:cut])
+            start = cut
+            result.append(total)
+        return result
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: LatencyHistogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.record_ns(time.perf_counter_ns() - self.start)
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+_LE_LABELS = [f'le="{bound}"' for bound in PROMETHEUS_BUCKETS]
+_LE_INF = 'le="+Inf"'
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class MetricsRegistry:
+    """Histograms, counters and gauges, rendered in the Prometheus text format"""
+
+    def __init__(self, namespace: str = "rhyme_racer"):
+        self.namespace = namespace
+        self._help: Dict[str, str] = {}
+        self._histograms: Dict[str, Dict[Labels, LatencyHistogram]] = {}
+        self._counters: Dict[str, Dict[Labels, Counter]] = {}
+        self._gauges: Dict[str, Callable[[], Optional[float]]] = {}
+        self._counter_reads: Dict[str, Dict[Labels, Callable[[], Optional[float]]]] = {}
+
+    def histogram(self, name: str, help: str = "", **labels: str) -> LatencyHistogram:
+        """The histogram for a name and label set, created on first use"""
+        series = self._histograms.get(name)
+        if series is None:
+            series = self._histograms[name] = {}
+            self._help[name] = help
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = LatencyHistogram()
+        return histogram
+
+    def counter(self, name: str, help: str = "", **labels: str) -> Counter:
+        series = self._counters.get(name)
+        if series is None:
+            series = self._counters[name] = {}
+            self._help[name] = help
+        key = tuple(sorted(labels.items()))
+        counter = series.get(key)
+        if counter is None:
+            counter = series[key] = Counter()
+        return counter
+
+    def counter_reader(self, name: str, help: str, read: Callable[[], Optional[float]], **labels: str):
+        """
+        A counter kept elsewhere (a stats dict, say), read at scrape time; `read` may return None to skip it
+        Unlike a gauge, it's exposed as a counter, so rate() and increase() apply
+        """
+        series = self._counter_reads.get(name)
+        if series is None:
+            series = self._counter_reads[name] = {}
+            self._help[name] = help
+        series[tuple(sorted(labels.items()))] = read
+
+    def gauge(self, name: str, help: str, read: Callable[[], Optional[float]]):
+        """A value read at scrape time; `read` may return None to skip it"""
+        self._help[name] = help
+        self._gauges[name] = read
+
+    def histogram_summaries(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Quantiles for every histogram series, at full histogram resolution"""
+        return {
+            name: [{"labels": dict(labels), **histogram.summary()} for labels, histogram in series.items()]
+            for name, series in self._histograms.items()
+        }
+
+    def render(self) -> str:
+        lines = []
+        for name, series in self._histograms.items():
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full_name} {self._help[name]}")
+            lines.append(f"# TYPE {full_name} histogram")
+            for labels, histogram in series.items():
+                for le, count in zip(_LE_LABELS, histogram.cumulative_buckets()):
+                    lines.append(f"{full_name}_bucket{_format_labels(labels, le)} {count}")
+                lines.append(f"{full_name}_bucket{_format_labels(labels, _LE_INF)} {histogram.count}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {histogram.total_ns / 1e9}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {histogram.count}")
+
+        for name, series in self._counters.items():
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full_name} {self._help[name]}")
+            lines.append(f"# TYPE {full_name} counter")
+            for labels, counter in series.items():
+                lines.append(f"{full_name}{_format_labels(labels)} {counter.value}")
+
+        for name, reads in self._counter_reads.items():
+            values = [(labels, read()) for labels, read in reads.items()]
+            values = [(labels, value) for labels, value in values if value is not None]
+            if not values:
+                continue
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full_name} {self._help[name]}")
+            lines.append(f"# TYPE {full_name} counter")
+            for labels, value in values:
+                lines.append(f"{full_name}{_format_labels(labels)} {value}")
+
+        for name, read in self._gauges.items():
+            value = read()
+            if value is None:
+                continue
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full_name} {self._help[name]}")
+            lines.append(f"# TYPE {full_name} gauge")
+            lines.append(f"{full_name} {value}")
+        return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by method and route template
+    Written against the raw ASGI interface to avoid BaseHTTPMiddleware's per-request task overhead
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+        self._endpoint_paths: Optional[Dict[Any, str]] = None
+        # Series resolved once per (method, route, status) instead of per request
+        self._series: Dict[Tuple[str, str, int], Tuple[LatencyHistogram, Counter]] = {}
+
+    def _route_path(self, scope: Dict[str, Any]) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        # Older Starlette only records the endpoint; map it back to its route's template
+        if self._endpoint_paths is None:
+            app = scope.get("app")
+            self._endpoint_paths = {
+                getattr(r, "endpoint", None): r.path for r in getattr(app, "routes", ()) if hasattr(r, "path")
+            }
+        return self._endpoint_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            key = (scope["method"], self._route_path(scope), status)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = self._resolve(*key)
+            series[0].record_ns(elapsed)
+            series[1].value += 1
+
+    def _resolve(self, method: str, route: str, status: int) -> Tuple[LatencyHistogram, Counter]:
+        return (
+            self.registry.histogram(
+                "http_request_duration_seconds", "HTTP request latency by route",
+                method=method, route=route
+            ),
+            self.registry.counter(
+                "http_requests_total", "HTTP requests by route and status",
+                method=method, route=route, status=str(status)
+            ),
+        )
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack `hz` times a second from a daemon thread
+    Output is the collapsed-stack format read by flamegraph.pl, speedscope and inferno
+    """
+
+    def __init__(self, hz: float = 97.0, max_depth: int = 128):
+        # An odd rate avoids sampling in lockstep with periodic timers
+        self.hz = hz
+        self.max_depth = max_depth
+        self.samples: "StackCounter[str]" = StackCounter()
+        # Time spent taking samples, i.e. the profiler's own cost
+        self.busy_ns = 0
+        self._labels: Dict[Any, str] = {}
+        self._target: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_id: Optional[int] = None):
+        """Profile `thread_id`, by default the calling thread (the event loop when called from startup)"""
+        if self._thread is not None:
+            return
+        self._target = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+        return label
+
+    def _run(self):
+        interval = 1.0 / self.hz
+        while not self._stop.wait(interval):
+            start = time.perf_counter_ns()
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[";".join(stack)] += 1
+            self.busy_ns += time.perf_counter_ns() - start
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as out:
+            out.write(self.collapsed())
@@ -0,0 +1,14 @@
+import argparse
+
+from database import DATABASE_URL, migrate_schema
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Schema migration step: create missing tables, and add missing columns and indexes "
+                    "to existing ones, in DATABASE_URL. Run it before starting the server; the app no "
+                    "longer changes the schema itself"
+    )
+    parser.parse_args()
+
+    changes = migrate_schema()
+    print(f"Added {', '.join(changes)} in {DATABASE_URL}" if changes else "Schema is up to date")
@@ -1,8 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Index
 from datetime import datetime
 
-Base = declarative_base()
+from database import Base
 
 class GameSession(Base):
     """Model for storing game session data"""
@@ -24,12 +23,19 @@ class PlayerScore(Base):
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(255), unique=True, index=True)
     player_name = Column(String(100), nullable=False)
+    difficulty = Column(String(50), default="medium")
     total_score = Column(Integer, default=0)
     rhyme_accuracy = Column(Float, default=0.0)
     beat_sync_accuracy = Column(Float, default=0.0)
     tone_match_score = Column(Float, default=0.0)
     reaction_speed_avg = Column(Float, default=0.0)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Leaderboard reads walk these in rank order instead of sorting the table
+    __table_args__ = (
+        Index("ix_player_scores_rank", total_score.desc(), created_at),
+        Index("ix_player_scores_difficulty_rank", difficulty, total_score.desc(), created_at),
+    )
 
 class GameChoice(Base):
     """Model for storing individual player choices during gameplay"""
@@ -46,4 +52,23 @@ class GameChoice(Base):
     rhyme_accuracy = Column(Float, default=0.0)
     beat_accuracy = Column(Float, default=0.0)
     tone_score = Column(Float, default=0.0)
-    created_at = Column(DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow) 
+
+class FlaggedScore(Base):
+    """Model for scores the timing anomaly checks flagged; quarantined ones never reach player_scores"""
+    __tablename__ = "flagged_scores"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(255), unique=True, index=True)
+    player_name = Column(String(100), nullable=False)
+    difficulty = Column(String(50), default="medium")
+    total_score = Column(Integer, default=0)
+    rhyme_accuracy = Column(Float, default=0.0)
+    beat_sync_accuracy = Column(Float, default=0.0)
+    tone_match_score = Column(Float, default=0.0)
+    reaction_speed_avg = Column(Float, default=0.0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    anomaly_score = Column(Float, default=0.0)
+    reasons = Column(String(255), default="")
+    action = Column(String(20), nullable=False)  # "flagged" or "quarantined"
+    flagged_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import Table
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class WriteBehindQueue:
+    """
+    Buffer rows from request handlers and bulk-insert them from a dedicated thread
+    A batch is flushed once `batch_size` rows are pending or the oldest has waited
+    `flush_interval` seconds; producers wait when `max_pending` rows are queued
+    """
+
+    def __init__(self, session_factory: Callable[[], Session],
+                 batch_size: int = 500,
+                 flush_interval: float = 0.5,
+                 max_pending: int = 10000):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            "rows_written": 0,
+            "rows_failed": 0,
+            "batches": 0,
+            "backpressure_waits": 0,
+        }
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def put_nowait(self, model: Any, row: Dict[str, Any]):
+        """Queue a row for `model`'s table; raises queue.Full when the buffer is full"""
+        self._queue.put_nowait((model.__table__, row))
+
+    async def put(self, model: Any, row: Dict[str, Any]):
+        """Queue a row, waiting off the event loop if the buffer is full"""
+        item = (model.__table__, row)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats["backpressure_waits"] += 1
+            await asyncio.to_thread(self._queue.put, item)
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush everything queued so far and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        pending: Dict[Table, List[Dict[str, Any]]] = {}
+        count = 0
+        deadline = 0.0
+
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if count else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                if count:
+                    self._flush(pending)
+                return
+
+            if item is not None:
+                table, row = item
+                pending.setdefault(table, []).append(row)
+                count += 1
+                if count == 1:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if count >= self.batch_size or (count and time.monotonic() >= deadline):
+                self._flush(pending)
+                pending = {}
+                count = 0
+
+    def _flush(self, pending: Dict[Table, List[Dict[str, Any]]]):
+        db = self.session_factory()
+        try:
+            # One executemany per table, all in a single transaction
+            for table, rows in pending.items():
+                db.execute(table.insert(), rows)
+            db.commit()
+            self.stats["rows_written"] += sum(len(rows) for rows in pending.values())
+            self.stats["batches"] += 1
+        except SQLAlchemyError:
+            db.rollback()
+            logger.exception("Bulk insert failed; retrying rows individually")
+            self._flush_rows(db, pending)
+        finally:
+            db.close()
+
+    def _flush_rows(self, db: Session, pending: Dict[Table, List[Dict[str, Any]]]):
+        # Isolate the bad rows (e.g. a duplicate session_id) so the rest still land
+        for table, rows in pending.items():
+            for row in rows:
+                try:
+                    db.execute(table.insert(), row)
+                    db.commit()
+                    self.stats["rows_written"] += 1
+                except SQLAlchemyError:
+                    db.rollback()
+                    self.stats["rows_failed"] += 1
+                    logger.exception("Dropping %s row that could not be written", table.name)
@@ -0,0 +1,277 @@
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Compiled dictionary layout (little endian, every section 4-byte aligned):
+#   header        MAGIC, version, symbol count, word count, word blob size, phone count
+#   symbols       symbol count x 4-byte null padded ARPAbet symbols
+#   word offsets  (word count + 1) x uint32 into the word blob
+#   phone offsets (word count + 1) x uint32 into the phone array
+#   rime starts   word count x uint8, index of the stressed vowel within a word's phones
+#   word blob     sorted utf-8 words, concatenated
+#   phones        uint8 phoneme ids
+MAGIC = b"RRPD"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIIIII")
+SYMBOL_WIDTH = 4
+COMPILED_SUFFIX = ".bin"
+
+def _align(size: int) -> int:
+    return (size + 3) & ~3
+
+def _is_vowel(symbol: str) -> bool:
+    return symbol[-1:].isdigit()
+
+def find_rime_start(phones: List[str]) -> int:
+    """Index of the vowel that carries the rhyme: last primary stress, then secondary, then any vowel"""
+    for stress in ("1", "2"):
+        for i in range(len(phones) - 1, -1, -1):
+            if phones[i].endswith(stress):
+                return i
+    for i in range(len(phones) - 1, -1, -1):
+        if _is_vowel(phones[i]):
+            return i
+    return 0
+
+def parse_cmudict(path: str) -> Iterator[Tuple[str, List[str]]]:
+    """Yield (word, phones) from a CMUdict-style text file, keeping the first pronunciation of each word"""
+    seen = set()
+    with open(path, encoding="latin-1") as handle:
+        for line in handle:
+            if line.startswith(";;;"):
+                continue
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            word = parts[0].lower()
+            if word.endswith(")") and "(" in word:
+                # Alternate pronunciation, e.g. "read(2)"
+                continue
+            if word in seen or len(parts) < 2:
+                continue
+            seen.add(word)
+            yield word, parts[1:]
+
+def compile_cmudict(source_path: str, target_path: str) -> int:
+    """
+    Compile a CMUdict-style text file into the binary format read by PronouncingDictionary
+    Returns the number of words written
+    """
+    entries = sorted(parse_cmudict(source_path))
+
+    symbol_ids: Dict[str, int] = {}
+    word_blob = bytearray()
+    phone_ids = bytearray()
+    word_offsets = [0]
+    phone_offsets = [0]
+    rime_starts = bytearray()
+
+    for word, phones in entries:
+        for symbol in phones:
+            if symbol not in symbol_ids:
+                if len(symbol_ids) == 256:
+                    raise ValueError("Pronunciation dictionary has more than 256 phoneme symbols")
+                symbol_ids[symbol] = len(symbol_ids)
+            phone_ids.append(symbol_ids[symbol])
+        word_blob += word.encode("utf-8")
+        word_offsets.append(len(word_blob))
+        phone_offsets.append(len(phone_ids))
+        rime_starts.append(min(find_rime_start(phones), 255))
+
+    symbols = sorted(symbol_ids, key=symbol_ids.get)
+    sections = [
+        b"".join(symbol.encode("ascii").ljust(SYMBOL_WIDTH, b"\0") for symbol in symbols),
+        struct.pack(f"<{len(word_offsets)}I", *word_offsets),
+        struct.pack(f"<{len(phone_offsets)}I", *phone_offsets),
+        bytes(rime_starts),
+        bytes(word_blob),
+        bytes(phone_ids),
+    ]
+
+    # Write next to the target and rename, so workers booting concurrently never map a partial file
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(symbols), len(entries),
+                              len(word_blob), len(phone_ids)))
+        for section in sections:
+            out.write(section)
+            out.write(b"\0" * (_align(len(section)) - len(section)))
+    os.replace(tmp_path, target_path)
+
+    return len(entries)
+
+class PronouncingDictionary:
+    """Read-only view over a compiled dictionary, memory-mapped so workers share the pages"""
+
+    def __init__(self, compiled_path: str):
+        self.path = compiled_path
+        with open(compiled_path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_symbols, n_words, blob_size, n_phones = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{compiled_path} is not a compiled pronunciation dictionary")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def take(size: int) -> memoryview:
+            nonlocal offset
+            section = view[offset:offset + size]
+            offset += _align(size)
+            return section
+
+        raw_symbols = take(n_symbols * SYMBOL_WIDTH)
+        self.symbols: Tuple[str, ...] = tuple(
+            bytes(raw_symbols[i:i + SYMBOL_WIDTH]).rstrip(b"\0").decode("ascii")
+            for i in range(0, n_symbols * SYMBOL_WIDTH, SYMBOL_WIDTH)
+        )
+        self._word_offsets = take((n_words + 1) * 4).cast("I")
+        self._phone_offsets = take((n_words + 1) * 4).cast("I")
+        self._rime_starts = take(n_words)
+        self._words = take(blob_size)
+        self._phones = take(n_phones)
+        self._size = n_words
+
+        self.lookup = lru_cache(maxsize=16384)(self._lookup)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, word: str) -> bool:
+        return self._find(word.encode("utf-8")) is not None
+
+    def _word_at(self, i: int) -> bytes:
+        return bytes(self._words[self._word_offsets[i]:self._word_offsets[i + 1]])
+
+    def _find(self, key: bytes) -> Optional[int]:
+        i = bisect_left(_WordSequence(self), key)
+        if i < self._size and self._word_at(i) == key:
+            return i
+        return None
+
+    def _lookup(self, word: str) -> Optional[Tuple[bytes, int]]:
+        """Return (phoneme ids, rime start) for a lowercased word"""
+        i = self._find(word.encode("utf-8"))
+        if i is None:
+            return None
+        phones = bytes(self._phones[self._phone_offsets[i]:self._phone_offsets[i + 1]])
+        return phones, self._rime_starts[i]
+
+    def pronounce(self, word: str) -> Optional[List[str]]:
+        """ARPAbet phones for a word, or None if it is not in the dictionary"""
+        entry = self.lookup(word.lower())
+        if entry is None:
+            return None
+        return [self.symbols[p] for p in entry[0]]
+
+    def rime(self, word: str) -> Optional[bytes]:
+        """Phoneme ids from the stressed vowel to the end of the word"""
+        entry = self.lookup(word.lower())
+        if entry is None:
+            return None
+        phones, start = entry
+        return phones[start:]
+
+    def close(self):
+        self.lookup.cache_clear()
+        for section in (self._word_offsets, self._phone_offsets, self._rime_starts,
+                        self._words, self._phones):
+            section.release()
+        self._mmap.close()
+
+class _WordSequence:
+    """Sequence adapter so bisect can search the mapped word table without decoding it"""
+
+    def __init__(self, dictionary: PronouncingDictionary):
+        self._dictionary = dictionary
+
+    def __len__(self) -> int:
+        return len(self._dictionary)
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._dictionary._word_at(i)
+
+class PhoneticBackend:
+    """Base for pluggable rhyme backends used by RhymeScorer"""
+
+    def similarity(self, word1: str, word2: str) -> Optional[float]:
+        """
+        Score how well two normalized words rhyme
+        Returns None when the backend cannot judge the pair
+        """
+        raise NotImplementedError
+
+class PronunciationBackend(PhoneticBackend):
+    """Rhyme by comparing stressed-vowel rimes from a pronunciation dictionary"""
+
+    def __init__(self, dictionary: PronouncingDictionary):
+        self.dictionary = dictionary
+
+    def similarity(self, word1: str, word2: str) -> Optional[float]:
+        rime1 = self.dictionary.rime(word1)
+        rime2 = self.dictionary.rime(word2)
+        if rime1 is None or rime2 is None:
+            return None
+
+        # Full rhyme: identical from the stressed vowel on (flash / dash)
+        if rime1 == rime2:
+            return 0.9
+
+        same_vowel = self._vowel_quality(rime1[0]) == self._vowel_quality(rime2[0])
+        same_ending = rime1[-1] == rime2[-1]
+        if same_vowel and same_ending:
+            # Slant rhyme with a different middle (lift / list)
+            return 0.75
+        elif same_vowel:
+            # Assonance (flow / soul)
+            return 0.6
+        elif same_ending:
+            # Consonance (steel / soul)
+            return 0.4
+
+        return 0.1
+
+    def _vowel_quality(self, phone_id: int) -> str:
+        # Ignore the stress digit so AH1 and AH2 compare equal
+        return self.dictionary.symbols[phone_id].rstrip("012")
+
+def load_pronouncing_dictionary(path: str) -> PronouncingDictionary:
+    """
+    Open a pronunciation dictionary from a compiled file or a CMUdict text file
+    Text files are compiled once to `<path>.bin` and reused while that file is newer than the source
+    """
+    with open(path, "rb") as handle:
+        is_compiled = handle.read(len(MAGIC)) == MAGIC
+    if is_compiled:
+        return PronouncingDictionary(path)
+
+    compiled_path = path + COMPILED_SUFFIX
+    if (not os.path.exists(compiled_path)
+            or os.path.getmtime(compiled_path) < os.path.getmtime(path)):
+        compile_cmudict(path, compiled_path)
+    return PronouncingDictionary(compiled_path)
+
+def phonetic_backend_from_env() -> Optional[PhoneticBackend]:
+    """Build the backend configured by RHYME_DICT_PATH, or None to rhyme by spelling"""
+    path = os.getenv("RHYME_DICT_PATH")
+    if not path:
+        return None
+    return PronunciationBackend(load_pronouncing_dictionary(path))
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile a CMUdict-style pronunciation dictionary")
+    parser.add_argument("source", help="CMUdict text file")
+    parser.add_argument("target", nargs="?", help="Output path (default: <source>.bin)")
+    args = parser.parse_args()
+
+    target = args.target or args.source + COMPILED_SUFFIX
+    count = compile_cmudict(args.source, target)
+    print(f"Compiled {count} words to {target}")
@@ -0,0 +1,352 @@
+import asyncio
+import logging
+import math
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from game_protocol import encode_roster, encode_standings, encode_welcome
+
+logger = logging.getLogger(__name__)
+
+MIN_PLAYERS = 2
+MAX_PLAYERS = 50
+# Score updates are coalesced into one standings frame per tick
+TICK_INTERVAL = 0.05
+# Lobbies only need checking for their timeout
+LOBBY_TICK_INTERVAL = 1.0
+LOBBY_TIMEOUT = 300.0
+# Reliable frames (lyrics, feedback, rosters) a connection may fall behind by before it's dropped
+MAX_BACKLOG = 64
+# How long a finished race waits for its last frames to go out before closing connections
+FLUSH_TIMEOUT = 2.0
+
+Send = Callable[[str], Awaitable[None]]
+Close = Callable[[], Awaitable[None]]
+RoomHook = Callable[["RaceRoom"], Awaitable[None]]
+
+class RoomError(Exception):
+    pass
+
+class Subscriber:
+    """
+    Outbound frames for one connection, written by its own sender task
+    Reliable frames go out in order. Standings frames keep only the newest unsent one, so a slow
+    consumer skips stale standings instead of falling further behind everyone else.
+    """
+
+    __slots__ = ("_send", "_close", "_stats", "_reliable", "_state", "_wake", "_idle", "_task", "closed")
+
+    def __init__(self, send: Send, close: Close, stats: Dict[str, int]):
+        self._send = send
+        self._close = close
+        self._stats = stats
+        self._reliable: Deque[str] = deque()
+        self._state: Optional[str] = None
+        self._wake = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.closed = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def push(self, frame: str):
+        """Queue a frame that must arrive"""
+        if self.closed:
+            return
+        if len(self._reliable) >= MAX_BACKLOG:
+            self._stats["slow_consumers_closed"] += 1
+            self.close()
+            return
+        self._reliable.append(frame)
+        self._idle.clear()
+        self._wake.set()
+
+    def offer_state(self, frame: str):
+        """Queue a standings frame, replacing one that hasn't gone out yet"""
+        if self.closed:
+            return
+        if self._state is not None:
+            self._stats["frames_dropped"] += 1
+        self._state = frame
+        self._idle.clear()
+        self._wake.set()
+
+    async def _run(self):
+        try:
+            while True:
+                await self._wake.wait()
+                self._wake.clear()
+                while self._reliable or self._state is not None:
+                    if self._reliable:
+                        frame = self._reliable.popleft()
+                    else:
+                        frame, self._state = self._state, None
+                    await self._send(frame)
+                    self._stats["frames_sent"] += 1
+                self._idle.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The connection is gone; its handler sees the disconnect and leaves the room
+            self.closed = True
+            self._idle.set()
+
+    async def flush(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def close(self):
+        """Stop sending and close the connection"""
+        if self._task.done():
+            return
+        self.closed = True
+        self._task.cancel()
+        asyncio.get_running_loop().create_task(self._close_connection())
+
+    async def _close_connection(self):
+        try:
+            await self._close()
+        except Exception:
+            pass
+
+class RacePlayer:
+    __slots__ = ("player_id", "name", "score", "speed_boost", "answered", "subscriber")
+
+    def __init__(self, player_id: str, name: str, subscriber: Subscriber):
+        self.player_id = player_id
+        self.name = name
+        self.score = 0
+        self.speed_boost = 1.0
+        # Index of the last lyric this player answered
+        self.answered = -1
+        self.subscriber: Optional[Subscriber] = subscriber
+
+    @property
+    def connected(self) -> bool:
+        return self.subscriber is not None and not self.subscriber.closed
+
+class RaceRoom:
+    """
+    One head-to-head race: players share a lyric stream and see each other's scores every tick
+    The room only tracks membership, standings and deadlines; `advance` and `finish` hooks do the
+    game work (next lyric, final scores) when the tick loop finds them due. If the room closes
+    without `finish` completing (lobby timeout, failed hook, shutdown), `abandon` runs instead.
+    """
+
+    def __init__(self, manager: "RoomManager", room_id: str, difficulty: str, capacity: int,
+                 race_seconds: float, advance: RoomHook, finish: RoomHook,
+                 abandon: Optional[RoomHook] = None):
+        self.manager = manager
+        self.room_id = room_id
+        self.difficulty = difficulty
+        self.capacity = capacity
+        self.race_seconds = race_seconds
+        self._advance = advance
+        self._finish = finish
+        self._abandon = abandon
+        # Whether `finish` ran to completion, recording every player's session
+        self.completed = False
+        self.players: Dict[str, RacePlayer] = {}
+        self.state = "lobby"  # then "racing", then "finished"
+        # Per-room game state for the hooks, e.g. the lyric sampler
+        self.game: Dict[str, Any] = {}
+        self.lyric: Optional[Dict[str, Any]] = None
+        self.lyric_index = -1
+        self.lyric_deadline = math.inf
+        self.race_deadline = math.inf
+        # Clock probes sent to the room, newest last; every player gets the same ones
+        self.probes: Deque[float] = deque(maxlen=8)
+        self.tick = 0
+        self._dirty = False
+        self._loop = asyncio.get_running_loop()
+        self.created_at = self._loop.time()
+        self._task = self._loop.create_task(self._tick_loop())
+
+    def join(self, name: str, send: Send, close: Close) -> RacePlayer:
+        if self.state != "lobby":
+            raise RoomError("The race has already started")
+        if len(self.players) >= self.capacity:
+            raise RoomError("The room is full")
+        player = RacePlayer(str(uuid.uuid4()), name, Subscriber(send, close, self.manager.stats))
+        self.players[player.player_id] = player
+        player.subscriber.push(encode_welcome(self.room_id, player.player_id, self.capacity))
+        self.broadcast(encode_roster(self.roster()))
+        return player
+
+    def leave(self, player_id: str) -> bool:
+        """Disconnect a player; returns True if they were removed (only possible before the race)"""
+        player = self.players.get(player_id)
+        if player is None:
+            return False
+        if player.subscriber is not None:
+            player.subscriber.close()
+            player.subscriber = None
+        removed = self.state == "lobby"
+        if removed:
+            del self.players[player_id]
+        # Racers keep their place in the standings after leaving
+        self.broadcast(encode_roster(self.roster()))
+        return removed
+
+    def start(self):
+        if self.state != "lobby":
+            raise RoomError("The race has already started")
+        if sum(player.connected for player in self.players.values()) < MIN_PLAYERS:
+            raise RoomError(f"A race needs at least {MIN_PLAYERS} players")
+        self.state = "racing"
+        self.race_deadline = self._loop.time() + self.race_seconds
+        self.manager.stats["races_started"] += 1
+
+    def set_lyric(self, lyric: Dict[str, Any], seconds: float):
+        self.lyric = lyric
+        self.lyric_index += 1
+        self.lyric_deadline = self._loop.time() + seconds
+
+    def record_score(self, player: RacePlayer, points: int, speed_boost: float):
+        player.score += points
+        player.speed_boost = speed_boost
+        # Sent with the next tick, together with every other update since the last one
+        self._dirty = True
+
+    def broadcast(self, frame: str):
+        """Send a frame that must arrive to every connected player; encoded once by the caller"""
+        for player in self.players.values():
+            if player.subscriber is not None:
+                player.subscriber.push(frame)
+
+    def roster(self) -> List[List[Any]]:
+        return [[p.player_id, p.name, p.score, p.speed_boost] for p in self.players.values()]
+
+    def standings(self) -> List[List[Any]]:
+        ranked = sorted(self.players.values(), key=lambda p: p.score, reverse=True)
+        return [[p.player_id, p.score, p.speed_boost] for p in ranked]
+
+    def final_standings(self) -> List[List[Any]]:
+        ranked = sorted(self.players.values(), key=lambda p: p.score, reverse=True)
+        return [[p.player_id, p.name, p.score] for p in ranked]
+
+    def _due(self) -> Optional[RoomHook]:
+        """The hook the room needs run now, if any"""
+        if self.state != "racing":
+            return None
+        connected = [player for player in self.players.values() if player.connected]
+        if not connected or self._loop.time() >= self.race_deadline:
+            return self._finish
+        if self._loop.time() >= self.lyric_deadline or all(p.answered == self.lyric_index for p in connected):
+            return self._advance
+        return None
+
+    def _send_standings(self):
+        frame = encode_standings(self.tick, self.standings())
+        self.manager.stats["frames_encoded"] += 1
+        for player in self.players.values():
+            if player.subscriber is not None:
+                player.subscriber.offer_state(frame)
+        self._dirty = False
+
+    async def _tick_loop(self):
+        stats = self.manager.stats
+        next_tick = self._loop.time()
+        try:
+            while self.state != "finished":
+                interval = TICK_INTERVAL if self.state == "racing" else LOBBY_TICK_INTERVAL
+                next_tick += interval
+                await asyncio.sleep(max(0.0, next_tick - self._loop.time()))
+                lateness = self._loop.time() - next_tick
+                self.manager.record_tick(lateness)
+                if lateness > interval:
+                    # Skip the missed ticks rather than firing them back to back
+                    stats["late_ticks"] += 1
+                    next_tick = self._loop.time()
+                self.tick += 1
+
+                if self.state == "lobby":
+                    if self._loop.time() - self.created_at > LOBBY_TIMEOUT:
+                        break
+                    continue
+                if self._dirty:
+                    self._send_standings()
+                hook = self._due()
+                if hook is not None:
+                    try:
+                        await hook(self)
+                    except Exception:
+                        logger.exception("Race room %s hook failed; ending the race", self.room_id)
+                        self.state = "finished"
+                    else:
+                        self.completed = hook is self._finish
+                    if hook is self._finish:
+                        self.state = "finished"
+        finally:
+            if not self.completed and self._abandon is not None:
+                try:
+                    await self._abandon(self)
+                except Exception:
+                    logger.exception("Race room %s abandon hook failed", self.room_id)
+            await self.manager._closed(self)
+
+    async def close(self):
+        """Send what's queued, then close every connection"""
+        self.state = "finished"
+        subscribers = [player.subscriber for player in self.players.values() if player.subscriber is not None]
+        await asyncio.gather(*(subscriber.flush(FLUSH_TIMEOUT) for subscriber in subscribers))
+        for subscriber in subscribers:
+            subscriber.close()
+
+class RoomManager:
+    """Race rooms in this worker, each with its own tick loop"""
+
+    def __init__(self, race_seconds: float = 90.0, tick_histogram=None):
+        self.race_seconds = race_seconds
+        self.rooms: Dict[str, RaceRoom] = {}
+        self._tick_histogram = tick_histogram
+        self.stats = {
+            "rooms_created": 0,
+            "races_started": 0,
+            "rooms_closed": 0,
+            "late_ticks": 0,
+            "frames_encoded": 0,
+            "frames_sent": 0,
+            "frames_dropped": 0,
+            "slow_consumers_closed": 0,
+        }
+
+    def create(self, difficulty: str, capacity: int, advance: RoomHook, finish: RoomHook,
+               abandon: Optional[RoomHook] = None) -> RaceRoom:
+        if not MIN_PLAYERS <= capacity <= MAX_PLAYERS:
+            raise ValueError(f"capacity must be {MIN_PLAYERS}-{MAX_PLAYERS}")
+        room_id = str(uuid.uuid4())
+        room = self.rooms[room_id] = RaceRoom(self, room_id, difficulty, capacity, self.race_seconds,
+                                              advance, finish, abandon)
+        self.stats["rooms_created"] += 1
+        return room
+
+    def get(self, room_id: str) -> Optional[RaceRoom]:
+        return self.rooms.get(room_id)
+
+    def record_tick(self, lateness: float):
+        if self._tick_histogram is not None:
+            self._tick_histogram.record_ns(max(0, int(lateness * 1e9)))
+
+    async def _closed(self, room: RaceRoom):
+        await room.close()
+        if self.rooms.pop(room.room_id, None) is not None:
+            self.stats["rooms_closed"] += 1
+
+    def gauges(self) -> Dict[str, int]:
+        return {
+            "rooms": len(self.rooms),
+            "racing_rooms": sum(room.state == "racing" for room in self.rooms.values()),
+            "connected_players": sum(
+                player.connected for room in self.rooms.values() for player in room.players.values()
+            ),
+        }
+
+    async def close(self):
+        """Stop every room's tick loop and close its connections, for shutdown"""
+        tasks = [room._task for room in self.rooms.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
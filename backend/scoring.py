@@ -1,22 +1,84 @@
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Sequence
+from collections import OrderedDict
+from functools import lru_cache
 import difflib
 
+import numpy as np
+
+from phonetics import PhoneticBackend
+
+DEFAULT_RHYME_PATTERNS = {
+    "ash": ["dash", "flash", "cash", "trash", "splash"],
+    "ow": ["flow", "soul", "gold", "bold", "cold"],
+    "eel": ["steel", "feel", "real", "deal", "wheel"],
+    "ing": ["sing", "ring", "wing", "thing", "bring"],
+    "ight": ["light", "bright", "fight", "night", "sight"],
+    "ay": ["day", "way", "say", "play", "stay"],
+    "ee": ["free", "tree", "see", "me", "be"],
+    "oo": ["cool", "pool", "rule", "tool", "fool"]
+}
+
+class RhymeIndex:
+    """Build-once lookup from words to the rhyme classes they belong to"""
+    
+    def __init__(self, rhyme_patterns: Dict[str, List[str]]):
+        # Class ids follow the pattern order so lookups resolve the same
+        # way the original first-match scan over the patterns did
+        self.patterns: Tuple[str, ...] = tuple(rhyme_patterns)
+        members: Dict[str, List[int]] = {}
+        for class_id, rhymes in enumerate(rhyme_patterns.values()):
+            for word in rhymes:
+                ids = members.setdefault(word, [])
+                if class_id not in ids:
+                    ids.append(class_id)
+        self._classes: Dict[str, Tuple[int, ...]] = {
+            word: tuple(ids) for word, ids in members.items()
+        }
+    
+    def __len__(self) -> int:
+        return len(self._classes)
+    
+    def classes_of(self, word: str) -> Tuple[int, ...]:
+        """Return the ids of every rhyme class containing the word"""
+        return self._classes.get(word, ())
+    
+    def match(self, word1: str, word2: str) -> Optional[float]:
+        """
+        Score two words against the known rhyme classes
+        Returns 0.9 for a shared class, 0.8 for a shared ending, else None
+        """
+        classes1 = self._classes.get(word1, ())
+        classes2 = self._classes.get(word2, ())
+        if not classes1 and not classes2:
+            return None
+        
+        for class_id in sorted(set(classes1).union(classes2)):
+            if class_id in classes1 and class_id in classes2:
+                return 0.9
+            pattern = self.patterns[class_id]
+            if word1.endswith(pattern) and word2.endswith(pattern):
+                return 0.8
+        
+        return None
+
 class RhymeScorer:
     """Calculate rhyme accuracy between words"""
     
-    def __init__(self):
+    def __init__(self, rhyme_patterns: Optional[Dict[str, List[str]]] = None,
+                 similarity_cache_size: int = 65536,
+                 phonetic_backend: Optional[PhoneticBackend] = None):
         # Common rhyming patterns
-        self.rhyme_patterns = {
-            "ash": ["dash", "flash", "cash", "trash", "splash"],
-            "ow": ["flow", "soul", "gold", "bold", "cold"],
-            "eel": ["steel", "feel", "real", "deal", "wheel"],
-            "ing": ["sing", "ring", "wing", "thing", "bring"],
-            "ight": ["light", "bright", "fight", "night", "sight"],
-            "ay": ["day", "way", "say", "play", "stay"],
-            "ee": ["free", "tree", "see", "me", "be"],
-            "oo": ["cool", "pool", "rule", "tool", "fool"]
-        }
+        self.rhyme_patterns = rhyme_patterns if rhyme_patterns is not None else DEFAULT_RHYME_PATTERNS
+        self.rhyme_index = RhymeIndex(self.rhyme_patterns)
+        
+        # Optional pronunciation-based backend; spelling rules cover words it doesn't know
+        self.phonetic_backend = phonetic_backend
+        
+        # Memoize pairwise similarity; the same option words come up on every tap
+        self._similarity_cache = lru_cache(maxsize=similarity_cache_size)(
+            self._compute_phonetic_similarity
+        )
     
     def calculate_rhyme_accuracy(self, chosen_word: str, lyric_context: str) -> float:
         """
@@ -26,14 +88,10 @@ class RhymeScorer:
         if not chosen_word or not lyric_context:
             return 0.0
         
-        # Extract the word that should rhyme (usually the last word before the blank)
-        context_words = lyric_context.split()
-        if len(context_words) < 2:
+        rhyme_target = self._rhyme_target(lyric_context)
+        if rhyme_target is None:
             return 0.0
         
-        # Find the word that should rhyme (usually the last complete word)
-        rhyme_target = context_words[-2] if context_words[-1] == "___" else context_words[-1]
-        
         # Calculate phonetic similarity
         phonetic_score = self._calculate_phonetic_similarity(chosen_word, rhyme_target)
         
@@ -45,24 +103,59 @@ class RhymeScorer:
         
         return min(1.0, max(0.0, final_score))
     
+    def estimate_rhyme_accuracy(self, chosen_word: str, lyric_context: str) -> float:
+        """
+        Bounded-cost stand-in for calculate_rhyme_accuracy, for when full scoring can't finish in time
+        Exact matches, known patterns and shared endings only; no pronunciation lookup or difflib
+        """
+        if not chosen_word or not lyric_context:
+            return 0.0
+        
+        rhyme_target = self._rhyme_target(lyric_context)
+        if rhyme_target is None:
+            return 0.0
+        
+        word1_clean = chosen_word.lower().strip()
+        word2_clean = rhyme_target.lower().strip()
+        if word1_clean == word2_clean:
+            phonetic_score = 1.0
+        else:
+            phonetic_score = self.rhyme_index.match(word1_clean, word2_clean)
+            if phonetic_score is None:
+                phonetic_score = 0.5 if word1_clean[-2:] == word2_clean[-2:] else 0.0
+        
+        contextual_score = self._calculate_contextual_fit(chosen_word, lyric_context)
+        return min(1.0, max(0.0, (phonetic_score * 0.7) + (contextual_score * 0.3)))
+    
+    @staticmethod
+    def _rhyme_target(lyric_context: str) -> Optional[str]:
+        """The word a choice should rhyme with: the last complete word before the blank"""
+        context_words = lyric_context.split()
+        if len(context_words) < 2:
+            return None
+        return context_words[-2] if context_words[-1] == "___" else context_words[-1]
+    
     def _calculate_phonetic_similarity(self, word1: str, word2: str) -> float:
         """Calculate phonetic similarity between two words"""
         # Simple rhyming detection based on ending sounds
-        word1_clean = word1.lower().strip()
-        word2_clean = word2.lower().strip()
-        
+        return self._similarity_cache(word1.lower().strip(), word2.lower().strip())
+    
+    def _compute_phonetic_similarity(self, word1_clean: str, word2_clean: str) -> float:
+        """Uncached similarity between two normalized words"""
         # Check for exact match
         if word1_clean == word2_clean:
             return 1.0
         
+        # Prefer the pronunciation when the backend knows both words
+        if self.phonetic_backend is not None:
+            phonetic_score = self.phonetic_backend.similarity(word1_clean, word2_clean)
+            if phonetic_score is not None:
+                return phonetic_score
+        
         # Check for known rhyme patterns
-        for pattern, rhymes in self.rhyme_patterns.items():
-            if word1_clean in rhymes and word2_clean in rhymes:
-                return 0.9
-            elif word1_clean in rhymes or word2_clean in rhymes:
-                # Check if they end with the same pattern
-                if word1_clean.endswith(pattern) and word2_clean.endswith(pattern):
-                    return 0.8
+        pattern_score = self.rhyme_index.match(word1_clean, word2_clean)
+        if pattern_score is not None:
+            return pattern_score
         
         # Use difflib for general similarity
         similarity = difflib.SequenceMatcher(None, word1_clean, word2_clean).ratio()
@@ -91,6 +184,13 @@ class RhymeScorer:
         # Default score
         return 0.5
 
+# On a beat grid no tap is more than half a period from a beat, so timing thresholds shrink with
+# the period: these fractions of it, capped at the fixed thresholds. A tap at a random moment then
+# averages about 0.5 beat accuracy instead of scoring well.
+PERFECT_BEAT_FRACTION = 1 / 12
+GOOD_BEAT_FRACTION = 1 / 6
+ACCEPTABLE_BEAT_FRACTION = 1 / 4
+
 class BeatScorer:
     """Calculate beat synchronization accuracy"""
     
@@ -98,118 +198,239 @@ class BeatScorer:
         self.perfect_timing_threshold = 100  # milliseconds
         self.good_timing_threshold = 250     # milliseconds
         self.acceptable_timing_threshold = 500  # milliseconds
+        # period -> thresholds(period); there's one period per catalog tempo
+        self._scaled_thresholds: Dict[float, Tuple[float, float, float]] = {}
+    
+    def thresholds(self, period: Optional[float] = None) -> Tuple[float, float, float]:
+        """(perfect, good, acceptable) offsets in ms for beats `period` ms apart; fixed without a period"""
+        thresholds = (self.perfect_timing_threshold, self.good_timing_threshold, self.acceptable_timing_threshold)
+        if period is None or period <= 0:
+            return thresholds
+        fractions = (PERFECT_BEAT_FRACTION, GOOD_BEAT_FRACTION, ACCEPTABLE_BEAT_FRACTION)
+        return tuple(min(threshold, fraction * period) for threshold, fraction in zip(thresholds, fractions))
     
-    def calculate_beat_accuracy(self, tap_timestamp: float, beat_timestamp: float) -> float:
+    def calculate_beat_accuracy(self, tap_timestamp: float, beat_timestamp: float,
+                                period: Optional[float] = None) -> float:
         """
         Calculate how well the player tapped in sync with the beat
         Returns a score between 0.0 and 1.0
         """
         timing_offset = abs(tap_timestamp - beat_timestamp)
+        if period is not None and period > 0:
+            # This runs on every tap, so the scaled thresholds are worked out once per period
+            scaled = self._scaled_thresholds.get(period)
+            if scaled is None:
+                scaled = self._scaled_thresholds[period] = self.thresholds(period)
+            perfect, good, acceptable = scaled
+        else:
+            perfect = self.perfect_timing_threshold
+            good = self.good_timing_threshold
+            acceptable = self.acceptable_timing_threshold
         
-        if timing_offset <= self.perfect_timing_threshold:
+        if timing_offset <= perfect:
             return 1.0
-        elif timing_offset <= self.good_timing_threshold:
+        elif timing_offset <= good:
             return 0.8
-        elif timing_offset <= self.acceptable_timing_threshold:
+        elif timing_offset <= acceptable:
             return 0.5
         else:
-            return max(0.0, 1.0 - (timing_offset / 1000))  # Linear decay
+            return max(0.0, 1.0 - (timing_offset / (2 * acceptable)))  # Linear decay
     
-    def get_timing_feedback(self, timing_offset: float) -> Dict[str, str]:
+    def calculate_beat_accuracy_batch(self, tap_timestamps: np.ndarray, beat_timestamps: np.ndarray,
+                                      periods: Optional[np.ndarray] = None) -> np.ndarray:
+        """Vectorized calculate_beat_accuracy over arrays of timestamps (and beat periods)"""
+        timing_offsets = np.abs(np.asarray(tap_timestamps, dtype=np.float64) -
+                                np.asarray(beat_timestamps, dtype=np.float64))
+        if periods is None:
+            perfect, good, acceptable = self.thresholds()
+        else:
+            periods = np.asarray(periods, dtype=np.float64)
+            scaled = periods > 0
+            perfect, good, acceptable = (
+                np.where(scaled, np.minimum(threshold, fraction * periods), threshold)
+                for threshold, fraction in zip(self.thresholds(), (PERFECT_BEAT_FRACTION, GOOD_BEAT_FRACTION,
+                                                                   ACCEPTABLE_BEAT_FRACTION))
+            )
+        
+        return np.select(
+            [
+                timing_offsets <= perfect,
+                timing_offsets <= good,
+                timing_offsets <= acceptable,
+            ],
+            [1.0, 0.8, 0.5],
+            default=np.maximum(0.0, 1.0 - (timing_offsets / (2 * acceptable))),  # Linear decay
+        )
+
+    def nearest_beat(self, tap_time: float, anchor: float, period: float, beats: Optional[int] = None) -> float:
+        """
+        The beat closest to `tap_time` on a grid of `period` ms starting at `anchor`
+        With `beats`, only the first that many beats count, so an early or late tap is matched to the
+        first or last of them rather than to a beat outside the lyric's window
+        """
+        if period <= 0:
+            return anchor
+        step = round((tap_time - anchor) / period)
+        if beats is not None:
+            step = min(max(step, 0), beats - 1)
+        return anchor + step * period
+
+    def nearest_beat_batch(self, tap_times: np.ndarray, anchors: np.ndarray, periods: np.ndarray,
+                           beats: Optional[np.ndarray] = None) -> np.ndarray:
+        """Vectorized nearest_beat; an infinite entry in `beats` leaves that tap's grid unbounded"""
+        tap_times = np.asarray(tap_times, dtype=np.float64)
+        anchors = np.asarray(anchors, dtype=np.float64)
+        periods = np.asarray(periods, dtype=np.float64)
+        steps = np.round((tap_times - anchors) / np.where(periods > 0, periods, 1.0))
+        if beats is not None:
+            beats = np.asarray(beats, dtype=np.float64)
+            steps = np.where(np.isfinite(beats), np.clip(steps, 0, beats - 1), steps)
+        return np.where(periods > 0, anchors + steps * periods, anchors)
+
+    def score_tap(self, tap_time: float, anchor: float, period: float,
+                  beats: Optional[int] = None) -> Tuple[float, float, float]:
+        """
+        Score a tap against a beat schedule of `beats` beats (unbounded if None), with thresholds
+        scaled to its period
+        Returns (beat accuracy, timing offset in ms, time of the beat it was matched to)
+        """
+        beat = self.nearest_beat(tap_time, anchor, period, beats)
+        return self.calculate_beat_accuracy(tap_time, beat, period), abs(tap_time - beat), beat
+
+    def get_timing_feedback(self, timing_offset: float, period: Optional[float] = None) -> Dict[str, str]:
         """Get feedback based on timing accuracy"""
-        if timing_offset <= self.perfect_timing_threshold:
+        perfect, good, acceptable = self.thresholds(period)
+        if timing_offset <= perfect:
             return {"message": "Perfect timing! 🎯", "color": "green"}
-        elif timing_offset <= self.good_timing_threshold:
+        elif timing_offset <= good:
             return {"message": "Good rhythm! 👍", "color": "blue"}
-        elif timing_offset <= self.acceptable_timing_threshold:
+        elif timing_offset <= acceptable:
             return {"message": "Almost on beat! ⚡", "color": "yellow"}
         else:
             return {"message": "Missed the beat! 💥", "color": "red"}
 
+DEFAULT_TONE_CATEGORIES = {
+    "energetic": ["fast", "quick", "dash", "flash", "speed", "rush", "burst"],
+    "smooth": ["flow", "smooth", "glide", "drift", "float", "wave"],
+    "powerful": ["strong", "mighty", "force", "power", "steel", "hammer", "thunder"],
+    "emotional": ["feel", "heart", "soul", "love", "pain", "joy", "tears"],
+    "negative": ["trash", "junk", "waste", "bad", "wrong", "fail", "lose"],
+    "positive": ["good", "great", "best", "win", "success", "gold", "shine"]
+}
+
+# Context hints checked only when no category word appears in the lyric
+CONTEXT_TONE_FALLBACKS = (
+    ("energetic", ("fast", "quick", "speed")),
+    ("smooth", ("flow", "smooth", "river")),
+    ("powerful", ("hard", "hit", "hammer")),
+)
+
+COMPATIBLE_TONES = frozenset(frozenset(pair) for pair in (
+    ("energetic", "powerful"),
+    ("smooth", "emotional"),
+    ("positive", "energetic"),
+    ("positive", "smooth"),
+    ("negative", "emotional")
+))
+
 class ToneMatcher:
     """Calculate tone matching between chosen word and lyric context"""
     
-    def __init__(self):
+    def __init__(self, tone_categories: Optional[Dict[str, List[str]]] = None,
+                 lyric_cache_size: int = 4096):
         # Tone categories for different contexts
-        self.tone_categories = {
-            "energetic": ["fast", "quick", "dash", "flash", "speed", "rush", "burst"],
-            "smooth": ["flow", "smooth", "glide", "drift", "float", "wave"],
-            "powerful": ["strong", "mighty", "force", "power", "steel", "hammer", "thunder"],
-            "emotional": ["feel", "heart", "soul", "love", "pain", "joy", "tears"],
-            "negative": ["trash", "junk", "waste", "bad", "wrong", "fail", "lose"],
-            "positive": ["good", "great", "best", "win", "success", "gold", "shine"]
-        }
+        self.tone_categories = tone_categories or DEFAULT_TONE_CATEGORIES
+        
+        # Inverted index; the first category listing a word wins, as in the original scan
+        self._word_tones: Dict[str, str] = {}
+        for tone, words in self.tone_categories.items():
+            for word in words:
+                self._word_tones.setdefault(word, tone)
+        
+        # Score for every (context tone, word tone) pair, so matching is a single lookup
+        tones = list(self.tone_categories) + [tone for tone, _ in CONTEXT_TONE_FALLBACKS] + ["neutral"]
+        self._tone_scores: Dict[Tuple[str, str], float] = {}
+        for context_tone in tones:
+            for word_tone in tones:
+                if context_tone == word_tone:
+                    score = 1.0
+                elif self._are_compatible_tones(context_tone, word_tone):
+                    score = 0.7
+                else:
+                    score = 0.3
+                self._tone_scores[(context_tone, word_tone)] = score
+        
+        # Every player sees the same lyrics: analyze each context once
+        self.lyric_cache_size = lyric_cache_size
+        self._lyric_tones: "OrderedDict[str, str]" = OrderedDict()
+        self._context_tone_cache = lru_cache(maxsize=lyric_cache_size)(self._analyze_context_tone)
     
-    def calculate_tone_match(self, chosen_word: str, lyric_context: str) -> float:
+    def calculate_tone_match(self, chosen_word: str, lyric_context: str,
+                             lyric_id: Optional[str] = None) -> float:
         """
         Calculate how well the chosen word matches the tone of the lyric
         Returns a score between 0.0 and 1.0
+        Pass the lyric's id to share its context analysis across players
         """
         if not chosen_word or not lyric_context:
             return 0.0
         
-        # Determine the tone of the lyric context
-        context_tone = self._analyze_context_tone(lyric_context)
-        
-        # Determine the tone of the chosen word
-        word_tone = self._analyze_word_tone(chosen_word)
-        
-        # Calculate tone match
-        if context_tone == word_tone:
-            return 1.0
-        elif self._are_compatible_tones(context_tone, word_tone):
-            return 0.7
+        # Inlined lyric-id cache hit; this runs on every tap
+        context_tone = self._lyric_tones.get(lyric_id) if lyric_id is not None else None
+        if context_tone is not None:
+            self._lyric_tones.move_to_end(lyric_id)
         else:
-            return 0.3
+            context_tone = self.context_tone(lyric_context, lyric_id)
+        word_tone = self._word_tones.get(chosen_word.lower(), "neutral")
+        return self._tone_scores.get((context_tone, word_tone), 0.3)
+    
+    def context_tone(self, lyric_context: str, lyric_id: Optional[str] = None) -> str:
+        """Tone of a lyric, cached by lyric id when given, else by its text"""
+        if lyric_id is None:
+            return self._context_tone_cache(lyric_context)
+        
+        tone = self._lyric_tones.get(lyric_id)
+        if tone is not None:
+            self._lyric_tones.move_to_end(lyric_id)
+            return tone
+        tone = self._lyric_tones[lyric_id] = self._context_tone_cache(lyric_context)
+        if len(self._lyric_tones) > self.lyric_cache_size:
+            self._lyric_tones.popitem(last=False)
+        return tone
     
     def _analyze_context_tone(self, context: str) -> str:
         """Analyze the tone of the lyric context"""
         context_lower = context.lower()
         
-        # Check for tone indicators in the context
+        # Tone words may appear inside longer words ("flashy"), so this stays a substring scan;
+        # callers go through the caches above
         for tone, words in self.tone_categories.items():
             if any(word in context_lower for word in words):
                 return tone
         
-        # Default tone based on common patterns
-        if any(word in context_lower for word in ["fast", "quick", "speed"]):
-            return "energetic"
-        elif any(word in context_lower for word in ["flow", "smooth", "river"]):
-            return "smooth"
-        elif any(word in context_lower for word in ["hard", "hit", "hammer"]):
-            return "powerful"
-        else:
-            return "neutral"
+        for tone, words in CONTEXT_TONE_FALLBACKS:
+            if any(word in context_lower for word in words):
+                return tone
+        return "neutral"
     
     def _analyze_word_tone(self, word: str) -> str:
         """Analyze the tone of a single word"""
-        word_lower = word.lower()
-        
-        for tone, words in self.tone_categories.items():
-            if word_lower in words:
-                return tone
-        
-        return "neutral"
+        return self._word_tones.get(word.lower(), "neutral")
     
     def _are_compatible_tones(self, tone1: str, tone2: str) -> bool:
         """Check if two tones are compatible"""
-        compatible_pairs = [
-            ("energetic", "powerful"),
-            ("smooth", "emotional"),
-            ("positive", "energetic"),
-            ("positive", "smooth"),
-            ("negative", "emotional")
-        ]
-        
-        return (tone1, tone2) in compatible_pairs or (tone2, tone1) in compatible_pairs
+        return frozenset((tone1, tone2)) in COMPATIBLE_TONES
 
 class GameScorer:
     """Main scoring class that combines all scoring components"""
     
-    def __init__(self):
-        self.rhyme_scorer = RhymeScorer()
-        self.beat_scorer = BeatScorer()
-        self.tone_matcher = ToneMatcher()
+    def __init__(self,
+                 rhyme_scorer: Optional[RhymeScorer] = None,
+                 beat_scorer: Optional[BeatScorer] = None,
+                 tone_matcher: Optional[ToneMatcher] = None):
+        self.rhyme_scorer = rhyme_scorer or RhymeScorer()
+        self.beat_scorer = beat_scorer or BeatScorer()
+        self.tone_matcher = tone_matcher or ToneMatcher()
     
     def calculate_comprehensive_score(self, 
                                    chosen_word: str, 
@@ -234,6 +455,71 @@ class GameScorer:
             "timing_offset": abs(tap_timestamp - beat_timestamp)
         }
     
+    def score_batch(self,
+                    chosen_words: Sequence[str],
+                    lyric_contexts: Sequence[str],
+                    tap_timestamps: Sequence[float],
+                    beat_timestamps: Sequence[float],
+                    lyric_ids: Optional[Sequence[str]] = None,
+                    beat_periods: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
+        """
+        Score many taps at once from columnar inputs
+        Returns one array per metric, aligned with the inputs
+        """
+        if len(tap_timestamps) != len(chosen_words) or len(beat_timestamps) != len(chosen_words):
+            raise ValueError("score_batch columns must all have the same length")
+        rhyme_scores, tone_scores = self.score_pairs(chosen_words, lyric_contexts, lyric_ids)
+        return self.combine_batch(rhyme_scores, tone_scores, tap_timestamps, beat_timestamps, beat_periods)
+    
+    def score_pairs(self,
+                    chosen_words: Sequence[str],
+                    lyric_contexts: Sequence[str],
+                    lyric_ids: Optional[Sequence[Optional[str]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Rhyme and tone scores for aligned word/context columns: the text-dependent half of score_batch"""
+        count = len(chosen_words)
+        if len(lyric_contexts) != count or (lyric_ids is not None and len(lyric_ids) != count):
+            raise ValueError("score_batch columns must all have the same length")
+        
+        # Replays and bursts repeat the same word/lyric pairs, so score each pair once
+        pair_ids: Dict[Tuple[str, str], int] = {}
+        pair_lyric_ids: List[Optional[str]] = []
+        inverse = np.empty(count, dtype=np.intp)
+        for i, pair in enumerate(zip(chosen_words, lyric_contexts)):
+            pair_id = inverse[i] = pair_ids.setdefault(pair, len(pair_ids))
+            if pair_id == len(pair_lyric_ids):
+                pair_lyric_ids.append(lyric_ids[i] if lyric_ids is not None else None)
+        
+        unique_rhyme = np.empty(len(pair_ids), dtype=np.float64)
+        unique_tone = np.empty(len(pair_ids), dtype=np.float64)
+        for (word, context), pair_id in pair_ids.items():
+            unique_rhyme[pair_id] = self.rhyme_scorer.calculate_rhyme_accuracy(word, context)
+            unique_tone[pair_id] = self.tone_matcher.calculate_tone_match(
+                word, context, pair_lyric_ids[pair_id]
+            )
+        
+        return unique_rhyme[inverse], unique_tone[inverse]
+    
+    def combine_batch(self,
+                      rhyme_scores: np.ndarray,
+                      tone_scores: np.ndarray,
+                      tap_timestamps: Sequence[float],
+                      beat_timestamps: Sequence[float],
+                      beat_periods: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
+        """Add beat scores to score_pairs output and assemble score_batch's result"""
+        rhyme_scores = np.asarray(rhyme_scores, dtype=np.float64)
+        tone_scores = np.asarray(tone_scores, dtype=np.float64)
+        taps = np.asarray(tap_timestamps, dtype=np.float64)
+        beats = np.asarray(beat_timestamps, dtype=np.float64)
+        beat_scores = self.beat_scorer.calculate_beat_accuracy_batch(taps, beats, beat_periods)
+        
+        return {
+            "rhyme_accuracy": rhyme_scores,
+            "beat_accuracy": beat_scores,
+            "tone_match": tone_scores,
+            "overall_score": (rhyme_scores * 0.4) + (beat_scores * 0.4) + (tone_scores * 0.2),
+            "timing_offset": np.abs(taps - beats)
+        }
+    
     def get_performance_feedback(self, scores: Dict[str, float]) -> Dict[str, str]:
         """Get comprehensive feedback based on all scores"""
         overall = scores["overall_score"]
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from phonetics import phonetic_backend_from_env
+from scoring import GameScorer, RhymeScorer
+
+logger = logging.getLogger(__name__)
+
+# Scores from a choice: (rhyme_accuracy, tone_score)
+PairScore = Tuple[float, float]
+
+def default_game_scorer() -> GameScorer:
+    """The scorer the app builds, recreated in each pool process from the same environment"""
+    return GameScorer(RhymeScorer(phonetic_backend=phonetic_backend_from_env()))
+
+# Each pool process builds its scorer (rhyme index, tone tables, pronunciation mmap) once
+_worker_scorer: Optional[GameScorer] = None
+
+def _init_worker(scorer_factory: Callable[[], GameScorer]):
+    global _worker_scorer
+    _worker_scorer = scorer_factory()
+
+def _ready() -> int:
+    return os.getpid()
+
+def _score_pairs(chosen_words: List[str], lyric_contexts: List[str],
+                 lyric_ids: List[Optional[str]]) -> Tuple[List[float], List[float]]:
+    rhyme_scores, tone_scores = _worker_scorer.score_pairs(chosen_words, lyric_contexts, lyric_ids)
+    return rhyme_scores.tolist(), tone_scores.tolist()
+
+class ScoringPool:
+    """
+    Rhyme and tone scoring in a pool of pre-started processes, so a slow score never blocks the event loop
+    Single choices queued within `batch_window` seconds of each other travel to the pool as one job.
+    Results that miss `timeout`, or fail, are replaced with `fallback`'s bounded-cost estimate.
+    """
+
+    def __init__(self, fallback: GameScorer,
+                 workers: Optional[int] = None,
+                 timeout: float = 0.25,
+                 batch_size: int = 32,
+                 batch_window: float = 0.002,
+                 inline_max_word: int = 32,
+                 inline_max_context: int = 256,
+                 scorer_factory: Callable[[], GameScorer] = default_game_scorer):
+        self.fallback = fallback
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.inline_max_word = inline_max_word
+        self.inline_max_context = inline_max_context
+        self.scorer_factory = scorer_factory
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: List[Tuple[str, str, Optional[str], "asyncio.Future[PairScore]"]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.stats = {
+            "jobs": 0,
+            "pairs": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "pool_restarts": 0,
+        }
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Spawned, not forked: the parent has the event loop, the write-behind thread and open sockets
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.scorer_factory,)
+        )
+
+    async def start(self):
+        """Start every process and load its scorer before the first request needs one"""
+        if self._executor is not None:
+            return
+        self._executor = self._new_executor()
+        loop = asyncio.get_running_loop()
+        # The pool starts processes on demand, so ask for as many results as there are workers
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _ready) for _ in range(self.workers)))
+
+    def close(self):
+        if self._executor is None:
+            return
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._flush()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def is_cheap(self, chosen_word: str, lyric_context: str) -> bool:
+        """Whether scoring inline costs less than the trip to the pool; difflib is quadratic in word length"""
+        return len(chosen_word) <= self.inline_max_word and len(lyric_context) <= self.inline_max_context
+
+    def estimate(self, chosen_word: str, lyric_context: str, lyric_id: Optional[str]) -> PairScore:
+        """Degraded scores, computed inline at bounded cost"""
+        return (
+            self.fallback.rhyme_scorer.estimate_rhyme_accuracy(chosen_word, lyric_context),
+            self.fallback.tone_matcher.calculate_tone_match(chosen_word, lyric_context, lyric_id)
+        )
+
+    async def score(self, chosen_word: str, lyric_context: str, lyric_id: Optional[str] = None) -> PairScore:
+        """Score one choice in the pool, batched with others arriving at about the same time"""
+        if self._executor is None:
+            raise RuntimeError("ScoringPool.start() has not been awaited")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((chosen_word, lyric_context, lyric_id, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except Exception as exc:
+            self._count_failure(exc)
+            return self.estimate(chosen_word, lyric_context, lyric_id)
+
+    async def score_pairs(self, chosen_words: Sequence[str], lyric_contexts: Sequence[str],
+                          lyric_ids: Sequence[Optional[str]]) -> Tuple[List[float], List[float]]:
+        """Score an already-batched set of choices as one pool job"""
+        if self._executor is None:
+            raise RuntimeError("ScoringPool.start() has not been awaited")
+        try:
+            return await asyncio.wait_for(
+                self._submit(list(chosen_words), list(lyric_contexts), list(lyric_ids)), self.timeout
+            )
+        except Exception as exc:
+            self._count_failure(exc)
+            estimates = [self.estimate(*pair) for pair in zip(chosen_words, lyric_contexts, lyric_ids)]
+            return [rhyme for rhyme, _ in estimates], [tone for _, tone in estimates]
+
+    def _count_failure(self, exc: Exception):
+        if isinstance(exc, asyncio.TimeoutError):
+            self.stats["timeouts"] += 1
+        else:
+            logger.warning("Scoring in the pool failed; using estimated scores: %r", exc)
+            self.stats["failures"] += 1
+
+    def _submit(self, chosen_words: List[str], lyric_contexts: List[str],
+                lyric_ids: List[Optional[str]]) -> "asyncio.Future[Tuple[List[float], List[float]]]":
+        self.stats["jobs"] += 1
+        self.stats["pairs"] += len(chosen_words)
+        try:
+            job = self._executor.submit(_score_pairs, chosen_words, lyric_contexts, lyric_ids)
+        except BrokenProcessPool:
+            # A pool process died (OOM killer, segfault in an extension); replace the pool and retry once
+            logger.warning("Scoring pool broke; restarting it")
+            self.stats["pool_restarts"] += 1
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            job = self._executor.submit(_score_pairs, chosen_words, lyric_contexts, lyric_ids)
+        return asyncio.wrap_future(job)
+
+    def _flush(self):
+        self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        futures = [item[3] for item in batch]
+        try:
+            job = self._submit([item[0] for item in batch], [item[1] for item in batch], [item[2] for item in batch])
+        except Exception as exc:
+            # Runs from score() or a timer, neither of which should see this; each waiter falls back instead
+            for future in futures:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        job.add_done_callback(lambda done: self._resolve(done, futures))
+
+    @staticmethod
+    def _resolve(job: "asyncio.Future", futures: List["asyncio.Future[PairScore]"]):
+        if job.cancelled():
+            exc: Optional[BaseException] = RuntimeError("Scoring job was cancelled")
+        else:
+            exc = job.exception()
+        for i, future in enumerate(futures):
+            # A waiter that timed out has already been cancelled
+            if future.done():
+                continue
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                rhyme_scores, tone_scores = job.result()
+                future.set_result((rhyme_scores[i], tone_scores[i]))
@@ -0,0 +1,29 @@
+"""
+Entry point for the combined container: the API plus the built React frontend
+    python -m uvicorn serve:app --app-dir backend
+"""
+import os
+
+from main import app
+from static_assets import StaticAssets, StaticFrontend
+
+FRONTEND_BUILD_DIR = os.getenv(
+    "FRONTEND_BUILD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend", "build")
+)
+
+assets = StaticAssets(
+    FRONTEND_BUILD_DIR,
+    small_file_bytes=int(os.getenv("STATIC_SMALL_FILE_KB", 256)) * 1024,
+    cache_bytes=int(os.getenv("STATIC_CACHE_MB", 32)) * 1024 * 1024
+)
+
+# The API's "/" status message gives way to the app itself
+app.router.routes[:] = [route for route in app.router.routes if getattr(route, "path", None) != "/"]
+
+@app.get("/admin/static", include_in_schema=False)
+async def get_static_stats():
+    """Frontend files indexed and held in memory, and responses by content coding"""
+    return {"files": len(assets.assets), "cached_bytes": assets.cached_bytes, **assets.stats}
+
+# Last, so every API route matches first
+app.mount("/", StaticFrontend(assets), name="frontend")
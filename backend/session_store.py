@@ -0,0 +1,520 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from choice_log import ChoiceLog
+from journal import SessionJournal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_TTL = 3600  # seconds
+
+class SessionStore:
+    """
+    Storage for in-progress game sessions
+    A session is a dict of fields plus an append-only ChoiceLog
+    """
+
+    async def create(self, session_id: str, fields: Dict[str, Any]) -> None:
+        """Store a new session, replacing any previous one with the same id"""
+        raise NotImplementedError
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return the session fields (without choices), or None if it doesn't exist"""
+        raise NotImplementedError
+
+    async def update(self, session_id: str, fields: Dict[str, Any]) -> None:
+        """Overwrite some fields of an existing session; a session that has ended stays gone"""
+        raise NotImplementedError
+
+    async def append_choices(self, session_id: str, choices: List[Dict[str, Any]]) -> None:
+        """Append choice records to an existing session's ChoiceLog"""
+        raise NotImplementedError
+
+    async def pop(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a session and return its fields with its "choices" ChoiceLog, or None"""
+        raise NotImplementedError
+
+    async def start(self) -> None:
+        """Start any background work; called once the event loop is running"""
+
+    async def close(self) -> None:
+        """Release any resources held by the store"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Gauges and counters describing the store"""
+        return {}
+
+class _SessionEntry:
+    __slots__ = ("fields", "choices", "last_access", "size")
+
+    def __init__(self, fields: Dict[str, Any], now: float):
+        self.fields = fields
+        self.choices = ChoiceLog()
+        self.last_access = now
+        self.size = _estimate_size(fields) + sys.getsizeof(self.choices)
+
+def _estimate_size(value: Any) -> int:
+    """Rough resident size of a JSON-like value, good enough for a memory budget"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(key) + _estimate_size(item) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+EvictionCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store; only valid when running a single worker
+    Sessions idle longer than `ttl` are reaped in the background, and the least
+    recently used ones are evicted once `max_sessions` or `max_bytes` is exceeded.
+    With a `journal`, every change is journaled before it's applied, so one the journal rejects
+    leaves the session as it was, and start() restores the sessions a previous worker left in progress.
+    """
+
+    def __init__(self, ttl: Optional[float] = DEFAULT_SESSION_TTL,
+                 max_sessions: Optional[int] = None,
+                 max_bytes: Optional[int] = None,
+                 reap_interval: float = 30.0,
+                 on_evict: Optional[EvictionCallback] = None,
+                 journal: Optional[SessionJournal] = None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.reap_interval = reap_interval
+        self.on_evict = on_evict
+        self.journal = journal
+
+        # Ordered from least to most recently used
+        self._sessions: "OrderedDict[str, _SessionEntry]" = OrderedDict()
+        self._resident_bytes = 0
+        self._evicted: List[Tuple[str, Dict[str, Any]]] = []
+        # Hands evicted sessions to on_evict as soon as they're evicted, not on the next reap
+        self._flusher: Optional[asyncio.Task] = None
+        self._reaper: Optional[asyncio.Task] = None
+        self.evictions = {"idle": 0, "max_sessions": 0, "max_bytes": 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _touch(self, session_id: str) -> Optional[_SessionEntry]:
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            entry.last_access = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return entry
+
+    def _evict(self, session_id: str, reason: str):
+        entry = self._sessions.pop(session_id)
+        self._resident_bytes -= entry.size
+        self.evictions[reason] += 1
+        if self.journal is not None:
+            self.journal.record_end(session_id)
+        if self.on_evict is not None:
+            self._evicted.append((session_id, {**entry.fields, "choices": entry.choices}))
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flusher is not None and not self._flusher.done():
+            # Its loop picks up this session too
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # reap_idle() called outside the event loop; close() or the next eviction flushes it
+            return
+        self._flusher = loop.create_task(self._flush_evicted())
+
+    def _enforce_limits(self):
+        # The most recently touched session is never evicted to make room for itself
+        while self.max_sessions is not None and len(self._sessions) > self.max_sessions:
+            self._evict(next(iter(self._sessions)), "max_sessions")
+        while (self.max_bytes is not None and self._resident_bytes > self.max_bytes
+               and len(self._sessions) > 1):
+            self._evict(next(iter(self._sessions)), "max_bytes")
+
+    def reap_idle(self, now: Optional[float] = None) -> int:
+        """Evict sessions idle for longer than the TTL; returns how many were evicted"""
+        if self.ttl is None:
+            return 0
+        deadline = (now if now is not None else time.monotonic()) - self.ttl
+        reaped = 0
+        # LRU order means the idle sessions are all at the front
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if entry.last_access > deadline:
+                break
+            self._evict(session_id, "idle")
+            reaped += 1
+        return reaped
+
+    async def _flush_evicted(self):
+        while self._evicted:
+            evicted, self._evicted = self._evicted, []
+            for session_id, session in evicted:
+                try:
+                    await self.on_evict(session_id, session)
+                except Exception:
+                    logger.exception("Failed to flush evicted session %s", session_id)
+
+    async def _reap_forever(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            self.reap_idle()
+
+    async def start(self) -> None:
+        if self.journal is not None and self.journal._writer is None:
+            restored = await asyncio.to_thread(self.journal.replay)
+            for session_id, (fields, choices) in restored.items():
+                self._restore(session_id, fields, choices)
+            self.journal.open()
+            if restored:
+                logger.info("Restored %d in-progress sessions from the journal", len(restored))
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_forever())
+
+    async def close(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        if self._flusher is not None:
+            await self._flusher
+            self._flusher = None
+        await self._flush_evicted()
+        if self.journal is not None:
+            await self.journal.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "resident_sessions": len(self._sessions),
+            "resident_bytes": self._resident_bytes,
+            "evictions": dict(self.evictions),
+        }
+        if self.journal is not None:
+            stats["journal"] = self.journal.snapshot()
+        return stats
+
+    def _restore(self, session_id: str, fields: Dict[str, Any], choices: List[Dict[str, Any]]):
+        """Re-add a journaled session without journaling it again"""
+        entry = _SessionEntry(fields, time.monotonic())
+        before = sys.getsizeof(entry.choices)
+        entry.choices.extend(choices)
+        entry.size += sys.getsizeof(entry.choices) - before
+        self._sessions[session_id] = entry
+        self._resident_bytes += entry.size
+
+    async def create(self, session_id: str, fields: Dict[str, Any]) -> None:
+        if session_id in self._sessions:
+            self._resident_bytes -= self._sessions.pop(session_id).size
+        if self.journal is not None:
+            self.journal.record_start(session_id, fields)
+        entry = _SessionEntry(dict(fields), time.monotonic())
+        self._sessions[session_id] = entry
+        self._resident_bytes += entry.size
+        self._enforce_limits()
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._touch(session_id)
+        return entry.fields if entry is not None else None
+
+    async def update(self, session_id: str, fields: Dict[str, Any]) -> None:
+        entry = self._touch(session_id)
+        if entry is None:
+            return
+        if self.journal is not None:
+            self.journal.record_update(session_id, fields)
+        delta = 0
+        for name, value in fields.items():
+            if name in entry.fields:
+                delta -= _estimate_size(entry.fields[name])
+            delta += _estimate_size(value)
+        entry.fields.update(fields)
+        entry.size += delta
+        self._resident_bytes += delta
+        self._enforce_limits()
+
+    async def append_choices(self, session_id: str, choices: List[Dict[str, Any]]) -> None:
+        entry = self._touch(session_id)
+        if entry is None:
+            return
+        if self.journal is not None and choices:
+            self.journal.record_choices(session_id, choices)
+        before = sys.getsizeof(entry.choices)
+        entry.choices.extend(choices)
+        added = sys.getsizeof(entry.choices) - before
+        entry.size += added
+        self._resident_bytes += added
+        self._enforce_limits()
+
+    async def pop(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return None
+        self._resident_bytes -= entry.size
+        if self.journal is not None:
+            self.journal.record_end(session_id)
+        return {**entry.fields, "choices": entry.choices}
+
+class RedisError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+class RedisConnection:
+    """One RESP connection; commands are written in a batch and replies read back in order"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    def encode(*args: Any) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    async def read_reply(self) -> Any:
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        elif kind == b"-":
+            raise RedisError(payload.decode("utf-8", "replace"))
+        elif kind == b":":
+            return int(payload)
+        elif kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        elif kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self.read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def pipeline(self, commands: List[Tuple[Any, ...]]) -> List[Any]:
+        """Send all commands in one write, then collect their replies"""
+        self.writer.write(b"".join(self.encode(*command) for command in commands))
+        await self.writer.drain()
+
+        replies = []
+        error = None
+        for _ in commands:
+            try:
+                replies.append(await self.read_reply())
+            except RedisError as exc:
+                # Keep reading so the connection stays in sync for the next caller
+                error = error or exc
+                replies.append(None)
+        if error is not None:
+            raise error
+        return replies
+
+    def close(self):
+        self.writer.close()
+
+class RedisConnectionPool:
+    """Bounded pool of RESP connections shared by all requests on a worker"""
+
+    def __init__(self, host: str, port: int, db: int = 0, password: Optional[str] = None,
+                 max_connections: int = 10):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self._idle: List[RedisConnection] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def _connect(self) -> RedisConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = RedisConnection(reader, writer)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            await connection.pipeline(setup)
+        return connection
+
+    async def execute(self, commands: List[Tuple[Any, ...]]) -> List[Any]:
+        """Run a pipeline on a pooled connection"""
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            try:
+                replies = await connection.pipeline(commands)
+            except RedisError:
+                # Every reply was consumed, so the connection is still usable
+                self._idle.append(connection)
+                raise
+            except BaseException:
+                # Broken or cancelled mid-pipeline; don't hand it to the next caller
+                connection.close()
+                raise
+            self._idle.append(connection)
+            return replies
+
+    async def close(self):
+        while self._idle:
+            connection = self._idle.pop()
+            connection.close()
+            await connection.writer.wait_closed()
+
+class RedisScript:
+    """A Lua script run with EVALSHA, sent in full only when the server hasn't cached it yet"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    async def run(self, pool: RedisConnectionPool, keys: Tuple[str, ...], args: List[Any]) -> Any:
+        try:
+            reply, = await pool.execute([("EVALSHA", self.sha, len(keys), *keys, *args)])
+            return reply
+        except RedisError as exc:
+            if not str(exc).startswith("NOSCRIPT"):
+                raise
+        # EVAL also caches the script, so later calls go back to EVALSHA
+        reply, = await pool.execute([("EVAL", self.source, len(keys), *keys, *args)])
+        return reply
+
+# Writes to a session check that it still exists in the same step, so one that races the game's end
+# can't bring back a partial session. KEYS: the fields hash, the choices list; ARGV: the TTL, then
+# field/value pairs or choices.
+UPDATE_SCRIPT = RedisScript("""
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+""")
+# Pushed in slices, as unpack() is limited by the Lua stack
+APPEND_SCRIPT = RedisScript("""
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+for i = 2, #ARGV, 1000 do
+    redis.call('RPUSH', KEYS[2], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+""")
+# Read and delete in one step, so only one of two concurrent ends gets the session
+POP_SCRIPT = RedisScript("""
+local fields = redis.call('HGETALL', KEYS[1])
+local choices = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[1], KEYS[2])
+return {fields, choices}
+""")
+
+class RedisSessionStore(SessionStore):
+    """
+    Store sessions in Redis so any worker or node can serve any request
+    Fields live in a hash and choices in a list; both expire after `ttl` seconds idle
+    """
+
+    def __init__(self, pool: RedisConnectionPool, ttl: int = DEFAULT_SESSION_TTL,
+                 prefix: str = "rhyme_racer:session:"):
+        self.pool = pool
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _keys(self, session_id: str) -> Tuple[str, str]:
+        key = self.prefix + session_id
+        return key, key + ":choices"
+
+    @staticmethod
+    def _field_args(fields: Dict[str, Any]) -> List[str]:
+        args = []
+        for name, value in fields.items():
+            args += [name, json.dumps(value)]
+        return args
+
+    @staticmethod
+    def _decode_hash(reply: List[bytes]) -> Dict[str, Any]:
+        return {
+            reply[i].decode("utf-8"): json.loads(reply[i + 1])
+            for i in range(0, len(reply), 2)
+        }
+
+    async def create(self, session_id: str, fields: Dict[str, Any]) -> None:
+        key, choices_key = self._keys(session_id)
+        commands = [("DEL", key, choices_key)]
+        if fields:
+            commands += [("HSET", key, *self._field_args(fields)), ("EXPIRE", key, self.ttl)]
+        await self.pool.execute(commands)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        key, choices_key = self._keys(session_id)
+        # Reading a session keeps it alive
+        reply, _, _ = await self.pool.execute([
+            ("HGETALL", key),
+            ("EXPIRE", key, self.ttl),
+            ("EXPIRE", choices_key, self.ttl),
+        ])
+        if not reply:
+            return None
+        return self._decode_hash(reply)
+
+    async def update(self, session_id: str, fields: Dict[str, Any]) -> None:
+        if not fields:
+            return
+        await UPDATE_SCRIPT.run(self.pool, self._keys(session_id), [self.ttl, *self._field_args(fields)])
+
+    async def append_choices(self, session_id: str, choices: List[Dict[str, Any]]) -> None:
+        if not choices:
+            return
+        await APPEND_SCRIPT.run(self.pool, self._keys(session_id),
+                                [self.ttl, *(json.dumps(choice) for choice in choices)])
+
+    async def pop(self, session_id: str) -> Optional[Dict[str, Any]]:
+        fields, choices = await POP_SCRIPT.run(self.pool, self._keys(session_id), [])
+        if not fields:
+            return None
+        session = self._decode_hash(fields)
+        session["choices"] = ChoiceLog.from_records(json.loads(choice) for choice in choices)
+        return session
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+def create_session_store(url: str, ttl: int = DEFAULT_SESSION_TTL,
+                         max_connections: int = 10, **memory_options: Any) -> SessionStore:
+    """
+    Build a session store from a URL
+    memory:// keeps sessions in-process; redis://[:password@]host[:port][/db] shares them
+    Extra keyword arguments configure InMemorySessionStore (limits, reaper, eviction hook)
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return InMemorySessionStore(ttl=ttl, **memory_options)
+    elif parsed.scheme == "redis":
+        if memory_options.get("journal") is not None:
+            logger.warning("The session journal only applies to memory://; Redis sessions already outlive workers")
+        db = int(parsed.path.lstrip("/") or 0)
+        pool = RedisConnectionPool(
+            parsed.hostname or "localhost",
+            parsed.port or 6379,
+            db=db,
+            password=parsed.password,
+            max_connections=max_connections
+        )
+        return RedisSessionStore(pool, ttl=ttl)
+    raise ValueError(f"Unsupported session store URL: {url}")
@@ -0,0 +1,257 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from typing import Dict, Iterator, Optional, Tuple
+
+from starlette.responses import FileResponse, Response
+
+from leaderboard import etag_matches
+
+logger = logging.getLogger(__name__)
+
+# brotli is optional: without it only gzip variants are made and served
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Precompressed variants sit next to the original as <name>.br / <name>.gz, in preference order
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".ico", ".webmanifest"}
+# Smaller files gain too little from compression to be worth a variant
+MIN_COMPRESS_BYTES = 1024
+# Files up to this size are read once and served from memory, within the total budget
+DEFAULT_SMALL_FILE_BYTES = 256 * 1024
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+# Create React App names bundles like main.3f2a1b9c.js and 787.1a2b3c4d.chunk.css; a changed file
+# gets a new name, so these can be cached for good
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.")
+IMMUTABLE = "public, max-age=31536000, immutable"
+# index.html and other unhashed files are revalidated with their ETag on every use
+REVALIDATE = "no-cache"
+INDEX = "index.html"
+
+mimetypes.add_type("application/json", ".map")
+
+class Variant:
+    """One stored representation of an asset: the original or a precompressed copy"""
+
+    __slots__ = ("path", "stat", "etag", "body")
+
+    def __init__(self, path: str, stat: os.stat_result, etag: str, body: Optional[bytes] = None):
+        self.path = path
+        self.stat = stat
+        self.etag = etag
+        self.body = body
+
+class Asset:
+    __slots__ = ("name", "content_type", "cache_control", "last_modified", "variants", "compressible")
+
+    def __init__(self, name: str, content_type: str, cache_control: str, last_modified: str,
+                 compressible: bool):
+        self.name = name
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.last_modified = last_modified
+        self.compressible = compressible
+        # Content coding ("identity", "br", "gzip") -> Variant
+        self.variants: Dict[str, Variant] = {}
+
+def _content_type(name: str) -> str:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/json", "application/manifest+json",
+                                                               "image/svg+xml"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+def _etag(data: bytes, coding: str) -> str:
+    # Content-derived, like leaderboard pages, so every worker and image agrees; each coding is its own entity
+    digest = hashlib.blake2b(data, digest_size=12).hexdigest()
+    return f'"{digest}"' if coding == "identity" else f'"{digest}-{coding}"'
+
+def _hash_file(path: str) -> bytes:
+    digest = hashlib.blake2b(digest_size=12)
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+def _walk(build_dir: str) -> Iterator[Tuple[str, str]]:
+    """(URL name, path) of every file in the build, precompressed variants aside"""
+    variant_suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    for directory, _, files in os.walk(build_dir):
+        for file_name in files:
+            if file_name.endswith(variant_suffixes):
+                continue
+            path = os.path.join(directory, file_name)
+            yield os.path.relpath(path, build_dir).replace(os.sep, "/"), path
+
+def coding_qualities(accept_encoding: str) -> Dict[str, float]:
+    """Coding -> q-value for each coding an Accept-Encoding header lists (q=0 means refused)"""
+    qualities = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        quality = 1.0
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if coding:
+            qualities[coding.lower()] = quality
+    return qualities
+
+class StaticAssets:
+    """
+    The frontend build, indexed once at startup
+    Lookups only consult the index, so no request path ever reaches the filesystem, and a
+    file added after startup isn't served until the next one. Small files (and their
+    compressed variants) are read into memory within `cache_bytes`; the rest stream from disk.
+    """
+
+    def __init__(self, build_dir: str, small_file_bytes: int = DEFAULT_SMALL_FILE_BYTES,
+                 cache_bytes: int = DEFAULT_CACHE_BYTES):
+        self.build_dir = build_dir
+        self.small_file_bytes = small_file_bytes
+        self.cache_bytes = cache_bytes
+        self.cached_bytes = 0
+        self.assets: Dict[str, Asset] = {}
+        self.stats = {"responses": 0, "not_modified": 0, "not_found": 0, "from_memory": 0,
+                      "br": 0, "gzip": 0, "identity": 0}
+        self.load()
+
+    def load(self):
+        for name, path in _walk(self.build_dir):
+            stat = os.stat(path)
+            hashed = name.startswith("static/") and HASHED_NAME.search(name) is not None
+            extension = os.path.splitext(name)[1].lower()
+            asset = Asset(name, _content_type(name), IMMUTABLE if hashed else REVALIDATE,
+                          formatdate(stat.st_mtime, usegmt=True), extension in COMPRESSIBLE)
+            asset.variants["identity"] = self._variant(path, stat, "identity")
+            for coding, suffix in ENCODINGS:
+                if os.path.exists(path + suffix):
+                    asset.variants[coding] = self._variant(path + suffix, os.stat(path + suffix), coding)
+            identity = asset.variants["identity"]
+            # A build that skipped `python static_assets.py` still gets gzip for what it keeps in memory
+            if (asset.compressible and "gzip" not in asset.variants and identity.body is not None
+                    and len(identity.body) >= MIN_COMPRESS_BYTES):
+                data = gzip.compress(identity.body, compresslevel=9, mtime=0)
+                if len(data) < len(identity.body):
+                    asset.variants["gzip"] = Variant(path + ".gz", identity.stat, _etag(identity.body, "gzip"), data)
+                    self.cached_bytes += len(data)
+            self.assets[name] = asset
+        if INDEX not in self.assets:
+            logger.warning("No %s in %s; the frontend won't be served", INDEX, self.build_dir)
+        logger.info("Indexed %d frontend files, %d bytes held in memory", len(self.assets), self.cached_bytes)
+
+    def _variant(self, path: str, stat: os.stat_result, coding: str) -> Variant:
+        body = None
+        if stat.st_size <= self.small_file_bytes and self.cached_bytes + stat.st_size <= self.cache_bytes:
+            with open(path, "rb") as handle:
+                body = handle.read()
+            self.cached_bytes += len(body)
+            etag = _etag(body, coding)
+        else:
+            digest = _hash_file(path).hex()
+            etag = f'"{digest}"' if coding == "identity" else f'"{digest}-{coding}"'
+        return Variant(path, stat, etag, body)
+
+    def lookup(self, path: str) -> Optional[Asset]:
+        """The asset for a URL path; client-side routes (no file extension) get index.html"""
+        name = path.lstrip("/")
+        asset = self.assets.get(name or INDEX)
+        if asset is None and "." not in name.rsplit("/", 1)[-1] and not name.startswith("static/"):
+            asset = self.assets.get(INDEX)
+        return asset
+
+    def response(self, asset: Asset, accept_encoding: str, if_none_match: Optional[str],
+                 head: bool = False) -> Response:
+        coding = "identity"
+        if len(asset.variants) > 1:
+            # The server's preference order decides, among the codings the client accepts
+            qualities = coding_qualities(accept_encoding)
+            wildcard = qualities.get("*", 0.0)
+            for candidate, _ in ENCODINGS:
+                if candidate in asset.variants and qualities.get(candidate, wildcard) > 0:
+                    coding = candidate
+                    break
+        variant = asset.variants[coding]
+        headers = {"cache-control": asset.cache_control, "etag": variant.etag}
+        if asset.compressible:
+            headers["vary"] = "Accept-Encoding"
+
+        self.stats["responses"] += 1
+        if etag_matches(if_none_match, variant.etag):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        headers["last-modified"] = asset.last_modified
+        if coding != "identity":
+            headers["content-encoding"] = coding
+        self.stats[coding] += 1
+        if variant.body is not None:
+            self.stats["from_memory"] += 1
+            headers["content-length"] = str(len(variant.body))
+            return Response(b"" if head else variant.body, headers=headers, media_type=asset.content_type)
+        # Stat taken at startup, so serving a large file costs no extra system call before the read
+        return FileResponse(variant.path, headers=headers, media_type=asset.content_type, stat_result=variant.stat)
+
+class StaticFrontend:
+    """ASGI app serving StaticAssets; mount it after the API routes so they take precedence"""
+
+    def __init__(self, assets: StaticAssets):
+        self.assets = assets
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1000})
+            return
+        method = scope["method"]
+        asset = self.assets.lookup(scope["path"]) if method in ("GET", "HEAD") else None
+        if asset is None:
+            self.assets.stats["not_found"] += 1
+            response = Response("Not Found", status_code=404 if method in ("GET", "HEAD") else 405,
+                                media_type="text/plain")
+        else:
+            accept_encoding = if_none_match = None
+            for name, value in scope["headers"]:
+                if name == b"accept-encoding":
+                    accept_encoding = value.decode("latin-1")
+                elif name == b"if-none-match":
+                    if_none_match = value.decode("latin-1")
+            response = self.assets.response(asset, accept_encoding or "", if_none_match, head=method == "HEAD")
+        await response(scope, receive, send)
+
+def precompress(build_dir: str, level: int = 9) -> Dict[str, int]:
+    """Write .gz (and, with brotli installed, .br) variants of compressible files; returns counts per coding"""
+    written = {"gzip": 0, "br": 0}
+    for name, path in _walk(build_dir):
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE or os.path.getsize(path) < MIN_COMPRESS_BYTES:
+            continue
+        with open(path, "rb") as handle:
+            data = handle.read()
+        variants = [("gzip", ".gz", gzip.compress(data, compresslevel=level, mtime=0))]
+        if brotli is not None:
+            variants.append(("br", ".br", brotli.compress(data, quality=11)))
+        for coding, suffix, compressed in variants:
+            # Not worth a variant unless it saves a tenth
+            if len(compressed) < len(data) * 0.9:
+                with open(path + suffix, "wb") as handle:
+                    handle.write(compressed)
+                written[coding] += 1
+    return written
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompress a frontend build for static serving")
+    parser.add_argument("build_dir")
+    args = parser.parse_args()
+    counts = precompress(args.build_dir)
+    print(f"Wrote {counts['gzip']} gzip and {counts['br']} brotli variants"
+          + ("" if brotli is not None else " (install brotli for .br variants)"))
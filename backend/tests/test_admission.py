@@ -0,0 +1,119 @@
+"""Rate limits, the concurrency limiter and load shedding in AdmissionMiddleware"""
+import asyncio
+
+from admission import (
+    PRIORITY_PLAY, PRIORITY_START, AdmissionController, AdmissionMiddleware, ConcurrencyLimiter, RateLimiter
+)
+
+
+def test_rate_limiter_bucket_refills():
+    limiter = RateLimiter(rate=2.0, burst=3.0)
+    assert [limiter.acquire("ip", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("ip", now=0.0) == 0.5
+    assert limiter.acquire("other", now=0.0) == 0.0
+    assert limiter.acquire("ip", now=0.5) == 0.0
+    # A batch costing more than the bucket holds goes through once the bucket is full
+    assert limiter.acquire("batch", cost=10, now=0.0) == 0.0
+
+
+def test_rate_limiter_forgets_refilled_keys():
+    limiter = RateLimiter(rate=1.0, burst=1.0, max_keys=2)
+    limiter.acquire("a", now=0.0)
+    limiter.acquire("b", now=5.0)
+    limiter.acquire("c", now=5.0)
+    assert set(limiter._buckets) == {"b", "c"}
+
+
+def test_play_waiters_go_ahead_of_starts():
+    async def run():
+        limiter = ConcurrencyLimiter(1, (1.0, 1.0))
+        assert limiter.try_acquire(PRIORITY_PLAY)
+        order = []
+
+        async def waiter(priority, name):
+            assert await limiter.wait(priority, asyncio.get_running_loop().time())
+            order.append(name)
+            limiter.release()
+
+        start = asyncio.ensure_future(waiter(PRIORITY_START, "start"))
+        await asyncio.sleep(0)
+        play = asyncio.ensure_future(waiter(PRIORITY_PLAY, "play"))
+        await asyncio.sleep(0)
+        assert not limiter.try_acquire(PRIORITY_START)
+        limiter.release()
+        await asyncio.gather(start, play)
+        assert order == ["play", "start"]
+        assert limiter.active == 0
+    asyncio.run(run())
+
+
+def test_waiters_are_shed_after_their_budget():
+    async def run():
+        limiter = ConcurrencyLimiter(1, (0.02, 0.02))
+        assert limiter.try_acquire(PRIORITY_PLAY)
+        now = asyncio.get_running_loop().time()
+        assert not await limiter.wait(PRIORITY_PLAY, now)
+        # A queue whose head has already waited out the budget sheds new arrivals at once
+        limiter._queues[PRIORITY_PLAY].append((now - 1.0, asyncio.get_running_loop().create_future()))
+        assert not await asyncio.wait_for(limiter.wait(PRIORITY_PLAY, now), 0.001)
+    asyncio.run(run())
+
+
+def serve(controller, requests):
+    """Send `requests` ((path, client ip) pairs) concurrently through the middleware; returns responses"""
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = AdmissionMiddleware(app, controller)
+
+    async def request(path, ip):
+        scope = {"type": "http", "method": "POST", "path": path, "headers": [], "client": (ip, 1)}
+        response = {}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = dict(message["headers"])
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        await middleware(scope, receive, send)
+        return response
+
+    async def run():
+        tasks = [asyncio.ensure_future(request(path, ip)) for path, ip in requests]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*tasks)
+    return asyncio.run(run())
+
+
+def test_overload_sheds_new_games_and_queues_play():
+    controller = AdmissionController(max_concurrency=1, play_wait=1.0, start_wait=0.01)
+    responses = serve(controller, [("/game/choice", "1.1.1.1"), ("/game/start", "1.1.1.1"),
+                                   ("/game/choice", "1.1.1.1"), ("/leaderboard", "1.1.1.1")])
+    assert [response["status"] for response in responses] == [200, 503, 200, 200]
+    assert responses[1]["headers"][b"retry-after"] == b"1"
+    assert controller.stats["shed_start"] == 1 and controller.stats["shed_play"] == 0
+    # Routes outside /game/ aren't counted or limited
+    assert controller.stats["admitted"] == 2
+    assert controller.limiter.active == 0
+
+
+def test_ip_rate_limit():
+    controller = AdmissionController(ip_rate=1.0, ip_burst=2.0)
+    responses = serve(controller, [("/game/choice", "1.1.1.1")] * 3 + [("/game/choice", "2.2.2.2")])
+    assert [response["status"] for response in responses] == [200, 200, 429, 200]
+    assert controller.stats["rate_limited_ip"] == 1
+
+
+def test_session_rate_limit():
+    controller = AdmissionController(session_rate=1.0, session_burst=2.0)
+    assert controller.session_retry_after("s1", 2) == 0.0
+    assert controller.session_retry_after("s1") > 0
+    assert controller.stats["rate_limited_session"] == 1
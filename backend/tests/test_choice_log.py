@@ -0,0 +1,98 @@
+"""ChoiceLog running sums and the anti-cheat timing stats kept alongside them"""
+import math
+import random
+
+import numpy as np
+
+from anticheat import BULK_MIN_TAPS, TimingStats, assess, assess_batch, batch_verdicts
+from choice_log import ChoiceLog
+
+
+def session_records(count: int, seed: int, scripted: bool = False):
+    """Choice records for one session; a scripted one taps exactly on a fixed grid, instantly"""
+    rng = random.Random(seed)
+    records = []
+    tap = 1000.0
+    for i in range(count):
+        tap += 600.0 if scripted else rng.uniform(900.0, 2500.0)
+        offset = 1.0 if scripted else abs(rng.gauss(0, 60))
+        records.append({
+            "lyric_id": f"lyric_{i % 7}",
+            "chosen_word": rng.choice(["dash", "flash", "crash", "splash"]),
+            "tap_timestamp": tap,
+            "beat_timestamp": tap - offset,
+            "timing_offset": offset,
+            "rhyme_accuracy": rng.random(),
+            "tone_score": rng.random(),
+            "beat_accuracy": rng.random(),
+            "reaction_time": 40.0 if scripted else rng.uniform(300.0, 2000.0),
+        })
+    return records
+
+
+def test_final_metrics_match_a_rescan():
+    records = session_records(50, seed=1)
+    log = ChoiceLog()
+    for record in records:
+        log.append(**record)
+    metrics = log.final_metrics()
+    assert math.isclose(metrics["rhyme_accuracy_score"], np.mean([r["rhyme_accuracy"] for r in records]))
+    assert math.isclose(metrics["beat_sync_accuracy"], np.mean([r["beat_accuracy"] for r in records]))
+    assert math.isclose(metrics["tone_match_score"], np.mean([r["tone_score"] for r in records]))
+    assert math.isclose(metrics["reaction_speed_avg"], np.mean([r["timing_offset"] for r in records]))
+    assert ChoiceLog().final_metrics()["rhyme_accuracy_score"] == 0.0
+
+
+def test_records_round_trip():
+    records = session_records(20, seed=2)
+    log = ChoiceLog.from_records(records)
+    assert list(log) == records
+    assert log[3] == records[3]
+
+
+def test_welford_stats_match_numpy():
+    records = session_records(200, seed=3)
+    stats = ChoiceLog.from_records(records).timing
+    offsets = np.array([r["timing_offset"] for r in records])
+    intervals = np.diff([r["tap_timestamp"] for r in records])
+    assert stats.taps == 200 and stats.intervals == 199
+    assert math.isclose(stats.offset_mean, offsets.mean())
+    assert math.isclose(stats.offset_std, offsets.std())
+    assert math.isclose(stats.interval_cv, intervals.std() / intervals.mean())
+
+
+def test_bulk_extend_matches_one_tap_at_a_time():
+    records = session_records(3 * BULK_MIN_TAPS, seed=4)
+    one_by_one = TimingStats()
+    for record in records:
+        one_by_one.add(record["tap_timestamp"], record["timing_offset"], record["reaction_time"])
+
+    # A short run added tap by tap, then a long one folded in with NumPy
+    log = ChoiceLog.from_records(records[:5])
+    log.extend(records[5:])
+    bulk = log.timing
+    for name in ("taps", "intervals", "reactions", "fast_reactions", "last_tap", "min_reaction"):
+        assert getattr(bulk, name) == getattr(one_by_one, name), name
+    for name in ("offset_mean", "offset_m2", "interval_mean", "interval_m2"):
+        assert math.isclose(getattr(bulk, name), getattr(one_by_one, name), rel_tol=1e-9), name
+
+
+def test_scripted_session_is_quarantined_and_batch_agrees():
+    human = ChoiceLog.from_records(session_records(40, seed=5))
+    script = ChoiceLog.from_records(session_records(40, seed=6, scripted=True))
+    assert assess(human.timing).action == "ok"
+    verdict = assess(script.timing)
+    assert verdict.action == "quarantine"
+    assert set(verdict.reasons) == {"steady_offset", "metronomic_taps", "superhuman_reactions"}
+
+    logs = [human, script]
+    index = np.concatenate([np.full(len(log), i) for i, log in enumerate(logs)])
+    result = assess_batch(index, np.concatenate([np.asarray(log.tap_timestamp) for log in logs]),
+                          np.concatenate([np.asarray(log.timing_offset) for log in logs]),
+                          np.concatenate([np.asarray(log.reaction_time) for log in logs]))
+    assert batch_verdicts(result) == [assess(log.timing) for log in logs]
+
+
+def test_few_taps_are_never_judged():
+    script = ChoiceLog.from_records(session_records(5, seed=7, scripted=True))
+    assert assess(script.timing).action == "ok"
@@ -0,0 +1,119 @@
+"""SessionJournal: replay after a clean close, shutdown during a commit, and segment rotation"""
+import asyncio
+import threading
+import time
+
+from journal import SessionJournal
+
+CHOICE = {
+    "lyric_id": "lyric_0",
+    "chosen_word": "dash",
+    "tap_timestamp": 1000.0,
+    "beat_timestamp": 1040.0,
+    "timing_offset": 40.0,
+    "rhyme_accuracy": 0.9,
+    "tone_score": 1.0,
+    "beat_accuracy": 0.92,
+    "reaction_time": 350.0
+}
+FIELDS = {"player_name": "tester", "difficulty": "medium", "start_time": 1700000000.0, "current_lyric_index": 0}
+
+
+def open_journal(directory, **options) -> SessionJournal:
+    """A journal that has replayed `directory` and is ready to append; call on the event loop"""
+    journal = SessionJournal(str(directory), fsync=False, lock_timeout=1.0, **options)
+    journal.replay()
+    journal.open()
+    return journal
+
+
+def replay(directory):
+    journal = SessionJournal(str(directory), fsync=False, lock_timeout=1.0)
+    try:
+        return journal.replay()
+    finally:
+        asyncio.run(journal.close())
+
+
+def test_record_close_replay(tmp_path):
+    async def run():
+        journal = open_journal(tmp_path)
+        journal.record_start("s1", FIELDS)
+        journal.record_update("s1", {"current_lyric_index": 1})
+        journal.record_choices("s1", [CHOICE, {**CHOICE, "chosen_word": "flash"}])
+        journal.record_start("s2", FIELDS)
+        journal.record_end("s2")
+        await journal.close()
+    asyncio.run(run())
+
+    restored = replay(tmp_path)
+    assert list(restored) == ["s1"]
+    fields, choices = restored["s1"]
+    assert fields == {**FIELDS, "current_lyric_index": 1}
+    assert [choice["chosen_word"] for choice in choices] == ["dash", "flash"]
+    assert choices[0]["reaction_time"] == 350.0
+
+
+def test_close_waits_for_an_in_flight_commit(tmp_path):
+    writing = threading.Event()
+
+    async def run():
+        journal = open_journal(tmp_path, commit_interval=0)
+        write = journal._write
+
+        def slow_write(pending, dead):
+            writing.set()
+            time.sleep(0.2)
+            write(pending, dead)
+        journal._write = slow_write
+
+        journal.record_start("s1", FIELDS)
+        # The writer thread is now stuck in the START frame's commit
+        await asyncio.to_thread(writing.wait, 5)
+        journal.record_choices("s1", [CHOICE])
+        await journal.close()
+        assert journal._files == {}
+    asyncio.run(run())
+
+    restored = replay(tmp_path)
+    assert [choice["chosen_word"] for choice in restored["s1"][1]] == ["dash"]
+
+
+def test_segments_rotate_and_ended_ones_are_deleted(tmp_path):
+    async def run():
+        journal = open_journal(tmp_path, segment_bytes=256, commit_interval=0)
+        for i in range(6):
+            journal.record_start(f"s{i}", FIELDS)
+            journal.record_choices(f"s{i}", [CHOICE])
+        assert journal._segment > 0
+        for i in range(5):
+            journal.record_end(f"s{i}")
+        # A new segment, so the one holding the last end event is closed too
+        journal.record_start("s6", FIELDS)
+        await journal.close()
+        return journal
+    journal = asyncio.run(run())
+    assert journal.stats["segments_deleted"] > 0
+
+    restored = replay(tmp_path)
+    assert sorted(restored) == ["s5", "s6"]
+    assert restored["s5"][1][0]["chosen_word"] == "dash"
+
+
+def test_torn_frame_is_cut_off(tmp_path):
+    async def run():
+        journal = open_journal(tmp_path)
+        journal.record_start("s1", FIELDS)
+        journal.record_choices("s1", [CHOICE])
+        await journal.close()
+    asyncio.run(run())
+    number = SessionJournal(str(tmp_path)).segments()[-1]
+    path = tmp_path / f"segment-{number:08d}.journal"
+    data = path.read_bytes()
+    path.write_bytes(data[:-5])
+
+    journal = SessionJournal(str(tmp_path), fsync=False, lock_timeout=1.0)
+    restored = journal.replay()
+    asyncio.run(journal.close())
+    assert restored["s1"] == (FIELDS, [])
+    assert journal.stats["torn_bytes_dropped"] > 0
@@ -0,0 +1,98 @@
+"""LeaderboardIndex: ranking, capacity, windows and the boards reads and unknown difficulties may create"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from leaderboard import LeaderboardIndex, LeaderboardResponseCache
+from models import Base, PlayerScore
+
+NOW = datetime(2026, 10, 14, 12, 0)  # a Wednesday
+
+
+def score(session_id, total, difficulty="medium", created_at=NOW, name=None):
+    return {"session_id": session_id, "player_name": name or session_id, "difficulty": difficulty,
+            "total_score": total, "rhyme_accuracy": 0.5, "created_at": created_at}
+
+
+def players(index, *args, **kwargs):
+    return [entry["player"] for entry in index.page(*args, now=NOW, **kwargs)]
+
+
+def test_ranked_by_score_then_earliest_game():
+    index = LeaderboardIndex()
+    index.add(score("late", 900, created_at=NOW), now=NOW)
+    index.add(score("early", 900, created_at=NOW - timedelta(minutes=5)), now=NOW)
+    index.add(score("best", 1200, difficulty="hard"), now=NOW)
+    assert players(index) == ["best", "early", "late"]
+    assert players(index, "medium") == ["early", "late"]
+    assert players(index, "hard") == ["best"]
+    assert players(index, offset=1, limit=1) == ["early"]
+
+
+def test_capacity_keeps_the_best():
+    index = LeaderboardIndex(capacity=3)
+    for i in range(10):
+        index.add(score(f"p{i}", i * 10), now=NOW)
+    assert players(index) == ["p9", "p8", "p7"]
+    version = index.version
+    assert not index.add(score("low", 5), now=NOW)
+    assert index.version == version
+
+
+def test_windows_roll_over():
+    index = LeaderboardIndex()
+    index.add(score("yesterday", 500, created_at=NOW - timedelta(days=1)), now=NOW)
+    index.add(score("last_week", 800, created_at=NOW - timedelta(days=7)), now=NOW)
+    index.add(score("today", 100), now=NOW)
+    assert players(index, window="daily") == ["today"]
+    assert players(index, window="weekly") == ["yesterday", "today"]
+    assert players(index, window="all") == ["last_week", "yesterday", "today"]
+    next_day = NOW + timedelta(days=1)
+    assert index.page(window="daily", now=next_day) == []
+
+
+def test_unknown_difficulties_and_reads_create_no_boards():
+    index = LeaderboardIndex()
+    index.add(score("odd", 700, difficulty="x" * 40), now=NOW)
+    assert players(index) == ["odd"]
+    with pytest.raises(ValueError):
+        index.page("x" * 40, now=NOW)
+    with pytest.raises(ValueError):
+        index.page(window="monthly", now=NOW)
+    assert index.page("easy", now=NOW) == []
+    assert {difficulty for difficulty, _ in index._boards} == {"all"}
+
+
+def test_seed_matches_incremental_adds():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    scores = [score(f"p{i}", (i * 37) % 100, difficulty=("easy", "hard", "bogus")[i % 3],
+                    created_at=NOW - timedelta(days=i % 9, minutes=i)) for i in range(30)]
+    for entry in scores:
+        db.add(PlayerScore(**{name: value for name, value in entry.items()}))
+    db.commit()
+
+    seeded = LeaderboardIndex(capacity=5)
+    seeded.seed(db, now=NOW)
+    added = LeaderboardIndex(capacity=5)
+    for entry in scores:
+        added.add(entry, now=NOW)
+    for difficulty in ("all", "easy", "hard", "medium"):
+        for window in ("all", "daily", "weekly"):
+            assert seeded.page(difficulty, window, now=NOW) == added.page(difficulty, window, now=NOW)
+    assert ("bogus", "all") not in seeded._boards
+    db.close()
+
+
+def test_response_cache_follows_the_index_version():
+    index = LeaderboardIndex()
+    cache = LeaderboardResponseCache(index)
+    index.add(score("first", 100), now=NOW)
+    first = cache.get("all", "all", 0, 10, now=NOW)
+    assert cache.get("all", "all", 0, 10, now=NOW) is first
+    index.add(score("second", 200), now=NOW)
+    second = cache.get("all", "all", 0, 10, now=NOW)
+    assert second.etag != first.etag and cache.hits == 1 and cache.misses == 2
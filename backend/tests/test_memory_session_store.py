@@ -0,0 +1,55 @@
+"""InMemorySessionStore eviction: evicted sessions reach on_evict straight away"""
+import asyncio
+
+from session_store import InMemorySessionStore
+
+FIELDS = {"player_name": "tester", "difficulty": "medium", "start_time": 1700000000.0, "current_lyric_index": 0}
+
+
+def with_store(test, **options):
+    """Run `test(store, flushed)`; `flushed` lists the session ids passed to on_evict"""
+    flushed = []
+
+    async def on_evict(session_id, session):
+        flushed.append(session_id)
+
+    async def run():
+        # A reap interval long enough that only the eviction itself can flush
+        store = InMemorySessionStore(reap_interval=3600, on_evict=on_evict, **options)
+        await store.start()
+        try:
+            await test(store, flushed)
+        finally:
+            await store.close()
+    asyncio.run(run())
+    return flushed
+
+
+def test_limit_eviction_flushes_without_waiting_for_the_reaper():
+    async def test(store, flushed):
+        for i in range(4):
+            await store.create(f"s{i}", FIELDS)
+        await asyncio.sleep(0)
+        assert flushed == ["s0", "s1"]
+        assert await store.get("s0") is None and await store.get("s3") == FIELDS
+        assert store.evictions["max_sessions"] == 2
+    with_store(test, max_sessions=2)
+
+
+def test_byte_limit_eviction_flushes_and_close_waits_for_it():
+    async def test(store, flushed):
+        await store.create("s0", FIELDS)
+        await store.create("s1", {**FIELDS, "padding": "x" * 10_000})
+        assert store.evictions["max_bytes"] == 1
+    # close() runs before the flush task has had a turn, and still hands the session over
+    assert with_store(test, max_bytes=5_000) == ["s0"]
+
+
+def test_idle_sessions_are_reaped_and_flushed():
+    async def test(store, flushed):
+        await store.create("s0", FIELDS)
+        await store.create("s1", FIELDS)
+        assert store.reap_idle(now=float("inf")) == 2
+        await asyncio.sleep(0)
+        assert sorted(flushed) == ["s0", "s1"] and len(store) == 0
+    with_store(test, ttl=60)
@@ -0,0 +1,64 @@
+"""RaceRoom runs `abandon` whenever it closes without a finished race"""
+import asyncio
+
+import race_rooms
+from race_rooms import RoomManager
+
+
+async def send(frame: str):
+    pass
+
+
+async def close():
+    pass
+
+
+def run_room(monkeypatch, advance=None, finish=None, start=True):
+    """Run a two-player room until it closes; returns (hook calls, room)"""
+    monkeypatch.setattr(race_rooms, "LOBBY_TICK_INTERVAL", 0.01)
+    monkeypatch.setattr(race_rooms, "LOBBY_TIMEOUT", 0.05)
+    monkeypatch.setattr(race_rooms, "TICK_INTERVAL", 0.01)
+    monkeypatch.setattr(race_rooms, "FLUSH_TIMEOUT", 0.1)
+    calls = []
+
+    async def default_advance(room):
+        calls.append("advance")
+
+    async def default_finish(room):
+        calls.append("finish")
+
+    async def abandon(room):
+        calls.append(("abandon", sorted(player.name for player in room.players.values())))
+
+    async def run():
+        manager = RoomManager(race_seconds=0.05)
+        room = manager.create("medium", 2, advance or default_advance, finish or default_finish, abandon)
+        room.join("ana", send, close)
+        room.join("bo", send, close)
+        if start:
+            room.start()
+        await asyncio.wait_for(room._task, 5)
+        assert manager.rooms == {}
+        return room
+    room = asyncio.run(run())
+    return calls, room
+
+
+def test_lobby_timeout_abandons_players(monkeypatch):
+    calls, room = run_room(monkeypatch, start=False)
+    assert calls == [("abandon", ["ana", "bo"])]
+    assert not room.completed
+
+
+def test_finished_race_is_not_abandoned(monkeypatch):
+    calls, room = run_room(monkeypatch)
+    assert calls[-1] == "finish" and room.completed
+    assert not any(isinstance(call, tuple) for call in calls)
+
+
+def test_failed_hook_abandons_players(monkeypatch):
+    async def advance(room):
+        raise RuntimeError("catalog unavailable")
+    calls, room = run_room(monkeypatch, advance=advance)
+    assert calls == [("abandon", ["ana", "bo"])]
+    assert room.state == "finished" and not room.completed
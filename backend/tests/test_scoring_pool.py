@@ -0,0 +1,32 @@
+"""ScoringPool falls back to estimates when the pool can't take a job"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+from scoring import GameScorer
+from scoring_pool import ScoringPool
+
+
+def shut_down_pool(**options) -> ScoringPool:
+    pool = ScoringPool(GameScorer(), workers=1, **options)
+    pool._executor = ProcessPoolExecutor(max_workers=1)
+    pool._executor.shutdown()
+    return pool
+
+
+def test_full_batch_submit_failure_falls_back():
+    pool = shut_down_pool(batch_size=2)
+
+    async def run():
+        return await asyncio.gather(pool.score("flash", "Moving fast like a"),
+                                    pool.score("dash", "Moving fast like a"))
+    scores = asyncio.run(run())
+    assert scores == [pool.estimate("flash", "Moving fast like a", None),
+                      pool.estimate("dash", "Moving fast like a", None)]
+    assert pool.stats["failures"] == 2
+
+
+def test_timer_submit_failure_falls_back():
+    pool = shut_down_pool(batch_size=32, batch_window=0.001)
+    score = asyncio.run(pool.score("flash", "Moving fast like a"))
+    assert score == pool.estimate("flash", "Moving fast like a", None)
+    assert pool.stats["failures"] == 1 and pool.stats["timeouts"] == 0
@@ -0,0 +1,108 @@
+"""RedisSessionStore against the embedded fake server (benchmarks/fake_redis.py)"""
+import asyncio
+
+from benchmarks.fake_redis import FakeRedisServer
+from session_store import create_session_store
+
+CHOICE = {
+    "lyric_id": "lyric_0",
+    "chosen_word": "dash",
+    "tap_timestamp": 1000.0,
+    "beat_timestamp": 1040.0,
+    "timing_offset": 40.0,
+    "rhyme_accuracy": 0.9,
+    "tone_score": 1.0,
+    "beat_accuracy": 0.92
+}
+FIELDS = {"player_name": "tester", "difficulty": "medium", "start_time": 1700000000.0, "current_lyric_index": 0}
+
+
+def with_store(test, **options):
+    """Run `test(store, fake)` against a fresh fake server"""
+    async def run():
+        async with FakeRedisServer() as fake:
+            store = create_session_store(fake.url, **options)
+            try:
+                await test(store, fake)
+            finally:
+                await store.close()
+    asyncio.run(run())
+
+
+def test_round_trip():
+    async def test(store, fake):
+        await store.create("s1", FIELDS)
+        await store.update("s1", {"current_lyric_index": 1, "clock": {"offset": 2.5}})
+        await store.append_choices("s1", [CHOICE, {**CHOICE, "chosen_word": "flash"}])
+        assert await store.get("s1") == {**FIELDS, "current_lyric_index": 1, "clock": {"offset": 2.5}}
+
+        session = await store.pop("s1")
+        assert session["player_name"] == "tester"
+        assert [record["chosen_word"] for record in session["choices"]] == ["dash", "flash"]
+        assert await store.get("s1") is None
+        assert await store.pop("s1") is None
+        assert fake._cmd_dbsize() == 0
+    with_store(test)
+
+
+def test_create_sets_ttl_and_reads_refresh_it():
+    async def test(store, fake):
+        await store.create("s1", FIELDS)
+        await store.append_choices("s1", [CHOICE])
+        key, choices_key = store._keys("s1")
+        assert 0 < fake._cmd_ttl(key.encode()) <= 60
+        assert 0 < fake._cmd_ttl(choices_key.encode()) <= 60
+        fake.expires.clear()
+        await store.get("s1")
+        assert fake._cmd_ttl(key.encode()) > 0 and fake._cmd_ttl(choices_key.encode()) > 0
+    with_store(test, ttl=60)
+
+
+def test_writes_after_end_do_not_recreate_the_session():
+    async def test(store, fake):
+        await store.create("s1", FIELDS)
+        assert await store.pop("s1") is not None
+        await store.update("s1", {"clock_probe": 123.0})
+        await store.append_choices("s1", [CHOICE])
+        assert await store.get("s1") is None
+        assert fake._cmd_dbsize() == 0
+
+        # Never created at all
+        await store.update("missing", {"current_lyric_index": 3})
+        assert await store.get("missing") is None
+    with_store(test)
+
+
+def test_concurrent_ends_score_once():
+    async def test(store, fake):
+        await store.create("s1", FIELDS)
+        await store.append_choices("s1", [CHOICE])
+        results = await asyncio.gather(*(store.pop("s1") for _ in range(10)))
+        ended = [result for result in results if result is not None]
+        assert len(ended) == 1 and len(ended[0]["choices"]) == 1
+    with_store(test, max_connections=5)
+
+
+def test_scripts_are_reloaded_after_a_script_flush():
+    async def test(store, fake):
+        await store.create("s1", FIELDS)
+        await store.update("s1", {"current_lyric_index": 1})
+        fake.scripts.clear()
+        await store.update("s1", {"current_lyric_index": 2})
+        assert (await store.get("s1"))["current_lyric_index"] == 2
+    with_store(test)
+
+
+def test_large_batch_and_many_games_share_a_small_pool():
+    async def play(store, session_id):
+        await store.create(session_id, FIELDS)
+        for _ in range(5):
+            assert await store.get(session_id) is not None
+            await store.append_choices(session_id, [CHOICE])
+        await store.append_choices(session_id, [CHOICE] * 2500)
+        return await store.pop(session_id)
+
+    async def test(store, fake):
+        sessions = await asyncio.gather(*(play(store, f"s{i}") for i in range(40)))
+        assert all(len(session["choices"]) == 2505 for session in sessions)
+    with_store(test, max_connections=3)
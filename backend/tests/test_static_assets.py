@@ -0,0 +1,76 @@
+"""StaticAssets: Accept-Encoding negotiation, revalidation and lookup rules"""
+import gzip
+
+import pytest
+from starlette.testclient import TestClient
+
+from static_assets import IMMUTABLE, REVALIDATE, StaticAssets, StaticFrontend, coding_qualities
+
+BUNDLE = b"const rhyme = (word) => word.slice(-3);\n" * 200
+BUNDLE_PATH = "static/js/main.3f2a1b9c.js"
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "index.html").write_bytes(b'<!doctype html><div id="root"></div>')
+    bundle = tmp_path / BUNDLE_PATH
+    bundle.write_bytes(BUNDLE)
+    (tmp_path / (BUNDLE_PATH + ".gz")).write_bytes(gzip.compress(BUNDLE, mtime=0))
+    # Only the coding choice is under test, so a stand-in body saves needing brotli installed
+    (tmp_path / (BUNDLE_PATH + ".br")).write_bytes(b"brotli stand-in")
+    return StaticAssets(str(tmp_path))
+
+
+def coding(assets, accept_encoding):
+    response = assets.response(assets.lookup("/" + BUNDLE_PATH), accept_encoding, None)
+    return response.headers.get("content-encoding", "identity")
+
+
+def test_coding_qualities():
+    assert coding_qualities("gzip, br;q=0.5, identity; q=0, *;q=bogus") == {"gzip": 1.0, "br": 0.5, "identity": 0.0}
+    assert coding_qualities("") == {}
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br", "br"),
+    ("br, gzip", "br"),
+    ("gzip;q=1.0, br;q=0.1", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("*, br;q=0", "gzip"),
+    ("gzip;q=0, br;q=0", "identity"),
+    ("deflate", "identity"),
+    ("", "identity"),
+])
+def test_server_preference_among_accepted_codings(assets, accept_encoding, expected):
+    assert coding(assets, accept_encoding) == expected
+
+
+def test_each_coding_has_its_own_etag_and_revalidates(assets):
+    client = TestClient(StaticFrontend(assets))
+    gzipped = client.get("/" + BUNDLE_PATH, headers={"accept-encoding": "gzip"})
+    assert gzipped.status_code == 200 and gzipped.content == BUNDLE
+    assert gzipped.headers["cache-control"] == IMMUTABLE
+    assert gzipped.headers["vary"] == "Accept-Encoding"
+    plain = client.get("/" + BUNDLE_PATH, headers={"accept-encoding": "identity"})
+    assert plain.headers["etag"] != gzipped.headers["etag"]
+
+    repeat = client.get("/" + BUNDLE_PATH, headers={"accept-encoding": "gzip",
+                                                    "if-none-match": gzipped.headers["etag"]})
+    assert repeat.status_code == 304 and repeat.content == b""
+    # The gzip ETag doesn't validate the uncompressed body
+    other = client.get("/" + BUNDLE_PATH, headers={"accept-encoding": "identity",
+                                                   "if-none-match": gzipped.headers["etag"]})
+    assert other.status_code == 200 and other.content == BUNDLE
+
+
+def test_lookup_rules(assets):
+    client = TestClient(StaticFrontend(assets))
+    index = client.get("/")
+    assert index.status_code == 200 and index.headers["cache-control"] == REVALIDATE
+    assert client.get("/leaderboard/weekly").content == index.content
+    assert client.get("/static/js/missing.js").status_code == 404
+    assert client.get("/robots.txt").status_code == 404
+    assert client.post("/").status_code == 405
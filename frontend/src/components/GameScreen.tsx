@@ -188,6 +188,10 @@ interface LyricData {
   session_id: string;
 }
 
+// Matches BASE_BEAT_MS on the server: one beat lasts BASE_BEAT_MS * beat_timing
+const BASE_BEAT_MS = 600;
+const CLOCK_SYNC_ROUNDS = 5;
+
 const GameScreen: React.FC<GameScreenProps> = ({ gameState, setGameState, onEndGame }) => {
   const [currentLyric, setCurrentLyric] = useState<LyricData | null>(null);
   const [selectedWord, setSelectedWord] = useState<string | null>(null);
@@ -224,6 +228,7 @@ const GameScreen: React.FC<GameScreenProps> = ({ gameState, setGameState, onEndG
       const gameData = response.data;
       sessionIdRef.current = gameData.session_id;
       setCurrentLyric(gameData);
+      syncClock();
       
       // Start game timer
       gameTimerRef.current = setInterval(() => {
@@ -236,11 +241,6 @@ const GameScreen: React.FC<GameScreenProps> = ({ gameState, setGameState, onEndG
         });
       }, 1000);
       
-      // Start beat timer
-      beatTimerRef.current = setInterval(() => {
-        setActiveBeat(prev => (prev + 1) % 4);
-      }, 600);
-      
     } catch (error) {
       console.error('Failed to start game:', error);
     } finally {
@@ -248,20 +248,45 @@ const GameScreen: React.FC<GameScreenProps> = ({ gameState, setGameState, onEndG
     }
   };
 
+  // Restart the beat grid whenever a lyric arrives; the server scores taps against the same grid
+  useEffect(() => {
+    if (!currentLyric) return;
+    if (beatTimerRef.current) clearInterval(beatTimerRef.current);
+    setActiveBeat(0);
+    beatTimerRef.current = setInterval(() => {
+      setActiveBeat(prev => (prev + 1) % 4);
+    }, BASE_BEAT_MS * currentLyric.beat_timing);
+  }, [currentLyric]);
+
+  // Let the server estimate this browser's clock offset: each call echoes the previous reply's server_time
+  const syncClock = async () => {
+    try {
+      let serverTime: number | null = null;
+      for (let i = 0; i < CLOCK_SYNC_ROUNDS; i++) {
+        const response = await axios.post('/game/clock', {
+          session_id: sessionIdRef.current,
+          client_time: Date.now(),
+          server_time: serverTime
+        });
+        serverTime = response.data.server_time;
+      }
+    } catch (error) {
+      console.error('Failed to sync clock:', error);
+    }
+  };
+
   const handleWordSelection = async (word: string) => {
     if (!currentLyric || selectedWord) return;
     
     setSelectedWord(word);
     const tapTimestamp = Date.now();
-    const beatTimestamp = Date.now() + (activeBeat * 150); // Approximate beat timing
     
     try {
       const response = await axios.post('/game/choice', {
         session_id: sessionIdRef.current,
         lyric_id: currentLyric.lyric_id,
         chosen_word: word,
-        tap_timestamp: tapTimestamp,
-        beat_timestamp: beatTimestamp
+        tap_timestamp: tapTimestamp
       });
       
       const { feedback: feedbackData, metrics, speed_boost } = response.data;
@@ -271,7 +296,6 @@ const GameScreen: React.FC<GameScreenProps> = ({ gameState, setGameState, onEndG
         lyric_id: currentLyric.lyric_id,
         chosen_word: word,
         tap_timestamp: tapTimestamp,
-        beat_timestamp: beatTimestamp,
         ...metrics
       };
       setChoices(prev => [...prev, choiceData]);
@@ -305,36 +329,10 @@ const GameScreen: React.FC<GameScreenProps> = ({ gameState, setGameState, onEndG
 
   const loadNextLyric = async () => {
     try {
-      // For demo purposes, cycle through predefined lyrics
-      const lyrics = [
-        {
-          lyric_id: 'lyric_1',
-          lyric_text: "I'm moving fast like a flash of ___",
-          options: ["trash", "cash", "dash"],
-          correct_rhyme: "dash",
-          beat_timing: 1.0,
-          session_id: sessionIdRef.current
-        },
-        {
-          lyric_id: 'lyric_2',
-          lyric_text: "The rhythm flows like a river of ___",
-          options: ["gold", "soul", "flow"],
-          correct_rhyme: "flow",
-          beat_timing: 1.2,
-          session_id: sessionIdRef.current
-        },
-        {
-          lyric_id: 'lyric_3',
-          lyric_text: "My words hit hard like a hammer of ___",
-          options: ["steel", "feel", "real"],
-          correct_rhyme: "steel",
-          beat_timing: 0.8,
-          session_id: sessionIdRef.current
-        }
-      ];
-      
-      const nextLyricIndex = Math.floor(Math.random() * lyrics.length);
-      setCurrentLyric(lyrics[nextLyricIndex]);
+      const response = await axios.post('/game/next', {
+        session_id: sessionIdRef.current
+      });
+      setCurrentLyric(response.data);
       
     } catch (error) {
       console.error('Failed to load next lyric:', error);
@@ -17,6 +17,7 @@ fi
 echo "📦 Installing backend dependencies..."
 cd backend
 python3 -m pip install -r requirements.txt
+python3 migrate.py
 
 echo "📦 Installing frontend dependencies..."
 cd ../frontend